@@ -0,0 +1,291 @@
+"""Microbenchmarks of the context building and response parsing hot paths, on synthetic homes of 1k to 50k entities.
+
+Run from the repository root, with Home Assistant installed:
+
+    python -m benchmarks.bench_context --sizes 1000 10000 50000 --json results.json
+    python -m benchmarks.bench_context --compare results.json --max-regression 0.25
+    python -m benchmarks.bench_context --sizes 1000 10000 --compare benchmarks/baseline.json --normalize --max-regression 1
+
+No request is sent to the Perplexity API: the agent only builds the context, messages and payloads,
+and parses canned responses.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable
+from homeassistant.const import __version__ as HA_VERSION
+
+from custom_components.perplexity_assistant.const import CONF_CONTEXT_TOP_K, CONF_INPUT_TOKEN_BUDGET, DEFAULT_INPUT_TOKEN_BUDGET, DEFAULT_MODEL
+from custom_components.perplexity_assistant.conversation import PerplexityAgent, PerplexityAgentResponse
+from custom_components.perplexity_assistant.tokens import estimate_messages_tokens, estimate_tokens
+
+from .synthetic_home import add_config_entry, async_create_hass, async_populate
+
+
+DEFAULT_SIZES: tuple[int, ...] = (1000, 10000, 50000)
+DEFAULT_MIN_TIME: float = 0.5   # in seconds, time spent measuring each case
+DEFAULT_MAX_CALLS: int = 1000
+MIN_CALLS: int = 5
+RESPONSE_ACTIONS: tuple[int, ...] = (0, 5, 25)
+
+_LOGGER = logging.getLogger(__name__)
+
+PROMPT: str = "Turn off the kitchen lights and tell me the temperature in the living room"
+HISTORY: list[list[dict]] = [
+    [{"role": "user", "content": "Is the garage door open?"}, {"role": "assistant", "content": "No, the garage door is closed."}],
+    [{"role": "user", "content": "And the bedroom window?"}, {"role": "assistant", "content": "The bedroom window is open."}],
+]
+
+
+@dataclass
+class BenchmarkResult:
+    """Time per call and output size of a benchmark case."""
+    size: int | None
+    case: str
+    calls: int
+    mean_us: float
+    median_us: float
+    min_us: float
+    output_chars: int
+    output_tokens: int
+
+    @property
+    def key(self) -> str:
+        """Return the key identifying the case across runs."""
+        return f"{self.size or '-'}/{self.case}"
+
+
+async def async_measure(size: int | None, case: str, call: Callable[[], Any], output: Callable[[Any], str],
+                        setup: Callable[[], Awaitable[None]] | None = None, min_time: float = DEFAULT_MIN_TIME,
+                        max_calls: int = DEFAULT_MAX_CALLS) -> BenchmarkResult:
+    """Time a case until ``min_time`` seconds were spent in it, within ``MIN_CALLS`` and ``max_calls`` calls.
+
+    Args:
+        size (int | None): Number of entities of the home, None if the case does not depend on it.
+        case (str): Name of the case.
+        call (Callable[[], Any]): Code to time.
+        output (Callable[[Any], str]): Text produced by a call, to measure its size.
+        setup (Callable[[], Awaitable[None]] | None): Untimed preparation of each call.
+        min_time (float): Time (in seconds) to spend calling the case.
+        max_calls (int): Most calls.
+    Returns:
+        BenchmarkResult: Timings and output size of the case.
+    """
+    durations: list[float] = []
+    result = None
+
+    while len(durations) < MIN_CALLS or (sum(durations) < min_time and len(durations) < max_calls):
+        if setup is not None:
+            await setup()
+        started_at = time.perf_counter()
+        result = call()
+        durations.append(time.perf_counter() - started_at)
+
+    text = output(result)
+    return BenchmarkResult(
+        size, case, len(durations),
+        statistics.fmean(durations) * 1e6, statistics.median(durations) * 1e6, min(durations) * 1e6,
+        len(text), estimate_tokens(text),
+    )
+
+
+def _build_response(entity_ids: list[str], actions: int) -> str:
+    """Build the content of a Perplexity response suggesting ``actions`` actions."""
+    return json.dumps({
+        "content": "Done! I turned off the kitchen lights, and it is 21 degrees in the living room.",
+        "actions": [
+            {"domain": "light", "service": "turn_on", "target": entity_ids[index % len(entity_ids)], "parameters": {"brightness_pct": 40}}
+            for index in range(actions)
+        ],
+    })
+
+
+async def async_run_size(size: int, min_time: float, max_calls: int) -> list[BenchmarkResult]:
+    """Run the context building cases on a synthetic home of ``size`` entities.
+
+    Args:
+        size (int): Number of entities.
+        min_time (float): Time (in seconds) to spend on each case.
+        max_calls (int): Most calls of each case.
+    Returns:
+        list[BenchmarkResult]: Result of each case.
+    """
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_create_hass(config_dir)
+        try:
+            entry = add_config_entry(hass)
+            home = await async_populate(hass, entry, size)
+            agent = PerplexityAgent(hass, entry.entry_id)
+            agent.async_start() # The first build also stores the default exposure of every entity
+            await hass.async_block_till_done()
+
+            index = agent._entity_index
+            changes = 0
+
+            def _rebuild() -> str:
+                index.async_rebuild()
+                return index.summary
+
+            async def _async_change_state() -> None:
+                # A state change invalidates the summary, as between two requests of a live instance
+                nonlocal changes
+                changes += 1
+                entity_id = index.entity_ids[changes % len(index.entity_ids)]
+                hass.states.async_set(entity_id, str(changes), hass.states.get(entity_id).attributes)
+                await hass.async_block_till_done()
+
+            user_messages = [agent._build_user_message(PROMPT, "Benchmark")]
+            summary = agent._generate_entities_summary()
+            context = agent._get_entities_context(True, PROMPT)
+            messages = agent._build_messages(context, HISTORY, user_messages)
+
+            measure = lambda case, call, output, setup=None: async_measure(size, case, call, output, setup, min_time, max_calls)
+            results = [
+                await measure("index_rebuild", _rebuild, str),
+                await measure("entities_summary", agent._generate_entities_summary, str, _async_change_state),
+                await measure("relevant_context", lambda: agent._get_entities_context(True, PROMPT), str),
+                await measure("messages", lambda: agent._build_messages(context, HISTORY, user_messages), json.dumps),
+                await measure("messages_all_entities", lambda: agent._build_messages(summary, HISTORY, user_messages), json.dumps),
+                await measure("payload", lambda: json.dumps(agent._build_payload(DEFAULT_MODEL, messages)), str),
+                await measure("token_estimate", lambda: estimate_messages_tokens(messages), lambda _: ""),
+            ]
+
+            # Sending every entity makes most requests exceed the input token budget of large homes
+            hass.config_entries.async_update_entry(entry, options={CONF_CONTEXT_TOP_K: 0})
+            budget = int(agent._get_config(CONF_INPUT_TOKEN_BUDGET, DEFAULT_INPUT_TOKEN_BUDGET))
+            results.append(await measure("compaction_all_entities", lambda: agent._compact_request(budget, user_messages, HISTORY, True, PROMPT)[0], json.dumps))
+
+            _LOGGER.info("Home of %d entities: %d exposed, %d areas, %d devices", size, len(index.entity_ids), home.area_count, home.device_count)
+            agent.async_stop()
+            return results
+        finally:
+            await hass.async_stop(force=True)
+
+
+async def async_run_parsing(min_time: float, max_calls: int) -> list[BenchmarkResult]:
+    """Run the response parsing cases, which do not depend on the size of the home.
+
+    Args:
+        min_time (float): Time (in seconds) to spend on each case.
+        max_calls (int): Most calls of each case.
+    Returns:
+        list[BenchmarkResult]: Result of each case.
+    """
+    entity_ids = [f"light.benchmark_{index}" for index in range(max(RESPONSE_ACTIONS) or 1)]
+    results = []
+    for actions in RESPONSE_ACTIONS:
+        content = _build_response(entity_ids, actions)
+        results.append(await async_measure(None, f"parse_response[{actions} actions]", lambda: PerplexityAgentResponse.model_validate_json(content), lambda _: content, None, min_time, max_calls))
+    return results
+
+
+def _baseline_medians(baseline: dict) -> dict[str, float]:
+    """Return the median time of each case of a baseline run, by key."""
+    return {f"{result['size'] or '-'}/{result['case']}": result["median_us"] for result in baseline["results"]}
+
+
+def speed_ratio(results: list[BenchmarkResult], baseline: dict) -> float:
+    """Return how much longer this machine takes than the baseline one, as the median ratio of the case times.
+
+    Args:
+        results (list[BenchmarkResult]): Results of this run.
+        baseline (dict): JSON report of the baseline run.
+    Returns:
+        float: Ratio of this run's times to the baseline's, 1 if no case is shared.
+    """
+    baseline_medians = _baseline_medians(baseline)
+    ratios = [result.median_us / baseline_medians[result.key] for result in results if baseline_medians.get(result.key)]
+    return statistics.median(ratios) if ratios else 1.0
+
+
+def compare(results: list[BenchmarkResult], baseline: dict, max_regression: float, scale: float = 1.0) -> list[str]:
+    """Compare the median time of each case with a baseline run.
+
+    Args:
+        results (list[BenchmarkResult]): Results of this run.
+        baseline (dict): JSON report of the baseline run.
+        max_regression (float): Largest accepted slowdown, as a fraction of the baseline time.
+        scale (float): Factor applied to the baseline times, to compare runs made on machines of another speed.
+    Returns:
+        list[str]: Description of each regression.
+    """
+    baseline_medians = {key: median_us * scale for key, median_us in _baseline_medians(baseline).items()}
+    regressions = []
+    for result in results:
+        reference = baseline_medians.get(result.key)
+        if reference and result.median_us > reference * (1 + max_regression):
+            regressions.append(f"{result.key}: {result.median_us:.1f} µs, was {reference:.1f} µs (+{result.median_us / reference - 1:.0%})")
+    return regressions
+
+
+def format_table(results: list[BenchmarkResult]) -> str:
+    """Format the results as a text table."""
+    lines = [f"{'size':>7}  {'case':<28} {'calls':>6} {'mean µs':>12} {'median µs':>12} {'min µs':>12} {'chars':>10} {'~tokens':>9}"]
+    lines.extend(
+        f"{result.size or '-':>7}  {result.case:<28} {result.calls:>6} {result.mean_us:>12.1f} {result.median_us:>12.1f} {result.min_us:>12.1f} {result.output_chars:>10} {result.output_tokens:>9}"
+        for result in results
+    )
+    return "\n".join(lines)
+
+
+async def async_main(args: argparse.Namespace) -> int:
+    """Run the benchmarks, print their results and compare them with the baseline.
+
+    Returns:
+        int: Exit code, 1 if a case regressed beyond the accepted slowdown.
+    """
+    results = await async_run_parsing(args.min_time, args.max_calls)
+    for size in args.sizes:
+        results.extend(await async_run_size(size, args.min_time, args.max_calls))
+
+    print(format_table(results))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"python": platform.python_version(), "homeassistant": HA_VERSION, "results": [asdict(result) for result in results]}, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+
+        scale = speed_ratio(results, baseline) if args.normalize else 1.0
+        if args.normalize:
+            print(f"\nThis run took {scale:.2f} times as long as the baseline, whose times are scaled accordingly.")
+
+        regressions = compare(results, baseline, args.max_regression, scale)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.max_regression:.0%}:")
+            print("\n".join(f"  {regression}" for regression in regressions))
+            return 1
+
+    return 0
+
+
+def main() -> None:
+    """Parse the command line and run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Number of entities of each synthetic home.")
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME, help="Seconds spent measuring each case.")
+    parser.add_argument("--max-calls", type=int, default=DEFAULT_MAX_CALLS, help="Most calls of each case.")
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare the results with this JSON file of a previous run.")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Largest accepted slowdown against the baseline, as a fraction.")
+    parser.add_argument("--normalize", action="store_true", help="Scale the baseline times to the speed of this machine, so that only the cases slowing down more than the others are reported.")
+    parser.add_argument("--verbose", action="store_true", help="Log the size of each synthetic home.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    _LOGGER.setLevel(logging.INFO if args.verbose else logging.WARNING)
+    sys.exit(asyncio.run(async_main(args)))
+
+
+if __name__ == "__main__":
+    main()
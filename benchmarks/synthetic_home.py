@@ -0,0 +1,156 @@
+"""Synthetic Home Assistant instance, with registries, states and exposure settings of a configurable size.
+
+Everything lives in memory and in a temporary config directory: no integration is set up and nothing
+reaches the network, so the benchmarks can run in CI-like environments.
+"""
+import random
+
+from dataclasses import dataclass
+from homeassistant.components.homeassistant.exposed_entities import DATA_EXPOSED_ENTITIES, ExposedEntities, async_expose_entity
+from homeassistant.config_entries import ConfigEntries, ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import area_registry, category_registry, device_registry, entity_registry, floor_registry, label_registry
+
+from custom_components.perplexity_assistant.const import CONF_API_KEY, DOMAIN
+
+
+ROOMS: tuple[str, ...] = (
+    "Living Room", "Kitchen", "Bedroom", "Bathroom", "Office", "Garage", "Hallway", "Dining Room",
+    "Guest Room", "Laundry", "Basement", "Attic", "Garden", "Patio", "Nursery", "Playroom",
+)
+
+# Domain, share of the entities, device classes and states of each kind of entity
+ENTITY_KINDS: tuple[tuple[str, float, tuple[str | None, ...], tuple[str, ...]], ...] = (
+    ("light", 0.22, (None,), ("on", "off")),
+    ("switch", 0.12, ("outlet", "switch"), ("on", "off")),
+    ("sensor", 0.30, ("temperature", "humidity", "power", "energy"), ("19.5", "21.0", "47", "1250.3")),
+    ("binary_sensor", 0.12, ("door", "window", "motion"), ("on", "off")),
+    ("cover", 0.05, ("blind", "garage"), ("open", "closed")),
+    ("climate", 0.04, (None,), ("heat", "off", "auto")),
+    ("media_player", 0.05, ("speaker", "tv"), ("playing", "idle", "off")),
+    ("automation", 0.10, (None,), ("on", "off")),   # Not exposed by default
+)
+SENSOR_UNITS: dict[str, str] = {"temperature": "°C", "humidity": "%", "power": "W", "energy": "kWh"}
+
+ENTITIES_PER_DEVICE: int = 4
+ENTITIES_PER_AREA: int = 25
+OWN_AREA_SHARE: float = 0.1     # Entities placed in another area than their device
+ALIAS_SHARE: float = 0.05       # Entities with an alias
+UNEXPOSED_SHARE: float = 0.05   # Entities explicitly hidden from the assistant
+
+
+@dataclass
+class SyntheticHome:
+    """Summary of a synthetic instance."""
+    entry: ConfigEntry
+    entity_ids: list[str]
+    area_count: int
+    device_count: int
+
+
+async def async_create_hass(config_dir: str) -> HomeAssistant:
+    """Create a Home Assistant instance with empty registries and exposure settings.
+
+    Args:
+        config_dir (str): Configuration directory, usually temporary.
+    Returns:
+        HomeAssistant: The instance, not started.
+    """
+    hass = HomeAssistant(config_dir)
+    hass.config.skip_pip = True
+
+    for registry in (category_registry, label_registry, floor_registry, area_registry, device_registry, entity_registry):
+        await registry.async_load(hass)
+
+    hass.config_entries = ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+
+    exposed_entities = ExposedEntities(hass)
+    await exposed_entities.async_initialize()
+    hass.data[DATA_EXPOSED_ENTITIES] = exposed_entities
+
+    return hass
+
+
+def add_config_entry(hass: HomeAssistant, options: dict | None = None) -> ConfigEntry:
+    """Add a Perplexity Assistant config entry, without setting it up.
+
+    Args:
+        hass (HomeAssistant): Home Assistant instance.
+        options (dict | None): Options of the entry.
+    Returns:
+        ConfigEntry: The entry.
+    """
+    entry = ConfigEntry(
+        domain=DOMAIN, title="Perplexity Assistant", data={CONF_API_KEY: "pplx-benchmark"}, options=options or {},
+        source="user", version=1, minor_version=1, unique_id=None, discovery_keys={}, subentries_data=None,
+    )
+    hass.config_entries._entries[entry.entry_id] = entry # Like the test helpers of Home Assistant, as the entry is never set up
+    return entry
+
+
+async def async_populate(hass: HomeAssistant, entry: ConfigEntry, size: int, seed: int = 0) -> SyntheticHome:
+    """Fill the registries and the state machine with a synthetic home of ``size`` entities.
+
+    Entities belong to devices spread over areas, some override the area of their device or have an alias,
+    and a few are explicitly hidden from the assistant, on top of the domains hidden by default.
+
+    Args:
+        hass (HomeAssistant): Home Assistant instance.
+        entry (ConfigEntry): Config entry the devices belong to.
+        size (int): Number of entities.
+        seed (int): Seed of the random choices, so that runs are comparable.
+    Returns:
+        SyntheticHome: Summary of the home.
+    """
+    rng = random.Random(seed)
+    areas = area_registry.async_get(hass)
+    devices = device_registry.async_get(hass)
+    entities = entity_registry.async_get(hass)
+
+    area_ids = [
+        areas.async_create(f"{ROOMS[index % len(ROOMS)]} {index // len(ROOMS) + 1}").id
+        for index in range(max(1, size // ENTITIES_PER_AREA))
+    ]
+    device_ids = [
+        devices.async_get_or_create(config_entry_id=entry.entry_id, identifiers={("benchmark", str(index))}, name=f"Device {index}", suggested_area=None).id
+        for index in range(max(1, size // ENTITIES_PER_DEVICE))
+    ]
+    for index, device_id in enumerate(device_ids):
+        devices.async_update_device(device_id, area_id=area_ids[index % len(area_ids)])
+
+    kinds = [kind for kind in ENTITY_KINDS for _ in range(round(kind[1] * 100))]
+    entity_ids: list[str] = []
+
+    for index in range(size):
+        domain, _, device_classes, states = kinds[index % len(kinds)]
+        device_class = rng.choice(device_classes)
+        device_index = index // ENTITIES_PER_DEVICE % len(device_ids)
+        room = ROOMS[device_index % len(area_ids) % len(ROOMS)]
+        name = f"{room} {device_class or domain} {index}".replace("_", " ").title()
+
+        ha_entity = entities.async_get_or_create(
+            domain, "benchmark", str(index), suggested_object_id=name.lower().replace(" ", "_"),
+            device_id=device_ids[device_index], original_name=name, original_device_class=device_class,
+        )
+        own_area, alias = rng.random() < OWN_AREA_SHARE, rng.random() < ALIAS_SHARE
+        if own_area or alias:
+            entities.async_update_entity(
+                ha_entity.entity_id,
+                area_id=rng.choice(area_ids) if own_area else None,
+                aliases={f"{room} {domain} alias {index}"} if alias else set(),
+            )
+
+        attributes: dict = {"friendly_name": name}
+        if device_class:
+            attributes["device_class"] = device_class
+        if unit := SENSOR_UNITS.get(device_class or ""):
+            attributes["unit_of_measurement"] = unit
+        hass.states.async_set(ha_entity.entity_id, rng.choice(states), attributes)
+        entity_ids.append(ha_entity.entity_id)
+
+    for entity_id in rng.sample(entity_ids, int(size * UNEXPOSED_SHARE)):
+        async_expose_entity(hass, "conversation", entity_id, False)
+
+    await hass.async_block_till_done()
+    return SyntheticHome(entry, entity_ids, len(area_ids), len(device_ids))
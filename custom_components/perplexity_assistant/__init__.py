@@ -3,7 +3,6 @@ import logging
 import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.components import conversation as ha_conversation
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.typing import ConfigType
@@ -11,9 +10,13 @@ from typing import Any
 
 from .conversation import PerplexityAgent
 from .const import *
+from .metrics import PrometheusMetricsView
+from .scheduler import PRIORITIES
 
 # Platforms we set up when requested
 PLATFORMS: list[str] = ["sensor", "switch"]
+# Platforms we always set up
+AGENT_PLATFORMS: list[str] = ["conversation"]
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -31,6 +34,9 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """
     _LOGGER.debug("Setup of the Perplexity Assistant module")
     
+    # Views cannot be unregistered: the endpoint answers 404 unless an entry enables it
+    hass.http.register_view(PrometheusMetricsView())
+    
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -52,10 +58,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     
     agent = PerplexityAgent(hass, entry.entry_id)
+    agent.async_start()
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = agent
     
-    # Register the conversation agent and service
-    ha_conversation.async_set_agent(hass, entry, agent)
+    # Register the conversation entity and service
+    await hass.config_entries.async_forward_entry_setups(entry, AGENT_PLATFORMS)
     service_schema = vol.Schema({
         vol.Required("prompt"): cv.string,
         vol.Optional("model"): cv.string,
@@ -63,11 +70,37 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         vol.Optional("execute_actions"): cv.boolean,
         vol.Optional("force_actions_execution"): cv.boolean,
         vol.Optional("pass_entity_context"): cv.boolean,
-        vol.Optional("data_recency"): vol.In(["day", "week", "month", "year"])
+        vol.Optional("data_recency"): vol.In(["day", "week", "month", "year"]),
+        vol.Optional("stream_progress"): cv.boolean,
+        vol.Optional("cache"): vol.In(["bypass", "use", "refresh"]),
+        vol.Optional("priority"): vol.In(list(PRIORITIES))
     })
     
     hass.services.async_register(DOMAIN, "ask", agent.async_ask, schema=service_schema, supports_response="optional")
     
+    batch_service_schema = vol.Schema({
+        vol.Required("prompts"): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional("model"): cv.string,
+        vol.Optional("enable_websearch"): cv.boolean,
+        vol.Optional("execute_actions"): cv.boolean,
+        vol.Optional("force_actions_execution"): cv.boolean,
+        vol.Optional("pass_entity_context"): cv.boolean,
+        vol.Optional("data_recency"): vol.In(["day", "week", "month", "year"]),
+        vol.Optional("cache"): vol.In(["bypass", "use", "refresh"]),
+        vol.Optional("priority"): vol.In(list(PRIORITIES)),
+        vol.Optional("max_concurrency", default=DEFAULT_ASK_MANY_CONCURRENCY): vol.All(vol.Coerce(int), vol.Range(min=1, max=20))
+    })
+    
+    hass.services.async_register(DOMAIN, "ask_many", agent.async_ask_many, schema=batch_service_schema, supports_response="optional")
+    
+    profile_service_schema = vol.Schema({
+        vol.Optional("requests"): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_PROFILE_REQUESTS)),
+        vol.Optional("duration", default=DEFAULT_PROFILE_DURATION): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_PROFILE_DURATION)),
+        vol.Optional("trace_memory", default=False): cv.boolean
+    })
+    
+    hass.services.async_register(DOMAIN, "profile", agent.async_profile, schema=profile_service_schema)
+    
     return True
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -84,10 +117,15 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """
     _LOGGER.debug("Unloading Perplexity Assistant config entry")
     
-    hass.data.get(DOMAIN, {}).pop(entry.entry_id, None) # Remove agent from data
-    hass.services.async_remove(DOMAIN, "ask") # Remove service
+    agent: PerplexityAgent | None = hass.data.get(DOMAIN, {}).pop(entry.entry_id, None) # Remove agent from data
+    if agent:
+        agent.async_stop() # Unsubscribe from entity updates
+    hass.services.async_remove(DOMAIN, "ask") # Remove services
+    hass.services.async_remove(DOMAIN, "ask_many")
+    hass.services.async_remove(DOMAIN, "profile")
 
     # Unload platforms
+    await hass.config_entries.async_unload_platforms(entry, AGENT_PLATFORMS)
     await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     
     return True
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""Grouped, concurrent execution of the actions suggested by Perplexity."""
+import asyncio
+import json
+import logging
+
+from dataclasses import dataclass, field
+from homeassistant.core import Context, HomeAssistant
+
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_CONCURRENT_ACTION_GROUPS: int = 4   # Service calls running at the same time
+
+ACTION_SUCCESS: str = "success"
+ACTION_FAILED: str = "failed"
+ACTION_TIMEOUT: str = "timeout"
+ACTION_SKIPPED: str = "skipped"
+ACTION_REJECTED: str = "rejected"
+
+
+@dataclass
+class ActionCall:
+    """Service call of a single action, or the reason it was skipped or rejected."""
+    domain: str
+    service: str
+    target: str
+    data: dict = field(default_factory=dict)
+    skip_reason: str | None = None
+    rejection: tuple[str, str] | None = None  # Reason code and message of an invalid action
+    original_target: str | None = None        # Target proposed by Perplexity, if it was resolved to another entity
+
+
+@dataclass
+class ActionGroup:
+    """Actions calling the same service with the same parameters, merged into one call."""
+    domain: str
+    service: str
+    data: dict
+    entity_ids: list[str] = field(default_factory=list)
+    indexes: list[int] = field(default_factory=list)
+
+
+def split_entity_ids(target: str | list | None) -> list[str]:
+    """Split the target of an action into entity IDs.
+
+    Args:
+        target (str | list | None): Entity ID, comma separated entity IDs or list of entity IDs.
+    Returns:
+        list[str]: Entity IDs, without duplicates.
+    """
+    if not target:
+        return []
+
+    items = target if isinstance(target, list) else str(target).split(",")
+    return list(dict.fromkeys(item.strip() for item in items if item and item.strip()))
+
+
+def group_calls(calls: list[ActionCall]) -> list[ActionGroup]:
+    """Merge the calls sharing a domain, service and parameters into a single call targeting all their entities.
+
+    Args:
+        calls (list[ActionCall]): Calls of the actions, in order.
+    Returns:
+        list[ActionGroup]: Groups, in the order of their first action.
+    """
+    groups: dict[tuple[str, str, str], ActionGroup] = {}
+
+    for index, call in enumerate(calls):
+        if call.skip_reason or call.rejection:
+            continue
+
+        data = {key: value for key, value in call.data.items() if key != "entity_id"}
+        key = (call.domain, call.service, json.dumps(data, sort_keys=True, default=str))
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = ActionGroup(call.domain, call.service, data)
+
+        group.indexes.append(index)
+        for entity_id in split_entity_ids(call.data.get("entity_id")):
+            if entity_id not in group.entity_ids:
+                group.entity_ids.append(entity_id)
+
+    return list(groups.values())
+
+
+class ActionExecutor:
+    """Execute the actions of a response as few concurrent service calls, and report how each went."""
+
+    def __init__(self, hass: HomeAssistant, max_concurrency: int = MAX_CONCURRENT_ACTION_GROUPS) -> None:
+        """Initialize the executor.
+
+        Args:
+            hass (HomeAssistant): Home Assistant instance.
+            max_concurrency (int): Service calls running at the same time.
+        """
+        self.hass: HomeAssistant = hass
+        self.max_concurrency: int = max_concurrency
+
+    async def async_execute(self, calls: list[ActionCall], timeout: float | None = None, context: Context | None = None) -> list[dict]:
+        """Execute actions and wait for their completion.
+
+        Args:
+            calls (list[ActionCall]): Calls of the actions, in order.
+            timeout (float | None): Time (in seconds) given to all the actions, none of them is started if it is 0.
+            context (Context | None): Context of the originating request.
+        Returns:
+            list[dict]: Result of each action, in order: {"domain", "service", "target", "original_target", "status", "reason", "error"}.
+        """
+        results: list[dict] = [
+            {"domain": call.domain, "service": call.service, "target": call.target, "original_target": call.original_target, "status": ACTION_REJECTED, "reason": call.rejection[0], "error": call.rejection[1]}
+            if call.rejection else
+            {"domain": call.domain, "service": call.service, "target": call.target, "original_target": call.original_target, "status": ACTION_SKIPPED, "reason": None, "error": call.skip_reason}
+            for call in calls
+        ]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _async_execute_group(group: ActionGroup) -> None:
+            status, error = ACTION_SUCCESS, None
+            data = {**group.data, "entity_id": group.entity_ids} if group.entity_ids else group.data
+
+            try:
+                async with asyncio.timeout(timeout):
+                    async with semaphore:
+                        _LOGGER.debug("Executing action %s.%s on %s with parameters %s", group.domain, group.service, group.entity_ids, group.data)
+                        await self.hass.services.async_call(group.domain, group.service, data, blocking=True, context=context)
+            except TimeoutError:
+                status, error = ACTION_TIMEOUT, "Action did not complete in time."
+            except Exception as e:
+                status, error = ACTION_FAILED, str(e) or type(e).__name__
+
+            if error:
+                _LOGGER.warning("Failed to execute action %s.%s on %s: %s", group.domain, group.service, group.entity_ids, error)
+
+            for index in group.indexes:
+                results[index]["status"] = status
+                results[index]["error"] = error
+
+        groups = group_calls(calls)
+        if groups and timeout is not None and timeout <= 0:
+            _LOGGER.warning("No time left before the request deadline, skipping %d action(s).", sum(len(group.indexes) for group in groups))
+            for group in groups:
+                for index in group.indexes:
+                    results[index]["status"] = ACTION_SKIPPED
+                    results[index]["error"] = "No time left before the request deadline."
+        elif groups:
+            await asyncio.gather(*(_async_execute_group(group) for group in groups))
+
+        return results
@@ -0,0 +1,141 @@
+"""LRU response cache with per-entry TTL for the Perplexity Assistant service calls."""
+import copy
+import hashlib
+import json
+import logging
+import time
+
+from collections import OrderedDict
+from typing import Any
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import *
+
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION: int = 1
+STORAGE_SAVE_DELAY: int = 30 # in seconds
+
+
+class ResponseCache:
+    """Bounded LRU cache of processed responses, optionally persisted through HA's Store."""
+
+    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+        """Initialize the response cache.
+
+        Args:
+            hass (HomeAssistant): Home Assistant instance.
+            config_entry (ConfigEntry): Configuration entry the cache belongs to.
+        """
+        self.hass: HomeAssistant = hass
+        self.config_entry: ConfigEntry = config_entry
+
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._store: Store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{config_entry.entry_id}.response_cache")
+        self._loaded: bool = False
+
+    def _get_config(self, key: str, default: Any = None) -> Any:
+        """Helper to get configuration options with a default.
+
+        Args:
+            key (str): Configuration key.
+            default (any): Default value if key is not found.
+        Returns:
+            any: Configuration value or default.
+        """
+        return self.config_entry.options.get(key, self.config_entry.data.get(key, default))
+
+    @property
+    def enabled(self) -> bool:
+        """Return True if responses should be cached."""
+        return self._get_config(CONF_RESPONSE_CACHE_TTL, DEFAULT_RESPONSE_CACHE_TTL) > 0
+
+    @property
+    def persistent(self) -> bool:
+        """Return True if the cache should survive restarts."""
+        return self._get_config(CONF_PERSIST_RESPONSE_CACHE, DEFAULT_PERSIST_RESPONSE_CACHE)
+
+    @staticmethod
+    def make_key(prompt: str, model: str, enable_websearch: bool, data_recency: str | None, context: str) -> str:
+        """Build the cache key of a request.
+
+        Args:
+            prompt (str): User prompt, normalised before hashing.
+            model (str): Model answering the request.
+            enable_websearch (bool): Whether web search is enabled for the request.
+            data_recency (str | None): Recency filter of the web search.
+            context (str): Context sent along the prompt (entities, custom system prompt, ...).
+        Returns:
+            str: Cache key.
+        """
+        normalised_prompt = " ".join(prompt.lower().split())
+        context_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()
+        fingerprint = json.dumps([normalised_prompt, model, enable_websearch, data_recency, context_hash])
+
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    async def _async_load(self) -> None:
+        """Load the persisted entries, once."""
+        if self._loaded:
+            return
+
+        self._loaded = True
+        if not self.persistent:
+            return
+
+        stored = await self._store.async_load() or {}
+        now = time.time()
+
+        for key, expires_at, value in stored.get("entries", []):
+            if expires_at > now:
+                self._entries[key] = (expires_at, value)
+
+        _LOGGER.debug("Loaded %d cached Perplexity responses from storage.", len(self._entries))
+
+    def _data_to_save(self) -> dict:
+        """Return the entries to persist, in LRU order."""
+        return {"entries": [[key, expires_at, value] for key, (expires_at, value) in self._entries.items()]}
+
+    async def async_get(self, key: str) -> dict | None:
+        """Return a copy of a cached response if it exists and has not expired.
+        Like ``set``, the cache never shares its copy with the caller.
+
+        Args:
+            key (str): Cache key.
+        Returns:
+            dict | None: Copy of the cached response, or None on a miss.
+        """
+        await self._async_load()
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: dict) -> None:
+        """Store a copy of a response, evicting the least recently used entries above the size limit.
+        The cache owns its copy, so that changes made to the response by the caller never reach the cache or its storage.
+
+        Args:
+            key (str): Cache key.
+            value (dict): Processed response to cache.
+        """
+        self._entries[key] = (time.time() + self._get_config(CONF_RESPONSE_CACHE_TTL, DEFAULT_RESPONSE_CACHE_TTL), copy.deepcopy(value))
+        self._entries.move_to_end(key)
+
+        max_size = self._get_config(CONF_RESPONSE_CACHE_SIZE, DEFAULT_RESPONSE_CACHE_SIZE)
+        while len(self._entries) > max_size:
+            self._entries.popitem(last=False)
+
+        if self.persistent:
+            self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY)
@@ -84,7 +84,7 @@ class PerplexityConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         # Define the data schema for the form
         STEP_USER_DATA_SCHEMA = vol.Schema({
             vol.Required(CONF_LANGUAGE, default=DEFAULT_LANGUAGE): SelectSelector({"options": SUPPORTED_LANGUAGES, "mode": "dropdown"}),
-            vol.Required(CONF_MODEL, default=DEFAULT_MODEL): SelectSelector({"options": SUPPORTED_MODELS, "mode": "dropdown"}),
+            vol.Required(CONF_MODEL, default=DEFAULT_MODEL): SelectSelector({"options": MODEL_OPTIONS, "mode": "dropdown"}),
             vol.Optional(CONF_CUSTOM_SYSTEM_PROMPT, default=""): text_selector,
             vol.Optional('advanced_configuration', default=False): BooleanSelector(),
         })
@@ -126,6 +126,7 @@ class PerplexityConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             vol.Required(CONF_CREATIVITY, default=DEFAULT_CREATIVITY): NumberSelector({"min": 0, "step": 0.01, "mode": "slider", "max": 1}),
             vol.Optional(CONF_DIVERSITY, default=DEFAULT_DIVERSITY): NumberSelector({"min": 0, "step": 0.01, "mode": "slider", "max": 1}),
             vol.Optional(CONF_FREQUENCY_PENALTY, default=DEFAULT_FREQUENCY_PENALTY): NumberSelector({"min": 0, "step": 0.01, "mode": "slider", "max": 1}),
+            vol.Optional(CONF_ENABLE_STREAMING, default=DEFAULT_ENABLE_STREAMING): BooleanSelector(),
         })
 
         return self.async_show_form(step_id="model_parameters", data_schema=STEP_USER_DATA_SCHEMA)
@@ -154,7 +155,6 @@ class PerplexityConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         # Define the data schema for the form
         STEP_USER_DATA_SCHEMA = vol.Schema({
             vol.Optional(CONF_ALLOW_ENTITIES_ACCESS, default=DEFAULT_ALLOW_ENTITIES_ACCESS): BooleanSelector(),
-            vol.Required(CONF_ENTITIES_SUMMARY_REFRESH_RATE, default=DEFAULT_ENTITIES_SUMMARY_REFRESH_RATE): NumberSelector({"min": 5, "step": 5, "mode": "box", "unit_of_measurement": "s", "max": 1800}),
             vol.Optional(CONF_ALLOW_ACTIONS_ON_ENTITIES, default=DEFAULT_ALLOW_ACTIONS_ON_ENTITIES): BooleanSelector(),
             vol.Optional(CONF_ENABLE_RESPONSE_ON_SPEAKERS, default=DEFAULT_ENABLE_RESPONSE_ON_SPEAKERS): BooleanSelector(),
             vol.Required(CONF_TTS_ENGINE, default=default_tts_entity): tts_engine_selector,
@@ -186,10 +186,12 @@ class PerplexityOptionsFlowHandler(config_entries.OptionsFlow):
                 return await self.async_step_authorization()
             if user_input["menu"] == "model_parameters":
                 return await self.async_step_model_parameters()
+            if user_input["menu"] == "performance":
+                return await self.async_step_performance()
 
         selector = SelectSelector(
             SelectSelectorConfig(
-                options=['api', 'model', 'model_parameters', 'authorization'],
+                options=['api', 'model', 'model_parameters', 'authorization', 'performance'],
                 mode=SelectSelectorMode.DROPDOWN,
                 translation_key="menu"
             )
@@ -271,7 +273,7 @@ class PerplexityOptionsFlowHandler(config_entries.OptionsFlow):
         # Define the options schema with current values as defaults
         options_schema = vol.Schema({
             vol.Required(CONF_LANGUAGE, default=current_language): SelectSelector(SelectSelectorConfig(options=SUPPORTED_LANGUAGES, mode=SelectSelectorMode.DROPDOWN)),
-            vol.Required(CONF_MODEL, default=current_model): SelectSelector(SelectSelectorConfig(options=SUPPORTED_MODELS, mode=SelectSelectorMode.DROPDOWN)),
+            vol.Required(CONF_MODEL, default=current_model): SelectSelector(SelectSelectorConfig(options=MODEL_OPTIONS, mode=SelectSelectorMode.DROPDOWN)),
             vol.Optional(CONF_CUSTOM_SYSTEM_PROMPT, default=current_custom_system_prompt): text_selector,
         })
         
@@ -303,6 +305,7 @@ class PerplexityOptionsFlowHandler(config_entries.OptionsFlow):
         current_creativity: str = self.config_entry.options.get(CONF_CREATIVITY, self.config_entry.data.get(CONF_CREATIVITY, DEFAULT_CREATIVITY))
         current_diversity: str = self.config_entry.options.get(CONF_DIVERSITY, self.config_entry.data.get(CONF_DIVERSITY, DEFAULT_DIVERSITY))
         current_frequency_penalty: str = self.config_entry.options.get(CONF_FREQUENCY_PENALTY, self.config_entry.data.get(CONF_FREQUENCY_PENALTY, DEFAULT_FREQUENCY_PENALTY))
+        current_enable_streaming: bool = self.config_entry.options.get(CONF_ENABLE_STREAMING, self.config_entry.data.get(CONF_ENABLE_STREAMING, DEFAULT_ENABLE_STREAMING))
         
         # Define the options schema with current values as defaults
         options_schema = vol.Schema({
@@ -310,6 +313,7 @@ class PerplexityOptionsFlowHandler(config_entries.OptionsFlow):
             vol.Required(CONF_CREATIVITY, default=current_creativity): NumberSelector({"min": 0, "step": 0.01, "mode": "slider", "max": 1}),
             vol.Optional(CONF_DIVERSITY, default=current_diversity): NumberSelector({"min": 0, "step": 0.01, "mode": "slider", "max": 1}),
             vol.Optional(CONF_FREQUENCY_PENALTY, default=current_frequency_penalty): NumberSelector({"min": 0, "step": 0.01, "mode": "slider", "max": 1}),
+            vol.Optional(CONF_ENABLE_STREAMING, default=current_enable_streaming): BooleanSelector(),
         })
         
         if user_input is not None:
@@ -336,7 +340,6 @@ class PerplexityOptionsFlowHandler(config_entries.OptionsFlow):
         # Show the form to update options
         default_provider = tts.async_default_engine(self.hass)
         current_notify_response: bool = self.config_entry.options.get(CONF_NOTIFY_RESPONSE, self.config_entry.data.get(CONF_NOTIFY_RESPONSE, DEFAULT_NOTIFY_RESPONSE))
-        current_entities_summary_refresh_rate: int = self.config_entry.options.get(CONF_ENTITIES_SUMMARY_REFRESH_RATE, self.config_entry.data.get(CONF_ENTITIES_SUMMARY_REFRESH_RATE, DEFAULT_ENTITIES_SUMMARY_REFRESH_RATE))
         current_tts_engine: str = self.config_entry.options.get(
             CONF_TTS_ENGINE,
             self.config_entry.data.get(CONF_TTS_ENGINE, f"tts.{default_provider}" if default_provider else DEFAULT_TTS),
@@ -348,9 +351,77 @@ class PerplexityOptionsFlowHandler(config_entries.OptionsFlow):
 
         # Define the options schema with current values as defaults
         options_schema = vol.Schema({
-            vol.Required(CONF_ENTITIES_SUMMARY_REFRESH_RATE, default=current_entities_summary_refresh_rate): NumberSelector({"min": 5, "step": 5, "mode": "box", "unit_of_measurement": "s", "max": 1800}),
             vol.Required(CONF_TTS_ENGINE, default=current_tts_engine): tts_engine_selector,
             vol.Optional(CONF_NOTIFY_RESPONSE, default=current_notify_response): BooleanSelector(),
         })
 
         return self.async_show_form(step_id="authorization", data_schema=options_schema,)
+    
+    async def async_step_performance(self, user_input: dict[str, any] | None = None) -> config_entries.ConfigFlowResult:
+        """Manage the options step.
+
+        Args:
+            user_input (dict | None): Dictionary containing the user input or None.
+        Returns:
+            ConfigFlowResult: Shows the form or creates the options entry.
+        """
+        if user_input is not None:
+            options = dict(self.config_entry.options)
+            options.update(user_input)
+            return self.async_create_entry(title="", data=options)
+
+        # Show the form to update options
+        current_response_cache_ttl: int = self.config_entry.options.get(CONF_RESPONSE_CACHE_TTL, self.config_entry.data.get(CONF_RESPONSE_CACHE_TTL, DEFAULT_RESPONSE_CACHE_TTL))
+        current_response_cache_size: int = self.config_entry.options.get(CONF_RESPONSE_CACHE_SIZE, self.config_entry.data.get(CONF_RESPONSE_CACHE_SIZE, DEFAULT_RESPONSE_CACHE_SIZE))
+        current_persist_response_cache: bool = self.config_entry.options.get(CONF_PERSIST_RESPONSE_CACHE, self.config_entry.data.get(CONF_PERSIST_RESPONSE_CACHE, DEFAULT_PERSIST_RESPONSE_CACHE))
+        current_enable_local_commands: bool = self.config_entry.options.get(CONF_ENABLE_LOCAL_COMMANDS, self.config_entry.data.get(CONF_ENABLE_LOCAL_COMMANDS, DEFAULT_ENABLE_LOCAL_COMMANDS))
+        current_enable_local_queries: bool = self.config_entry.options.get(CONF_ENABLE_LOCAL_QUERIES, self.config_entry.data.get(CONF_ENABLE_LOCAL_QUERIES, DEFAULT_ENABLE_LOCAL_QUERIES))
+        current_context_top_k: int = self.config_entry.options.get(CONF_CONTEXT_TOP_K, self.config_entry.data.get(CONF_CONTEXT_TOP_K, DEFAULT_CONTEXT_TOP_K))
+        current_always_include_entities: list[str] = self.config_entry.options.get(CONF_ALWAYS_INCLUDE_ENTITIES, self.config_entry.data.get(CONF_ALWAYS_INCLUDE_ENTITIES, DEFAULT_ALWAYS_INCLUDE_ENTITIES))
+        current_input_token_budget: int = self.config_entry.options.get(CONF_INPUT_TOKEN_BUDGET, self.config_entry.data.get(CONF_INPUT_TOKEN_BUDGET, DEFAULT_INPUT_TOKEN_BUDGET))
+        current_history_max_turns: int = self.config_entry.options.get(CONF_HISTORY_MAX_TURNS, self.config_entry.data.get(CONF_HISTORY_MAX_TURNS, DEFAULT_HISTORY_MAX_TURNS))
+        current_history_idle_timeout: int = self.config_entry.options.get(CONF_HISTORY_IDLE_TIMEOUT, self.config_entry.data.get(CONF_HISTORY_IDLE_TIMEOUT, DEFAULT_HISTORY_IDLE_TIMEOUT))
+        current_max_requests_per_minute: int = self.config_entry.options.get(CONF_MAX_REQUESTS_PER_MINUTE, self.config_entry.data.get(CONF_MAX_REQUESTS_PER_MINUTE, DEFAULT_MAX_REQUESTS_PER_MINUTE))
+        current_max_concurrent_requests: int = self.config_entry.options.get(CONF_MAX_CONCURRENT_REQUESTS, self.config_entry.data.get(CONF_MAX_CONCURRENT_REQUESTS, DEFAULT_MAX_CONCURRENT_REQUESTS))
+        current_max_retries: int = self.config_entry.options.get(CONF_MAX_RETRIES, self.config_entry.data.get(CONF_MAX_RETRIES, DEFAULT_MAX_RETRIES))
+        current_serve_stale_responses: bool = self.config_entry.options.get(CONF_SERVE_STALE_RESPONSES, self.config_entry.data.get(CONF_SERVE_STALE_RESPONSES, DEFAULT_SERVE_STALE_RESPONSES))
+        current_hedge_model: str = self.config_entry.options.get(CONF_HEDGE_MODEL, self.config_entry.data.get(CONF_HEDGE_MODEL, DEFAULT_HEDGE_MODEL))
+        current_hedge_delay_interactive: float = self.config_entry.options.get(CONF_HEDGE_DELAY_INTERACTIVE, self.config_entry.data.get(CONF_HEDGE_DELAY_INTERACTIVE, DEFAULT_HEDGE_DELAY_INTERACTIVE))
+        current_hedge_delay_service: float = self.config_entry.options.get(CONF_HEDGE_DELAY_SERVICE, self.config_entry.data.get(CONF_HEDGE_DELAY_SERVICE, DEFAULT_HEDGE_DELAY_SERVICE))
+        current_request_timeout_interactive: float = self.config_entry.options.get(CONF_REQUEST_TIMEOUT_INTERACTIVE, self.config_entry.data.get(CONF_REQUEST_TIMEOUT_INTERACTIVE, DEFAULT_REQUEST_TIMEOUT_INTERACTIVE))
+        current_request_timeout_service: float = self.config_entry.options.get(CONF_REQUEST_TIMEOUT_SERVICE, self.config_entry.data.get(CONF_REQUEST_TIMEOUT_SERVICE, DEFAULT_REQUEST_TIMEOUT_SERVICE))
+        current_auto_model_pro_threshold: int = self.config_entry.options.get(CONF_AUTO_MODEL_PRO_THRESHOLD, self.config_entry.data.get(CONF_AUTO_MODEL_PRO_THRESHOLD, DEFAULT_AUTO_MODEL_PRO_THRESHOLD))
+        current_auto_model_reasoning_threshold: int = self.config_entry.options.get(CONF_AUTO_MODEL_REASONING_THRESHOLD, self.config_entry.data.get(CONF_AUTO_MODEL_REASONING_THRESHOLD, DEFAULT_AUTO_MODEL_REASONING_THRESHOLD))
+        current_target_match_threshold: float = self.config_entry.options.get(CONF_TARGET_MATCH_THRESHOLD, self.config_entry.data.get(CONF_TARGET_MATCH_THRESHOLD, DEFAULT_TARGET_MATCH_THRESHOLD))
+        current_enable_metrics_endpoint: bool = self.config_entry.options.get(CONF_ENABLE_METRICS_ENDPOINT, self.config_entry.data.get(CONF_ENABLE_METRICS_ENDPOINT, DEFAULT_ENABLE_METRICS_ENDPOINT))
+        current_trace_response_events: bool = self.config_entry.options.get(CONF_TRACE_RESPONSE_EVENTS, self.config_entry.data.get(CONF_TRACE_RESPONSE_EVENTS, DEFAULT_TRACE_RESPONSE_EVENTS))
+
+        # Define the options schema with current values as defaults
+        options_schema = vol.Schema({
+            vol.Required(CONF_RESPONSE_CACHE_TTL, default=current_response_cache_ttl): NumberSelector({"min": 0, "step": 1, "mode": "box", "unit_of_measurement": "s", "max": 86400}),
+            vol.Required(CONF_RESPONSE_CACHE_SIZE, default=current_response_cache_size): NumberSelector({"min": 1, "step": 1, "mode": "box", "max": 10000}),
+            vol.Optional(CONF_PERSIST_RESPONSE_CACHE, default=current_persist_response_cache): BooleanSelector(),
+            vol.Optional(CONF_ENABLE_LOCAL_COMMANDS, default=current_enable_local_commands): BooleanSelector(),
+            vol.Optional(CONF_ENABLE_LOCAL_QUERIES, default=current_enable_local_queries): BooleanSelector(),
+            vol.Required(CONF_CONTEXT_TOP_K, default=current_context_top_k): NumberSelector({"min": 0, "step": 1, "mode": "box", "max": 5000}),
+            vol.Optional(CONF_ALWAYS_INCLUDE_ENTITIES, default=current_always_include_entities): EntitySelector(EntitySelectorConfig(multiple=True)),
+            vol.Required(CONF_INPUT_TOKEN_BUDGET, default=current_input_token_budget): NumberSelector({"min": 0, "step": 100, "mode": "box", "max": 200000}),
+            vol.Required(CONF_HISTORY_MAX_TURNS, default=current_history_max_turns): NumberSelector({"min": 0, "step": 1, "mode": "box", "max": 50}),
+            vol.Required(CONF_HISTORY_IDLE_TIMEOUT, default=current_history_idle_timeout): NumberSelector({"min": 0, "step": 1, "mode": "box", "unit_of_measurement": "s", "max": 86400}),
+            vol.Required(CONF_MAX_REQUESTS_PER_MINUTE, default=current_max_requests_per_minute): NumberSelector({"min": 0, "step": 1, "mode": "box", "max": 1000}),
+            vol.Required(CONF_MAX_CONCURRENT_REQUESTS, default=current_max_concurrent_requests): NumberSelector({"min": 1, "step": 1, "mode": "box", "max": 50}),
+            vol.Required(CONF_MAX_RETRIES, default=current_max_retries): NumberSelector({"min": 0, "step": 1, "mode": "box", "max": 10}),
+            vol.Optional(CONF_SERVE_STALE_RESPONSES, default=current_serve_stale_responses): BooleanSelector(),
+            vol.Required(CONF_HEDGE_MODEL, default=current_hedge_model): SelectSelector(SelectSelectorConfig(options=SUPPORTED_MODELS, mode=SelectSelectorMode.DROPDOWN)),
+            vol.Required(CONF_HEDGE_DELAY_INTERACTIVE, default=current_hedge_delay_interactive): NumberSelector({"min": 0, "step": 0.5, "mode": "box", "unit_of_measurement": "s", "max": 60}),
+            vol.Required(CONF_HEDGE_DELAY_SERVICE, default=current_hedge_delay_service): NumberSelector({"min": 0, "step": 0.5, "mode": "box", "unit_of_measurement": "s", "max": 600}),
+            vol.Required(CONF_REQUEST_TIMEOUT_INTERACTIVE, default=current_request_timeout_interactive): NumberSelector({"min": 1, "step": 1, "mode": "box", "unit_of_measurement": "s", "max": 300}),
+            vol.Required(CONF_REQUEST_TIMEOUT_SERVICE, default=current_request_timeout_service): NumberSelector({"min": 0, "step": 1, "mode": "box", "unit_of_measurement": "s", "max": 3600}),
+            vol.Required(CONF_AUTO_MODEL_PRO_THRESHOLD, default=current_auto_model_pro_threshold): NumberSelector({"min": 0, "step": 1, "mode": "box", "max": 20}),
+            vol.Required(CONF_AUTO_MODEL_REASONING_THRESHOLD, default=current_auto_model_reasoning_threshold): NumberSelector({"min": 0, "step": 1, "mode": "box", "max": 20}),
+            vol.Required(CONF_TARGET_MATCH_THRESHOLD, default=current_target_match_threshold): NumberSelector({"min": 0.5, "step": 0.01, "mode": "slider", "max": 1}),
+            vol.Optional(CONF_ENABLE_METRICS_ENDPOINT, default=current_enable_metrics_endpoint): BooleanSelector(),
+            vol.Optional(CONF_TRACE_RESPONSE_EVENTS, default=current_trace_response_events): BooleanSelector(),
+        })
+
+        return self.async_show_form(step_id="performance", data_schema=options_schema,)
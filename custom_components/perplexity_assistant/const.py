@@ -12,7 +12,6 @@ CONF_LANGUAGE: str = "language"
 CONF_CUSTOM_SYSTEM_PROMPT: str = "custom_system_prompt"
 CONF_ALLOW_ENTITIES_ACCESS: str = "allow_entities_access"
 CONF_ALLOW_ACTIONS_ON_ENTITIES: str = "allow_actions_on_entities"
-CONF_ENTITIES_SUMMARY_REFRESH_RATE: str = "entities_summary_refresh_rate"
 CONF_NOTIFY_RESPONSE: str = "notify_response"
 CONF_ENABLE_WEBSEARCH: str = "enable_web_search"
 CONF_ENABLE_RESPONSE_ON_SPEAKERS: str = "enable_response_on_speakers"
@@ -22,6 +21,32 @@ CONF_MAX_TOKENS: str = "max_tokens"
 CONF_CREATIVITY: str = "creativity"
 CONF_DIVERSITY: str = "diversity"
 CONF_FREQUENCY_PENALTY: str = "frequency_penalty"
+CONF_ENABLE_STREAMING: str = "enable_streaming"
+
+CONF_RESPONSE_CACHE_TTL: str = "response_cache_ttl"
+CONF_RESPONSE_CACHE_SIZE: str = "response_cache_size"
+CONF_PERSIST_RESPONSE_CACHE: str = "persist_response_cache"
+CONF_ENABLE_LOCAL_COMMANDS: str = "enable_local_commands"
+CONF_ENABLE_LOCAL_QUERIES: str = "enable_local_queries"
+CONF_CONTEXT_TOP_K: str = "context_top_k"
+CONF_ALWAYS_INCLUDE_ENTITIES: str = "always_include_entities"
+CONF_INPUT_TOKEN_BUDGET: str = "input_token_budget"
+CONF_HISTORY_MAX_TURNS: str = "history_max_turns"
+CONF_HISTORY_IDLE_TIMEOUT: str = "history_idle_timeout"
+CONF_MAX_REQUESTS_PER_MINUTE: str = "max_requests_per_minute"
+CONF_MAX_CONCURRENT_REQUESTS: str = "max_concurrent_requests"
+CONF_MAX_RETRIES: str = "max_retries"
+CONF_SERVE_STALE_RESPONSES: str = "serve_stale_responses"
+CONF_HEDGE_MODEL: str = "hedge_model"
+CONF_HEDGE_DELAY_INTERACTIVE: str = "hedge_delay_interactive"
+CONF_HEDGE_DELAY_SERVICE: str = "hedge_delay_service"
+CONF_REQUEST_TIMEOUT_INTERACTIVE: str = "request_timeout_interactive"
+CONF_REQUEST_TIMEOUT_SERVICE: str = "request_timeout_service"
+CONF_AUTO_MODEL_PRO_THRESHOLD: str = "auto_model_pro_threshold"
+CONF_AUTO_MODEL_REASONING_THRESHOLD: str = "auto_model_reasoning_threshold"
+CONF_TARGET_MATCH_THRESHOLD: str = "target_match_threshold"
+CONF_ENABLE_METRICS_ENDPOINT: str = "enable_metrics_endpoint"
+CONF_TRACE_RESPONSE_EVENTS: str = "trace_response_events"
 
 # Perplexity API endpoint
 BASE_URL: str = "https://api.perplexity.ai/chat/completions"
@@ -36,6 +61,17 @@ SUPPORTED_MODELS: list[dict] = [
     {"value": "sonar-reasoning-pro", "label": "Sonar Reasoning Pro"},
     {"value": "sonar-deep-research", "label": "Sonar Deep Research"}
 ]
+# Model picked for each prompt by the router, from its complexity
+AUTO_MODEL: str = "auto"
+MODEL_OPTIONS: list[dict] = [*SUPPORTED_MODELS, {"value": AUTO_MODEL, "label": "Auto"}]
+# Time given to each model to answer, in seconds
+MODEL_TIMEOUTS: dict[str, float] = {
+    "sonar": 30.0,
+    "sonar-pro": 60.0,
+    "sonar-reasoning": 90.0,
+    "sonar-reasoning-pro": 120.0,
+    "sonar-deep-research": 900.0,
+}
 SUPPORTED_LANGUAGES: list[dict] = [
     {"value": "en", "label": "English"},
     {"value": "fr", "label": "Français"},
@@ -58,13 +94,43 @@ DEFAULT_ALLOW_ACTIONS_ON_ENTITIES: bool = True
 DEFAULT_NOTIFY_RESPONSE: bool = False
 DEFAULT_ENABLE_WEBSEARCH: bool = False
 DEFAULT_ENABLE_RESPONSE_ON_SPEAKERS: bool = True
-DEFAULT_ENTITIES_SUMMARY_REFRESH_RATE: int = 10 # in seconds
 DEFAULT_TTS: str = "tts.google_translate_en_com"
 
 DEFAULT_MAX_TOKENS: int = 500               # Limit response length
 DEFAULT_CREATIVITY: float = 0.9             # Control creativity         0.1=more factual, 0.9=more creative
 DEFAULT_DIVERSITY: float = 0.95             # Control diversity          0.1=more focused, 0.9=more diverse
 DEFAULT_FREQUENCY_PENALTY: float = 0.5      # Reduce repetition          0.0=none, 1.0=full
+DEFAULT_ENABLE_STREAMING: bool = False      # Stream responses and fire progress events sentence by sentence
+
+DEFAULT_RESPONSE_CACHE_TTL: int = 0         # in seconds, 0 disables the response cache
+DEFAULT_RESPONSE_CACHE_SIZE: int = 128      # Max number of cached responses
+DEFAULT_PERSIST_RESPONSE_CACHE: bool = False
+DEFAULT_ENABLE_LOCAL_COMMANDS: bool = True  # Run simple device commands locally, without calling the API
+DEFAULT_ENABLE_LOCAL_QUERIES: bool = True   # Answer simple state questions locally, without calling the API
+DEFAULT_CONTEXT_TOP_K: int = 50             # Max entities sent as context, ranked by relevance, 0 sends them all
+DEFAULT_ALWAYS_INCLUDE_ENTITIES: list[str] = []
+DEFAULT_INPUT_TOKEN_BUDGET: int = 8000      # Max estimated input tokens per request, 0 disables the budget
+DEFAULT_HISTORY_MAX_TURNS: int = 3          # Turns remembered per conversation, 0 disables the history
+DEFAULT_HISTORY_IDLE_TIMEOUT: int = 600     # in seconds, idle conversations are forgotten after this delay
+DEFAULT_MAX_REQUESTS_PER_MINUTE: int = 50   # Requests sent to the API per minute, 0 disables the rate limit
+DEFAULT_MAX_CONCURRENT_REQUESTS: int = 4    # Requests sent to the API at the same time
+DEFAULT_MAX_RETRIES: int = 2                # Retries of rate limited, failed or timed out requests
+DEFAULT_SERVE_STALE_RESPONSES: bool = False # Answer repeated prompts with their last good response while the API is down
+DEFAULT_HEDGE_MODEL: str = "sonar"          # Faster model answering when the configured one is too slow
+DEFAULT_HEDGE_DELAY_INTERACTIVE: float = 0.0 # in seconds, voice and chat requests are hedged after this delay, 0 disables hedging
+DEFAULT_HEDGE_DELAY_SERVICE: float = 0.0    # in seconds, ask service requests are hedged after this delay, 0 disables hedging
+DEFAULT_MODEL_TIMEOUT: float = 60.0         # in seconds, for models missing from MODEL_TIMEOUTS
+DEFAULT_REQUEST_TIMEOUT_INTERACTIVE: float = 15.0 # in seconds, voice and chat requests are aborted after this delay
+DEFAULT_REQUEST_TIMEOUT_SERVICE: float = 0.0 # in seconds, ask service requests are aborted after this delay, 0 uses the model timeout
+DEFAULT_AUTO_MODEL_PRO_THRESHOLD: int = 3   # Complexity score from which the auto model picks sonar-pro
+DEFAULT_AUTO_MODEL_REASONING_THRESHOLD: int = 6 # Complexity score from which the auto model picks sonar-reasoning-pro
+DEFAULT_TARGET_MATCH_THRESHOLD: float = 0.75 # Similarity from which an unknown action target is replaced by the closest exposed entity, 1 disables it
+DEFAULT_ENABLE_METRICS_ENDPOINT: bool = False # Serve the performance metrics in the Prometheus text format
+DEFAULT_TRACE_RESPONSE_EVENTS: bool = False # Add the stage timings of a request to its response event
+DEFAULT_ASK_MANY_CONCURRENCY: int = 4       # Max concurrent requests of an ask_many batch
+DEFAULT_PROFILE_DURATION: int = 60          # in seconds, time window of the profile service
+MAX_PROFILE_DURATION: int = 3600            # in seconds, longest time window of the profile service
+MAX_PROFILE_REQUESTS: int = 1000            # Most requests profiled by the profile service
 
 # System prompt template for the AI assistant
 SYSTEM_PROMPT: str = f"""
@@ -1,26 +1,53 @@
 """Home Assistant conversation agent interface for Perplexity."""
 import aiohttp
+import asyncio
+import hashlib
 import json
 import logging
+import time
 
 from datetime import datetime
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.components.conversation import AbstractConversationAgent, ConversationInput, ConversationResult
-from homeassistant.core import ServiceCall, HomeAssistant
-from homeassistant.components.homeassistant.exposed_entities import async_should_expose
-from homeassistant.helpers import device_registry, entity_registry, aiohttp_client
+from homeassistant.components.conversation import AssistantContent, AssistantContentDeltaDict, ChatLog, ConversationEntity, ConversationEntityFeature, ConversationInput, ConversationResult
+from homeassistant.core import CALLBACK_TYPE, Context, ServiceCall, HomeAssistant, callback
+from homeassistant.helpers import aiohttp_client
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.intent import IntentResponse
 from homeassistant.const import __version__ as HA_VERSION
 from pydantic import BaseModel
-from typing import List, Optional, Any
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Any
 
+from .actions import ActionCall, ActionExecutor
+from .cache import ResponseCache
 from .const import *
+from .deadlines import Deadline
+from .entities import EntityIndex
+from .hedging import HedgeStats, async_hedge
+from .history import ConversationHistory
+from .local_commands import LocalCommandMatcher
+from .local_queries import LocalQueryResolver
+from .metrics import PerformanceMetrics
+from .profiling import PROFILE_STOP_UNLOAD, PipelineProfiler
+from .router import ModelRouter, RoutingDecision
+from .validation import ActionValidator
+from .resilience import CircuitBreaker, LastGoodResponses, get_retry_delay, is_retryable, parse_retry_after
+from .scheduler import PRIORITIES, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_NAMES, PRIORITY_SERVICE, RequestScheduler
 from .sensor import AlltimeBillSensor, MonthlyBillSensor
+from .streaming import SentenceStream, async_read_stream
+from .tokens import compact_prompt, estimate_messages_tokens, estimate_tokens
+from .tracing import Tracer, RequestTrace, annotate, record_stage, redact, trace_stage
 
 
 _LOGGER = logging.getLogger(__name__)
 
 
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
+    """Set up the Perplexity conversation entity from a config entry."""
+    async_add_entities([hass.data[DOMAIN][entry.entry_id]])
+
+
 class PerplexityAgentAction(BaseModel):
     """Represents an action suggested by the Perplexity agent."""
     domain: str
@@ -39,8 +66,15 @@ class PerplexityAgentResponse(BaseModel):
     actions: Optional[List[PerplexityAgentAction]]
     
 
-class PerplexityAgent(AbstractConversationAgent):
-    """Home Assistant conversation agent based on the Perplexity API."""
+class PerplexityAgent(ConversationEntity):
+    """Home Assistant conversation agent based on the Perplexity API.
+    Streamed answers are added to the chat log as they arrive, so that voice pipelines start speaking on the first sentence.
+    """
+    _attr_has_entity_name = True
+    _attr_name = None
+    _attr_supported_features = ConversationEntityFeature.CONTROL
+    _attr_supports_streaming = True
+
     RESPONSE_FORMAT: dict = {
             "type": "json_schema",
             "json_schema": {
@@ -58,14 +92,48 @@ class PerplexityAgent(AbstractConversationAgent):
         self.hass: HomeAssistant = hass
         self.config_entry: ConfigEntry = self.hass.config_entries.async_get_entry(config_entry_id)
         self.agent_name: str = self.config_entry.title
+        self._attr_unique_id = config_entry_id
 
-        self._summary: str | None = None
-        self._last_summary_update: datetime | None = None
-        self._session: aiohttp.ClientSession = aiohttp_client.async_get_clientsession(hass)
-        self._history: list[str] = ['', '', '', '', '', '']
-        self._history_index: int = 0
+        self._entity_index: EntityIndex = EntityIndex(hass)
+        self._response_cache: ResponseCache = ResponseCache(hass, self.config_entry)
+        self._command_matcher: LocalCommandMatcher = LocalCommandMatcher(hass, self._entity_index)
+        self._query_resolver: LocalQueryResolver = LocalQueryResolver(hass, self._entity_index)
+        self._history: ConversationHistory = ConversationHistory(self.config_entry)
+        self._scheduler: RequestScheduler = RequestScheduler(hass, self.config_entry)
+        self._circuit_breaker: CircuitBreaker = CircuitBreaker()
+        self._last_good_responses: LastGoodResponses = LastGoodResponses()
+        self._hedge_stats: HedgeStats = HedgeStats()
+        self._router: ModelRouter = ModelRouter(self.config_entry)
+        self._action_executor: ActionExecutor = ActionExecutor(hass)
+        self._action_validator: ActionValidator = ActionValidator(hass, self._entity_index)
+        self._metrics: PerformanceMetrics = PerformanceMetrics()
+        self._tracer: Tracer = Tracer()
+        self._profiler: PipelineProfiler = PipelineProfiler(hass, self._tracer)
+        self._cancel_circuit_breaker_refresh: CALLBACK_TYPE | None = None
         self._last_conversation_id: str | None = None
-    
+        self._inflight_requests: dict[str, asyncio.Future] = {}
+
+    @callback
+    def async_start(self) -> None:
+        """Start the background indexes used by the agent."""
+        self._entity_index.async_start()
+        self._action_validator.async_start()
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop the background indexes used by the agent."""
+        self._entity_index.async_stop()
+        self._action_validator.async_stop()
+        self._scheduler.async_stop()
+        self._history.clear()
+        self._last_good_responses.clear()
+        self._tracer.clear()
+        if self._profiler.active:
+            self.hass.async_create_task(self._profiler.async_stop(PROFILE_STOP_UNLOAD))
+        if self._cancel_circuit_breaker_refresh:
+            self._cancel_circuit_breaker_refresh()
+            self._cancel_circuit_breaker_refresh = None
+
     def _get_config(self, key: str, default: Any = None) -> Any:
         """Helper to get configuration options with a default.
 
@@ -77,6 +145,38 @@ class PerplexityAgent(AbstractConversationAgent):
         """
         return self.config_entry.options.get(key, self.config_entry.data.get(key, default))
 
+    @property
+    def _session(self) -> aiohttp.ClientSession:
+        """Return the shared HTTP session, created on the first request so that building contexts never needs the network stack."""
+        return aiohttp_client.async_get_clientsession(self.hass)
+
+    @property
+    def metrics(self) -> PerformanceMetrics:
+        """Return the performance metrics of the agent."""
+        return self._metrics
+
+    @property
+    def diagnostics(self) -> dict:
+        """Return the statistics and latest request traces of the agent, with their secrets redacted."""
+        return {
+            "metrics": {key: {"state": state, "attributes": attributes} for key, (state, attributes) in self._metrics.sensor_states.items()},
+            "scheduler": self._scheduler.stats,
+            "circuit_breaker": redact({"state": self._circuit_breaker.state, **self._circuit_breaker.attributes}),
+            "hedging": self._hedge_stats.attributes,
+            "routing": self._router.stats,
+            "traces": self._tracer.traces,
+        }
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, self.config_entry.entry_id)},
+            name="Perplexity Assistant",
+            manufacturer="Perplexity AI",
+            model="Perplexity API",
+        )
+
     @property
     def attribution(self) -> str:
         """Return the attribution for the integration."""
@@ -93,197 +193,649 @@ class PerplexityAgent(AbstractConversationAgent):
         Returns:
             str: Summary of entities.
         """
-        if self._summary and self._last_summary_update:
-            # Regenerate summary every self.entities_summary_refresh_rate seconds
-            if (datetime.now() - self._last_summary_update).total_seconds() < self._get_config(CONF_ENTITIES_SUMMARY_REFRESH_RATE, DEFAULT_ENTITIES_SUMMARY_REFRESH_RATE):
-                return self._summary
-        
-        _LOGGER.debug("Generating entities summary for Perplexity context.")
-        
-        entities = self.hass.states.async_all() # Get all entities
-        ha_entity_registry = entity_registry.async_get(self.hass) # Get entity registry
-        ha_device_registry = device_registry.async_get(self.hass) # Get device registry
-        
-        summary = f"The Home Assistant instance has {len(entities)} entities."
-        entities_simplified = []
-                
-        for entity in entities:
-            if not async_should_expose(self.hass, 'conversation', entity.entity_id):
-                continue
+        return self._entity_index.summary
 
-            ha_entity = ha_entity_registry.async_get(entity.entity_id) # Get entity registry entry (to access unique_id)
-            ha_device = ha_device_registry.async_get(ha_entity.device_id) if ha_entity else None # Get device using unique_id
-            room = ha_device.area_id if ha_device and hasattr(ha_device, "area_id") else None # Get area_id safely
-            
-            entities_simplified.append(f"{entity.entity_id}: {entity.state} (in room: {room})")
-        
-        summary += " The entities are as follows: " + "; ".join(entities_simplified) + "."
-        self._summary = summary
-        self._last_summary_update = datetime.now()
+    def _is_entities_access_allowed(self) -> bool:
+        """Check whether access to the entities is allowed, honouring the configuration and switch.
+
+        Returns:
+            bool: True if entity access is allowed.
+        """
+        allow_entities_access = self._get_config(CONF_ALLOW_ENTITIES_ACCESS, DEFAULT_ALLOW_ENTITIES_ACCESS)
+        entity_access_switch = self.hass.data.get("perplexity_assistant_switches", {}).get("entity_access_switch")
+        if entity_access_switch:
+            allow_entities_access = entity_access_switch.is_on
+
+        return allow_entities_access
+
+    def _get_entities_context(self, pass_entity_context: bool = True, relevance_text: str | None = None) -> str:
+        """Get the entities context to send, honouring the entity access setting and switch.
+        On large installs, only the entities most relevant to the request are sent, or all of them if the request names none.
+
+        Args:
+            pass_entity_context (bool): Whether the request asks for entity context.
+            relevance_text (str | None): Text of the request, used to select the relevant entities.
+        Returns:
+            str: Summary of entities, or a notice if access is not allowed.
+        """
+        if not self._is_entities_access_allowed() or not pass_entity_context:
+            return "Access not allowed."
+
+        started_at = time.perf_counter()
+        with trace_stage("entities_summary"):
+            top_k = int(self._get_config(CONF_CONTEXT_TOP_K, DEFAULT_CONTEXT_TOP_K))
+            entity_count = len(self._entity_index.entity_ids)
+            if top_k <= 0 or relevance_text is None or entity_count <= top_k:
+                summary = self._generate_entities_summary()
+            else:
+                always_include = self._get_config(CONF_ALWAYS_INCLUDE_ENTITIES, DEFAULT_ALWAYS_INCLUDE_ENTITIES)
+                entity_ids = self._entity_index.select_relevant(relevance_text, top_k, always_include)
+                # Nothing in the request points at an entity, so all of them were selected: the summary is sent, capped later by the token budget
+                summary = self._generate_entities_summary() if len(entity_ids) == entity_count else self._entity_index.summarize(entity_ids)
+
+        self._metrics.summary_build_time.observe(time.perf_counter() - started_at)
         return summary
 
+    def _get_model(self, override_model: str | None = None) -> str:
+        """Get the model answering a request.
 
-    async def _async_send_request(self, user_messages: list[dict], username: str = "UNKNOWN", prompt: str | None = None, override_model: str | None = None, force_websearch_access: bool = False, data_recency: str | None = 'day', pass_entity_context: bool = True) -> dict:
-        """Send a request to the Perplexity API.
+        Args:
+            override_model (str | None): Model to override the default with.
+        Returns:
+            str: Model name.
+        """
+        return override_model if override_model else self._get_config(CONF_MODEL, DEFAULT_MODEL)
+
+    def _route_model(self, override_model: str | None, prompt: str, history_turns: int = 0, force_websearch_access: bool = False) -> tuple[str, RoutingDecision | None]:
+        """Get the model answering a prompt, picked by the router if the auto model is selected.
 
         Args:
-            user_messages (list[dict]): The request payload.
-            username (str): The name of the user making the request.
-            prompt (str | None): The original user prompt.
             override_model (str | None): Model to override the default with.
-            force_web_search_access (bool): Whether to force web search access.
-            data_recency (str | None): The recency of the data requested.
-            pass_entity_context (bool): Whether to include entity context.
+            prompt (str): User prompt.
+            history_turns (int): Previous turns of the conversation.
+            force_websearch_access (bool): Whether to force web search access.
         Returns:
-            dict: The response from the Perplexity API.
+            tuple[str, RoutingDecision | None]: Model name, and the routing decision if the model was picked by the router.
         """
-        
-        state_obj = self.hass.data.get("perplexity_assistant_sensors", {}).get("monthly_bill_sensor")
+        model = self._get_model(override_model)
+        if model != AUTO_MODEL:
+            return model, None
 
-        if state_obj:
-            current_bill = state_obj.state 
-            bill_value = float(current_bill) if current_bill not in ("unknown", "unavailable") else 0.0
+        decision = self._router.route(prompt, history_turns, self._is_websearch_enabled(force_websearch_access))
+        return decision.model, decision
 
-            if bill_value >= self._get_config(CONF_MAX_CREDITS_USAGE, DEFAULT_MAX_CREDITS_USAGE):
-                _LOGGER.warning("Max credits usage limit reached. Aborting request to Perplexity API.")
-                return {"error": "Max credits usage limit reached."}
+    def _get_hedge_delay(self, priority: int) -> float:
+        """Get the latency target of a request, after which it is hedged to the fallback model.
+
+        Args:
+            priority (int): Priority class of the request.
+        Returns:
+            float: Delay in seconds, 0 if the request is never hedged.
+        """
+        if priority == PRIORITY_INTERACTIVE:
+            return float(self._get_config(CONF_HEDGE_DELAY_INTERACTIVE, DEFAULT_HEDGE_DELAY_INTERACTIVE))
+        if priority == PRIORITY_SERVICE:
+            return float(self._get_config(CONF_HEDGE_DELAY_SERVICE, DEFAULT_HEDGE_DELAY_SERVICE))
+        return 0.0 # Background batches are not worth paying twice
+
+    def _get_deadline(self, priority: int, model: str) -> Deadline:
+        """Start the deadline of a request, from the timeouts of its model and channel.
+
+        Args:
+            priority (int): Priority class of the request, selecting its channel timeout.
+            model (str): Model answering the request.
+        Returns:
+            Deadline: Deadline shared by all the stages of the request.
+        """
+        timeout = MODEL_TIMEOUTS.get(model, DEFAULT_MODEL_TIMEOUT)
+        if priority == PRIORITY_INTERACTIVE:
+            channel_timeout = float(self._get_config(CONF_REQUEST_TIMEOUT_INTERACTIVE, DEFAULT_REQUEST_TIMEOUT_INTERACTIVE))
         else:
-            _LOGGER.warning("Monthly bill sensor not found. Skipping credits usage check.")
+            channel_timeout = float(self._get_config(CONF_REQUEST_TIMEOUT_SERVICE, DEFAULT_REQUEST_TIMEOUT_SERVICE))
 
-        headers = {
-            "Authorization": f"Bearer {self._get_config('api_key', '')}",
-            "Content-Type": "application/json",
-            "User-Agent": f"HomeAssistant/{HA_VERSION}"
-        }
-        
-        allow_entities_access = self._get_config(CONF_ALLOW_ENTITIES_ACCESS, DEFAULT_ALLOW_ENTITIES_ACCESS)
-        entity_access_switch = self.hass.data.get("perplexity_assistant_switches", {}).get("entity_access_switch")
-        if entity_access_switch:
-            allow_entities_access = entity_access_switch.is_on
+        return Deadline(min(timeout, channel_timeout) if channel_timeout > 0 else timeout)
 
-        entities_summary: str = "Access not allowed." if not allow_entities_access or not pass_entity_context else self._generate_entities_summary()
+    def _is_websearch_enabled(self, force_websearch_access: bool = False) -> bool:
+        """Check whether web search is enabled for a request.
+
+        Args:
+            force_websearch_access (bool): Whether to force web search access.
+        Returns:
+            bool: True if web search is enabled.
+        """
+        enable_websearch = DEFAULT_ENABLE_WEBSEARCH
+        web_search_switch = self.hass.data.get("perplexity_assistant_switches", {}).get("web_search_switch")
         
+        if web_search_switch:
+            enable_websearch = web_search_switch.is_on
+
+        return bool(enable_websearch or force_websearch_access)
+
+    def _are_actions_allowed(self) -> bool:
+        """Check whether actions on entities are allowed, honouring the configuration and switch.
+
+        Returns:
+            bool: True if actions are allowed.
+        """
+        allow_actions = self._get_config(CONF_ALLOW_ACTIONS_ON_ENTITIES, False)
+        actions_switch = self.hass.data.get("perplexity_assistant_switches", {}).get("entity_actions_switch")
+        if actions_switch:
+            allow_actions = actions_switch.is_on
+
+        return allow_actions
+
+    def _build_instructions(self) -> str:
+        """Build the static instructions of the agent.
+        They only depend on the configuration, so that every request starts with the same bytes and upstream prefix caching can apply.
+
+        Returns:
+            str: The system instructions.
+        """
         action_authorization: bool = self._get_config(CONF_ALLOW_ACTIONS_ON_ENTITIES, DEFAULT_ALLOW_ACTIONS_ON_ENTITIES)
         action_authorization_switch = self.hass.data.get("perplexity_assistant_switches", {}).get("entity_actions_switch")
         if action_authorization_switch:
             action_authorization = action_authorization_switch.is_on
-        
-        SYSTEM_STATUS = f"""
-            DATE & TIME: {datetime.now()}
+
+        return f"""{SYSTEM_PROMPT}
             HOME ASSISTANT VERSION: {HA_VERSION}
-            ENTITIES: {entities_summary}
             YOUR NAME IS {self.agent_name}
             AUTHORIZATIONS
                 - enable_vocal_notifications={self._get_config(CONF_ENABLE_RESPONSE_ON_SPEAKERS, DEFAULT_ENABLE_RESPONSE_ON_SPEAKERS)}
                 - enable_actions_on_entities={action_authorization}
-            USER NAME: {username}
             USER LANGUAGE: {self._get_config(CONF_LANGUAGE, 'en')}
+            USER SYSTEM PROMPT: {self._get_config(CONF_CUSTOM_SYSTEM_PROMPT, '')}
             """
-            
-        
-        self._history[self._history_index % len(self._history)] = prompt if prompt else ""
-        self._history_index += 1
-        
-        messages = [ {"role": "system", "content": SYSTEM_PROMPT}, {"role": "system", "content": SYSTEM_STATUS} ]
+
+    def _build_user_message(self, prompt: str, username: str = "UNKNOWN") -> dict:
+        """Build the user message of a request, holding the values changing on every call.
+
+        Args:
+            prompt (str): The user prompt.
+            username (str): The name of the user making the request.
+        Returns:
+            dict: The user message.
+        """
+        return {"role": "user", "content": f"DATE & TIME: {datetime.now().strftime('%Y-%m-%d %H:%M')} | USER NAME: {username} | USER PROMPT: {prompt}"}
+
+    def _build_messages(self, entities_summary: str, history: list[list[dict]], user_messages: list[dict]) -> list[dict]:
+        """Assemble the messages of a request, from the most stable to the most volatile.
+
+        The static instructions come first, then the entity snapshot which changes slowly,
+        then the conversation history, and last the user message with the time and prompt.
+
+        Args:
+            entities_summary (str): Entities context.
+            history (list[list[dict]]): Messages of each previous turn of the conversation, oldest first.
+            user_messages (list[dict]): The user messages of the request.
+        Returns:
+            list[dict]: The messages of the request.
+        """
+        messages = [ {"role": "system", "content": self._build_instructions()}, {"role": "system", "content": f"ENTITIES: {entities_summary}"} ]
+        for turn in history:
+            messages.extend(turn)
         messages.extend(user_messages)
-        
-        enable_websearch = DEFAULT_ENABLE_WEBSEARCH
-        web_search_switch = self.hass.data.get("perplexity_assistant_switches", {}).get("web_search_switch")
-        
-        if web_search_switch:
-            enable_websearch = web_search_switch.is_on
-            
-        payload = {
-            "model": override_model if override_model else self._get_config(CONF_MODEL, DEFAULT_MODEL),
+        return messages
+
+    def _build_payload(self, model: str, messages: list[dict], stream: bool = False, force_websearch_access: bool = False, data_recency: str | None = 'day') -> dict:
+        """Build the body of a request to the Perplexity API.
+
+        Args:
+            model (str): Model answering the request.
+            messages (list[dict]): The messages of the request.
+            stream (bool): Whether to stream the response.
+            force_websearch_access (bool): Whether to force web search access.
+            data_recency (str | None): The recency of the data requested.
+        Returns:
+            dict: The request payload.
+        """
+        return {
+            "model": model,
             "messages": messages,
-            "stream": False,
+            "stream": stream,
             "max_tokens": self._get_config(CONF_MAX_TOKENS, DEFAULT_MAX_TOKENS),
             "temperature": self._get_config(CONF_CREATIVITY, DEFAULT_CREATIVITY),
             "top_p": self._get_config(CONF_DIVERSITY, DEFAULT_DIVERSITY),
             "frequency_penalty": self._get_config(CONF_FREQUENCY_PENALTY, DEFAULT_FREQUENCY_PENALTY),
             "response_format": self.RESPONSE_FORMAT,
-            "disable_search": not enable_websearch and not force_websearch_access,
+            "disable_search": not self._is_websearch_enabled(force_websearch_access),
             "search_recency_filter": data_recency if data_recency else "day"
         }
+
+    def _compact_request(self, budget: int, user_messages: list[dict], history: list[list[dict]], pass_entity_context: bool, relevance_text: str) -> tuple[list[dict], list[str]]:
+        """Compact the messages of a request exceeding the input token budget.
+        The history is trimmed first, then the least relevant entities are dropped, then the remaining entity lines are shortened.
+
+        Args:
+            budget (int): Maximum number of estimated input tokens.
+            user_messages (list[dict]): The user messages of the request.
+            history (list[list[dict]]): Messages of each previous turn of the conversation, oldest first.
+            pass_entity_context (bool): Whether to include entity context.
+            relevance_text (str): Text of the request, used to rank the entities.
+        Returns:
+            tuple[list[dict], list[str]]: The compacted messages and the compaction steps applied.
+        """
+        entities_allowed = pass_entity_context and self._is_entities_access_allowed()
+        entity_ids: list[str] = []
+
+        if entities_allowed:
+            top_k = int(self._get_config(CONF_CONTEXT_TOP_K, DEFAULT_CONTEXT_TOP_K))
+            always_include = self._get_config(CONF_ALWAYS_INCLUDE_ENTITIES, DEFAULT_ALWAYS_INCLUDE_ENTITIES)
+
+            if top_k <= 0 or len(self._entity_index.entity_ids) <= top_k:
+                entity_ids = self._entity_index.rank_all(relevance_text, always_include)
+            else:
+                entity_ids = self._entity_index.select_relevant(relevance_text, top_k, always_include)
+
+        # Tokens of everything but the history turns and the entity lines
+        fixed_tokens = estimate_messages_tokens(self._build_messages(self._entity_index.summarize([]) if entities_allowed else "Access not allowed.", [], user_messages))
+        compacted = compact_prompt(budget, fixed_tokens, history, entity_ids,
+                                   lambda entity_id, compact: estimate_tokens(self._entity_index.get_line(entity_id, compact)))
+
+        entities_summary = self._entity_index.summarize(compacted.entity_ids, compacted.compact_entities) if entities_allowed else "Access not allowed."
+        return self._build_messages(entities_summary, compacted.history, user_messages), compacted.steps
+
+
+    async def _async_send_request(self, user_messages: list[dict], override_model: str | None = None, force_websearch_access: bool = False, data_recency: str | None = 'day', pass_entity_context: bool = True, on_content: Callable[[str], None] | None = None, entities_context: str | None = None, history: list[list[dict]] | None = None, relevance_text: str | None = None, priority: int = PRIORITY_SERVICE, deadline: Deadline | None = None) -> dict:
+        """Send a request to the Perplexity API.
+        Requests exceeding the input token budget are compacted before being sent.
+        Requests exceeding the latency target of their priority class are hedged to the fallback model, unless streamed.
+        Requests still unanswered when their deadline passes are aborted.
+
+        Args:
+            user_messages (list[dict]): The request payload.
+            override_model (str | None): Model to override the default with.
+            force_web_search_access (bool): Whether to force web search access.
+            data_recency (str | None): The recency of the data requested.
+            pass_entity_context (bool): Whether to include entity context.
+            on_content (Callable | None): If set, the response is streamed and this is called with each new piece of its content.
+            entities_context (str | None): Prebuilt entities context, built from the current state if not provided.
+            history (list[list[dict]] | None): Messages of each previous turn of the conversation, trimmed first when compacting.
+            relevance_text (str | None): Text used to select the relevant entities along with the history, the user messages if not provided.
+            priority (int): Priority class of the request in the scheduler queue.
+            deadline (Deadline | None): Deadline of the request, started from its model and channel timeouts if not provided.
+        Returns:
+            dict: The response from the Perplexity API, along with the estimated input tokens.
+        """
+        
+        state_obj = self.hass.data.get("perplexity_assistant_sensors", {}).get("monthly_bill_sensor")
+
+        if state_obj:
+            current_bill = state_obj.state 
+            bill_value = float(current_bill) if current_bill not in ("unknown", "unavailable") else 0.0
+
+            if bill_value >= self._get_config(CONF_MAX_CREDITS_USAGE, DEFAULT_MAX_CREDITS_USAGE):
+                _LOGGER.warning("Max credits usage limit reached. Aborting request to Perplexity API.")
+                return {"error": "Max credits usage limit reached."}
+        else:
+            _LOGGER.warning("Monthly bill sensor not found. Skipping credits usage check.")
+
+        relevance_text = relevance_text if relevance_text is not None else " ".join(message["content"] for message in user_messages)
+        model, _ = self._route_model(override_model, relevance_text, len(history or []), force_websearch_access)
+        deadline = deadline or self._get_deadline(priority, model)
+        headers = {
+            "Authorization": f"Bearer {self._get_config('api_key', '')}",
+            "Content-Type": "application/json",
+            "User-Agent": f"HomeAssistant/{HA_VERSION}"
+        }
         
+        # Follow-ups ("turn it off", "and the bedroom?") name their entities in the previous turns of the conversation
+        history = history or []
+        entities_relevance_text = " ".join([relevance_text, *(message["content"] for turn in history for message in turn)])
+        entities_summary: str = entities_context if entities_context is not None else self._get_entities_context(pass_entity_context, entities_relevance_text)
+        
+        messages = self._build_messages(entities_summary, history, user_messages)
+
+        # Keep the input under the token budget
+        estimated_tokens = estimate_messages_tokens(messages)
+        input_token_budget = int(self._get_config(CONF_INPUT_TOKEN_BUDGET, DEFAULT_INPUT_TOKEN_BUDGET))
+        compaction_steps: list[str] = []
+
+        if 0 < input_token_budget < estimated_tokens:
+            with trace_stage("compaction"):
+                messages, compaction_steps = self._compact_request(input_token_budget, user_messages, history, pass_entity_context, entities_relevance_text)
+            compacted_tokens = estimate_messages_tokens(messages)
+            _LOGGER.debug("Compacted request from %d to %d estimated tokens (budget=%d, steps=%s).", estimated_tokens, compacted_tokens, input_token_budget, compaction_steps)
+            estimated_tokens = compacted_tokens
+
+        # Building the context may have used up the time of the request
+        if deadline.expired:
+            _LOGGER.warning("Request to Perplexity API not sent, its deadline of %g s passed.", deadline.timeout)
+            return {"error": "Deadline exceeded."}
+        
+        payload = self._build_payload(model, messages, on_content is not None, force_websearch_access, data_recency)
+        
+        # Streamed requests are never coalesced nor hedged: each caller expects its own content
+        if on_content:
+            data = await self._async_await_deadline(self._async_post_with_retries(payload, headers, priority, relevance_text, deadline, on_content), deadline)
+            return {**data, "estimated_tokens": estimated_tokens, "compaction": compaction_steps}
+
+        # Coalesce identical concurrent requests into a single API call
+        request_key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+        if (inflight_request := self._inflight_requests.get(request_key)) is not None:
+            _LOGGER.debug("Joining identical in-flight request to Perplexity API.")
+            return {**await self._async_await_deadline(asyncio.shield(inflight_request), deadline), "coalesced": True}
+
+        inflight_request = self.hass.loop.create_future()
+        self._inflight_requests[request_key] = inflight_request
+
+        try:
+            data = {**await self._async_await_deadline(self._async_post_hedged(payload, headers, priority, relevance_text, deadline), deadline), "estimated_tokens": estimated_tokens, "compaction": compaction_steps}
+            inflight_request.set_result(data)
+            return data
+        finally:
+            self._inflight_requests.pop(request_key, None)
+            if not inflight_request.done():
+                inflight_request.set_result({"error": "Request cancelled."})
+
+
+    async def _async_await_deadline(self, request: Awaitable[dict], deadline: Deadline) -> dict:
+        """Wait for a request until its deadline, aborting it once the deadline passes.
+
+        Args:
+            request (Awaitable[dict]): The request to wait for.
+            deadline (Deadline): Deadline of the request.
+        Returns:
+            dict: The response from the Perplexity API, or an error if the deadline passed.
+        """
+        try:
+            async with asyncio.timeout(deadline.remaining):
+                return await request
+        except TimeoutError:
+            _LOGGER.warning("Request to Perplexity API aborted, its deadline of %g s passed.", deadline.timeout)
+            return {"error": "Deadline exceeded."}
+
+
+    async def _async_post(self, payload: dict, headers: dict, on_content: Callable[[str], None] | None = None, deadline: Deadline | None = None) -> dict:
+        """Post a payload to the Perplexity API.
+
+        Args:
+            payload (dict): The request payload.
+            headers (dict): The request headers.
+            on_content (Callable | None): If set, the response is read as a stream and this is called with each new piece of its content.
+            deadline (Deadline | None): If set, the connection, first byte and whole response must arrive before it.
+        Returns:
+            dict: The response from the Perplexity API.
+        """
+        request_options = {"timeout": deadline.client_timeout(stream=on_content is not None)} if deadline else {}
+        started_at = time.monotonic()
+        responded = False
+
         try:
-            async with self._session.post(BASE_URL, json=payload, headers=headers) as resp:
-                _LOGGER.debug(f"Perplexity API raw request sent.\nRequest Headers: {headers}\nRequest Payload: {payload}")
+            async with self._session.post(BASE_URL, json=payload, headers=headers, **request_options) as resp:
+                responded = True
+                self._metrics.time_to_first_byte.observe(time.monotonic() - started_at)
+                _LOGGER.debug("Perplexity API raw request sent.\nRequest Payload: %s", payload) # Never log the headers, they hold the API key
                 
                 if resp.status != 200:
-                    _LOGGER.error(f"Perplexity API error: status {resp.status}. Error response: {await resp.text()}")
-                    return {"error": f"Status code: {resp.status}"}
+                    _LOGGER.error("Perplexity API error: status %s. Error response: %s", resp.status, await resp.text())
+                    return {"error": f"Status code: {resp.status}", "status": resp.status, "retry_after": parse_retry_after(resp.headers.get("Retry-After"))}
                 
-                data: dict = await resp.json()
-                _LOGGER.debug(f"Perplexity API raw response received: {data}")
+                data: dict = await async_read_stream(resp, on_content) if on_content else await resp.json()
+                _LOGGER.debug("Perplexity API raw response received: %s", data)
                 return data
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            _LOGGER.error("Error while communicating with Perplexity API: %s", repr(e))
+            return {"error": str(e) or type(e).__name__, "retryable": True}
         except Exception as e:
             _LOGGER.error("Exception while communicating with Perplexity API: %s", e)
-            return {"error": str(e)}
+            # A response that could not be read (e.g. malformed JSON or stream) is a failure of the API, unlike errors raised before sending the request
+            return {"error": str(e) or type(e).__name__, "invalid_response": responded}
+
+
+    async def _async_post_with_retries(self, payload: dict, headers: dict, priority: int, prompt: str, deadline: Deadline | None = None, on_content: Callable[[str], None] | None = None) -> dict:
+        """Post a payload to the Perplexity API, retrying rate limited, failed and timed out requests.
+        Requests fail fast while the circuit breaker is open, optionally answered with the last good response to the same prompt.
+
+        Args:
+            payload (dict): The request payload.
+            headers (dict): The request headers.
+            priority (int): Priority class of the request in the scheduler queue.
+            prompt (str): The user prompt, used to find the last good response.
+            deadline (Deadline | None): Deadline of the request, no retry is attempted past it.
+            on_content (Callable | None): If set, the response is read as a stream and this is called with each new piece of its content.
+        Returns:
+            dict: The response from the Perplexity API.
+        """
+        serve_stale = self._get_config(CONF_SERVE_STALE_RESPONSES, DEFAULT_SERVE_STALE_RESPONSES)
+        max_retries = int(self._get_config(CONF_MAX_RETRIES, DEFAULT_MAX_RETRIES))
+        content_emitted = False
+
+        def _on_content(delta: str) -> None:
+            nonlocal content_emitted
+            content_emitted = True
+            on_content(delta)
+
+        if not self._circuit_breaker.allow_request():
+            data = {"error": "Perplexity API unavailable, circuit breaker open."}
+        else:
+            for attempt in range(max_retries + 1):
+                queued_at = time.monotonic()
+                async with self._scheduler.async_slot(priority):
+                    record_stage("queue", queued_at)
+                    with trace_stage("http"):
+                        data = await self._async_post(payload, headers, _on_content if on_content else None, deadline)
+
+                if not is_retryable(data):
+                    if data.get("invalid_response"):
+                        self._circuit_breaker.record_failure(data["error"])
+                    elif "error" not in data or data.get("status") is not None:
+                        self._circuit_breaker.record_success() # The API answered, even if it rejected the request
+                    # Other errors are raised locally, before the request reaches the API, and say nothing of its health
+                    break
+
+                self._circuit_breaker.record_failure(data["error"])
+
+                # Progress already published cannot be taken back
+                if attempt >= max_retries or content_emitted or not self._circuit_breaker.allow_request():
+                    break
+
+                delay = get_retry_delay(attempt, data.get("retry_after"))
+                if delay is None:
+                    _LOGGER.warning("Perplexity API asked to retry in %s s, giving up.", data["retry_after"])
+                    break
+
+                if deadline and delay >= deadline.remaining:
+                    _LOGGER.debug("No time left to retry the request to Perplexity API before its deadline.")
+                    break
+
+                _LOGGER.debug("Retrying request to Perplexity API in %.1f s (attempt %d/%d).", delay, attempt + 2, max_retries + 1)
+                self._metrics.retries += 1
+                await asyncio.sleep(delay)
+
+        self._update_circuit_breaker_sensor()
+
+        if "error" not in data:
+            self._last_good_responses.set(prompt, payload["model"], data)
+        elif serve_stale and (stale_data := self._last_good_responses.get(prompt, payload["model"])) is not None:
+            _LOGGER.warning("Serving the last good response to a repeated prompt, Perplexity API failed: %s", data["error"])
+            return {**stale_data, "stale": True}
+
+        return data
 
+    async def _async_post_hedged(self, payload: dict, headers: dict, priority: int, prompt: str, deadline: Deadline | None = None) -> dict:
+        """Post a payload to the Perplexity API, hedging it to the fallback model when it exceeds the latency target.
+        The first successful answer wins and the other request is cancelled. Perplexity never reports the usage
+        of a cancelled request, so only the cost of the winner is billed to the sensors and the max credits usage.
 
-    async def _execute_action(self, action: PerplexityAgentAction, response_text: str = "") -> None:
-        """Execute a given action from the Perplexity response.
+        Args:
+            payload (dict): The request payload.
+            headers (dict): The request headers.
+            priority (int): Priority class of the request, selecting its latency target.
+            prompt (str): The user prompt, used to find the last good response.
+            deadline (Deadline | None): Deadline shared by the primary and hedged requests.
+        Returns:
+            dict: The response from the Perplexity API.
+        """
+        hedge_delay = self._get_hedge_delay(priority)
+        hedge_model = self._get_config(CONF_HEDGE_MODEL, DEFAULT_HEDGE_MODEL)
+
+        if hedge_delay <= 0 or not hedge_model or hedge_model == payload["model"]:
+            return await self._async_post_with_retries(payload, headers, priority, prompt, deadline)
+
+        data, winner = await async_hedge(
+            lambda: self._async_post_with_retries(payload, headers, priority, prompt, deadline),
+            lambda: self._async_post_with_retries({**payload, "model": hedge_model}, headers, priority, prompt, deadline),
+            hedge_delay,
+            self._hedge_stats,
+        )
+
+        hedged_requests_sensor = self.hass.data.get("perplexity_assistant_sensors", {}).get("hedged_requests_sensor")
+        if hedged_requests_sensor:
+            hedged_requests_sensor.update_stats(self._hedge_stats.hedged, self._hedge_stats.attributes)
+
+        annotate(hedge=winner)
+        return {**data, "hedge": winner}
+
+    def _publish_metrics(self) -> None:
+        """Publish the performance metrics to their sensors, if they exist."""
+        sensors = self.hass.data.get("perplexity_assistant_sensors", {})
+        for key, (state, attributes) in self._metrics.sensor_states.items():
+            if sensor := sensors.get(f"{key}_sensor"):
+                sensor.update_state(state, attributes)
+
+    def _update_circuit_breaker_sensor(self) -> None:
+        """Publish the state of the circuit breaker to its sensor, if it exists."""
+        circuit_breaker_sensor = self.hass.data.get("perplexity_assistant_sensors", {}).get("circuit_breaker_sensor")
+        if not circuit_breaker_sensor:
+            return
+
+        attributes = self._circuit_breaker.attributes
+        circuit_breaker_sensor.update_state(self._circuit_breaker.state, attributes)
+
+        # An open circuit turns half open on its own, without any request
+        if self._cancel_circuit_breaker_refresh:
+            self._cancel_circuit_breaker_refresh()
+            self._cancel_circuit_breaker_refresh = None
+        if attributes["retry_in"] is not None:
+            self._cancel_circuit_breaker_refresh = async_call_later(self.hass, attributes["retry_in"], self._async_on_circuit_breaker_timeout)
+
+    @callback
+    def _async_on_circuit_breaker_timeout(self, _now: datetime) -> None:
+        """Publish the half open state once the recovery timeout of the circuit breaker is over."""
+        self._cancel_circuit_breaker_refresh = None
+        self._update_circuit_breaker_sensor()
+
+
+    def _progress_stream(self, context: Context | None = None) -> SentenceStream:
+        """Create a sentence stream firing a progress event for each streamed sentence of an ask service call.
+
+        Args:
+            context (Context | None): Context of the originating call.
+        Returns:
+            SentenceStream: Stream to feed with the content of the streamed request.
+        """
+        @callback
+        def _async_on_sentence(sentence: str, partial_response: str) -> None:
+            self.hass.bus.async_fire(f"{DOMAIN}_response_progress", {"sentence": sentence, "response": partial_response}, context=context)
+
+        return SentenceStream(_async_on_sentence)
+
+
+    async def _async_stream_to_chat_log(self, chat_log: ChatLog, request: Callable[[Callable[[str], None]], Awaitable[dict]]) -> dict:
+        """Run a streamed request, adding its content to the chat log as it arrives.
+        Voice pipelines listen to the chat log, and start speaking before the whole answer is received.
+
+        Args:
+            chat_log (ChatLog): Chat log of the conversation.
+            request (Callable): Starts the request, given the callback receiving each new piece of its content.
+        Returns:
+            dict: The response from the Perplexity API.
+        """
+        deltas: asyncio.Queue[str | None] = asyncio.Queue()
+
+        async def _async_iter_deltas() -> AsyncIterator[AssistantContentDeltaDict]:
+            yield {"role": "assistant"}
+            while (delta := await deltas.get()) is not None:
+                yield {"content": delta}
+
+        async def _async_add_deltas() -> None:
+            async for _content in chat_log.async_add_delta_content_stream(self.entity_id, _async_iter_deltas()):
+                pass
+
+        chat_log_task = self.hass.async_create_task(_async_add_deltas())
+        try:
+            return await request(deltas.put_nowait)
+        finally:
+            deltas.put_nowait(None)
+            await chat_log_task
+
+
+    def _build_action_call(self, action: PerplexityAgentAction, response_text: str = "") -> ActionCall:
+        """Build the service call of an action from the Perplexity response.
         
         Args:
             action (PerplexityAgentAction): The action to execute.
             response_text (str): The main response text from Perplexity.
+        Returns:
+            ActionCall: Service call of the action, or the reason it is skipped.
         """
-        _LOGGER.debug(f"Executing action from Perplexity response: {action.domain}.{action.service} on {action.target} with parameters {action.parameters}")
-                
-        try:
-            if action.domain == "tts" and action.service == "speak" and self._get_config(CONF_ENABLE_RESPONSE_ON_SPEAKERS, False):
-                voice_notifications_switch = self.hass.data.get("perplexity_assistant_switches", {}).get("voice_notification_switch")
-                if voice_notifications_switch and not voice_notifications_switch.is_on:
-                    _LOGGER.debug("Voice notifications are disabled. Skipping TTS action execution.")
-                    return
-                
-                # Special handling for TTS actions to format parameters correctly
-                tts_data = action.parameters or {}
-                tts_data = {
-                    "media_player_entity_id": tts_data.get("media_player_entity_id") or tts_data.get("entity_id") or action.target,
-                    "message": tts_data.get("message", response_text),
-                    "cache": False,
-                    "entity_id": self._get_config(CONF_TTS_ENGINE, DEFAULT_TTS)
-                }
-                
-                await self.hass.services.async_call(action.domain, action.service, tts_data)
-            else:
-                params = action.parameters or {}
-                await self.hass.services.async_call(action.domain, action.service, {"entity_id": action.target, **params})
-        except Exception as e:
-            _LOGGER.warning(f"Failed to execute action {action.domain}.{action.service} on {action.target}: {e}")
+        if action.domain == "tts" and action.service == "speak" and self._get_config(CONF_ENABLE_RESPONSE_ON_SPEAKERS, False):
+            voice_notifications_switch = self.hass.data.get("perplexity_assistant_switches", {}).get("voice_notification_switch")
+            if voice_notifications_switch and not voice_notifications_switch.is_on:
+                _LOGGER.debug("Voice notifications are disabled. Skipping TTS action execution.")
+                return ActionCall(action.domain, action.service, action.target, skip_reason="Voice notifications are disabled.")
+            
+            # Special handling for TTS actions to format parameters correctly
+            tts_data = action.parameters or {}
+            tts_data = {
+                "media_player_entity_id": tts_data.get("media_player_entity_id") or tts_data.get("entity_id") or action.target,
+                "message": tts_data.get("message", response_text),
+                "cache": False,
+                "entity_id": self._get_config(CONF_TTS_ENGINE, DEFAULT_TTS)
+            }
+            return ActionCall(action.domain, action.service, action.target, tts_data)
 
+        params = action.parameters or {}
+        return ActionCall(action.domain, action.service, action.target, {"entity_id": action.target, **params} if action.target else dict(params))
 
-    def _process_response(self, data: dict, execute_actions: bool = True, force_actions_execution: bool = False) -> dict:
+
+    async def _async_process_response(self, data: dict, execute_actions: bool = True, force_actions_execution: bool = False, deadline: Deadline | None = None, context: Context | None = None) -> dict:
         """Process the raw response from Perplexity API.
-        Executes any actions if present and authorized to do so.
+        Executes any actions if present and authorized to do so, and waits for their completion.
+        Responses shared with a coalesced request were already billed, notified and acted upon by the original request.
+        Stale responses, served while the API is unavailable, are neither billed, notified nor acted upon again.
 
         Args:
             data (dict): The raw response data.
             execute_actions (bool): Whether to execute actions in the response. DOES NOT OVERWRITE CONFIG SETTING.
+            deadline (Deadline | None): Deadline of the request, bounding the time given to the actions.
+            context (Context | None): Context of the originating request, passed to the actions.
         Returns:
-            dict: Processed response with keys 'response', 'actions', 'error', and 'cost'.
+            dict: Processed response with keys 'response', 'actions', 'action_results', 'error', 'cost', 'tokens' and 'stale'.
         """
         if "error" in data:
             return {"response": "Error communicating with the Perplexity AI service.", "error": data['error'], "cost": 0.0}
         
         try:
-            content: PerplexityAgentResponse = PerplexityAgentResponse.model_validate_json(data["choices"][0]["message"]["content"])
-            cost: float = data.get("usage", {}).get("cost", {}).get("total_cost", 0.0)
+            with trace_stage("parse"):
+                content: PerplexityAgentResponse = PerplexityAgentResponse.model_validate_json(data["choices"][0]["message"]["content"])
+            coalesced: bool = data.get("coalesced", False)
+            stale: bool = data.get("stale", False)
+            replayed: bool = coalesced or stale
+            cost: float = 0.0 if replayed else data.get("usage", {}).get("cost", {}).get("total_cost", 0.0)
             response_text: str = content.content
+            usage: dict = data.get("usage", {})
+            tokens: dict = {
+                "estimated": data.get("estimated_tokens"),
+                "prompt": usage.get("prompt_tokens"),
+                "completion": usage.get("completion_tokens"),
+                "compaction": data.get("compaction", []),
+            }
             
-            _LOGGER.debug(f"Perplexity API has responded successfully (cost={cost}). Response: {content}")
+            _LOGGER.debug("Perplexity API has responded successfully (cost=%s, coalesced=%s, stale=%s, hedge=%s). Response: %s", cost, coalesced, stale, data.get("hedge"), content)
+            _LOGGER.debug("Input tokens: estimated=%s, actual=%s.", tokens["estimated"], tokens["prompt"])
+            annotate(cost=cost, coalesced=coalesced, stale=stale, estimated_tokens=tokens["estimated"], prompt_tokens=tokens["prompt"], completion_tokens=tokens["completion"])
             
             # Update cost sensors if they exist
             monthly_sensor: MonthlyBillSensor = self.hass.data.get("perplexity_assistant_sensors", {}).get("monthly_bill_sensor")
-            monthly_sensor.increment_cost(cost) if monthly_sensor else None
+            monthly_sensor.increment_cost(cost) if monthly_sensor and not replayed else None
             alltime_sensor: AlltimeBillSensor = self.hass.data.get("perplexity_assistant_sensors", {}).get("alltime_bill_sensor")
-            alltime_sensor.increment_cost(cost) if alltime_sensor else None
+            alltime_sensor.increment_cost(cost) if alltime_sensor and not replayed else None
+            self._metrics.record_usage(usage) if not replayed else None
             
             # Send notification if enabled
-            if self._get_config(CONF_NOTIFY_RESPONSE, DEFAULT_NOTIFY_RESPONSE):
-                _LOGGER.debug(f"Sending notification for Perplexity response.")
+            if self._get_config(CONF_NOTIFY_RESPONSE, DEFAULT_NOTIFY_RESPONSE) and not replayed:
+                _LOGGER.debug("Sending notification for Perplexity response.")
                 self.hass.async_create_task(
                     self.hass.services.async_call(
                         "notify",
@@ -294,84 +846,296 @@ class PerplexityAgent(AbstractConversationAgent):
                         },
                     )
                 )
-        
-            self._history[self._history_index % len(self._history)] = response_text
-            self._history_index = (self._history_index + 1) % len(self._history)
 
             # Handle ACTION commands in the response
-            allow_actions = self._get_config(CONF_ALLOW_ACTIONS_ON_ENTITIES, False)
-            actions_switch = self.hass.data.get("perplexity_assistant_switches", {}).get("entity_actions_switch")
-            if actions_switch:
-                allow_actions = actions_switch.is_on
+            allow_actions = self._are_actions_allowed()
+            action_results: list[dict] = []
             
-            if (execute_actions and content.actions and allow_actions) or force_actions_execution:
-                for action in content.actions:
-                    # Schedule coroutine on HA's event loop (non-blocking)
-                    self.hass.async_create_task(self._execute_action(action, response_text))
+            if coalesced:
+                _LOGGER.debug("Skipping actions of a coalesced response, they are handled by the original request.")
+            elif stale:
+                _LOGGER.debug("Skipping actions of a stale response, they were already executed when it was received.")
+            elif (execute_actions and content.actions and allow_actions) or force_actions_execution:
+                match_threshold = float(self._get_config(CONF_TARGET_MATCH_THRESHOLD, DEFAULT_TARGET_MATCH_THRESHOLD))
+                with trace_stage("actions"):
+                    calls = [self._action_validator.validate(self._build_action_call(action, response_text), match_threshold) for action in content.actions or []]
+                    action_results = await self._action_executor.async_execute(calls, deadline.action_timeout() if deadline else None, context)
+                annotate(action_statuses=[result["status"] for result in action_results])
 
-            return {"response": response_text, "error": None, "cost": cost}
+            return {"response": response_text, "actions": [action.model_dump() for action in content.actions or []], "action_results": action_results, "error": None, "cost": cost, "tokens": tokens, "stale": stale}
         except Exception as e:
-            _LOGGER.error(f"Error processing Perplexity response: {e}")
+            _LOGGER.error("Error processing Perplexity response: %s", e)
             return {"response": "Error processing response from the Perplexity AI service.", "error": str(e), "cost": 0.0}
 
 
-    # Service call handler
-    async def async_ask(self, call: ServiceCall) -> dict:
-        """Service call handler.
-        Send a request to Perplexity based on a service call.
+    async def _async_answer(self, prompt: str, options: dict, context: Context | None = None, entities_context: str | None = None) -> dict:
+        """Answer a prompt sent through a service call.
 
         Args:
-            call (ServiceCall): The service call containing user input.
+            prompt (str): The user prompt.
+            options (dict): Per-request overrides from the service call (model, enable_websearch, cache, priority, ...).
+            context (Context | None): Context of the originating call.
+            entities_context (str | None): Prebuilt entities context, shared by the prompts of a batch.
         Returns:
-            dict: The response from Perplexity: {"response": str, "actions": list, "error": str | None, "cost": float}.
+            dict: The response from Perplexity: {"response": str, "actions": list, "action_results": list, "error": str | None, "cost": float, "cached": bool}.
         """
-        prompt = call.data.get("prompt", "")
-        model = call.data.get("model", None)
-        execute_actions = call.data.get("execute_actions", True)
-        force_actions_execution = call.data.get("force_actions_execution", False)
-        enable_websearch = call.data.get("enable_websearch", None)
-        pass_entity_context = call.data.get("pass_entity_context", True)
-        data_recency = call.data.get("data_recency", "day")
-        response: dict = {"response": "", "actions": [], "error": None, "cost": 0.0}
+        model = options.get("model", None)
+        execute_actions = options.get("execute_actions", True)
+        force_actions_execution = options.get("force_actions_execution", False)
+        enable_websearch = options.get("enable_websearch", None)
+        pass_entity_context = options.get("pass_entity_context", True)
+        data_recency = options.get("data_recency", "day")
+        stream_progress = options.get("stream_progress", False)
+        cache_mode = options.get("cache", "use")
+        priority = PRIORITIES.get(options.get("priority"), PRIORITY_SERVICE)
+        response: dict = {"response": "", "actions": [], "action_results": [], "error": None, "cost": 0.0}
         
         if not prompt:
             response['response'] = "No prompt provided."
             response['error'] = "No prompt provided."
-        else:
-            messages: list[dict] = [ {"role": "user", "content": f"USER SYSTEM PROMPT: {self._get_config(CONF_CUSTOM_SYSTEM_PROMPT, '')} | USER PROMPT: {prompt}"} ]
-            data = await self._async_send_request(messages, "AUTOMATED SERVICE CALL", override_model=model,
-                                                  force_websearch_access=enable_websearch, data_recency=data_recency, pass_entity_context=pass_entity_context)
-            response = self._process_response(data, execute_actions=execute_actions, force_actions_execution=force_actions_execution)
+            return response
+
+        model, routing = self._route_model(model, prompt, 0, enable_websearch)
+        deadline = self._get_deadline(priority, model)
+        annotate(model=model, priority=PRIORITY_NAMES.get(priority), prompt_length=len(prompt), cache=cache_mode)
+
+        custom_system_prompt = self._get_config(CONF_CUSTOM_SYSTEM_PROMPT, '')
+        entities_context = entities_context if entities_context is not None else self._get_entities_context(pass_entity_context, prompt)
+        cache_key: str | None = None
+        cached_response: dict | None = None
+
+        if self._response_cache.enabled and cache_mode != "bypass":
+            cache_key = ResponseCache.make_key(prompt, model, self._is_websearch_enabled(enable_websearch), data_recency,
+                                               f"{custom_system_prompt} | {self._get_config(CONF_LANGUAGE, 'en')} | {entities_context}")
+            if cache_mode == "use":
+                with trace_stage("cache_lookup"):
+                    cached_response = await self._response_cache.async_get(cache_key)
+                self._metrics.record_cache_lookup(cached_response is not None)
+
+        if cached_response:
+            _LOGGER.debug("Serving Perplexity response from cache.")
+            annotate(cached=True)
+            self._publish_metrics()
+            return {**cached_response, "cost": 0.0, "cached": True}
+
+        messages: list[dict] = [ self._build_user_message(prompt, "AUTOMATED SERVICE CALL") ]
+        progress: SentenceStream | None = self._progress_stream(context) if stream_progress else None
+        started_at = time.monotonic()
+        data = await self._async_send_request(messages, override_model=model,
+                                              force_websearch_access=enable_websearch, data_recency=data_recency, pass_entity_context=pass_entity_context,
+                                              on_content=progress.feed if progress else None,
+                                              entities_context=entities_context, relevance_text=prompt, priority=priority, deadline=deadline)
+        latency = time.monotonic() - started_at
+        if progress and "error" not in data:
+            progress.flush()
+        response = await self._async_process_response(data, execute_actions=execute_actions, force_actions_execution=force_actions_execution, deadline=deadline, context=context)
+        self._metrics.record_request(priority, time.monotonic() - started_at, response["error"])
+        self._publish_metrics()
+        annotate(cached=False, error=response["error"])
+
+        if routing:
+            self._router.record_outcome(routing, latency, response["cost"], response["error"])
+
+        response["cached"] = False
+
+        # Responses carrying actions are never cached: serving them again would silently skip the actions
+        if cache_key and response["error"] is None and not response["actions"] and not response.get("stale"):
+            self._response_cache.set(cache_key, response)
+        return response
+
+
+    def _build_response_event(self, response: dict, trace: RequestTrace) -> dict:
+        """Build the payload of the response event of a service call, with its trace if enabled.
+
+        Args:
+            response (dict): The response from Perplexity.
+            trace (RequestTrace): Trace of the request.
+        Returns:
+            dict: Event payload: {"response": dict, "trace": dict (optional)}.
+        """
+        if self._get_config(CONF_TRACE_RESPONSE_EVENTS, DEFAULT_TRACE_RESPONSE_EVENTS):
+            return {"response": response, "trace": trace.as_dict()}
+        return {"response": response}
+
+
+    # Service call handlers
+    async def async_ask(self, call: ServiceCall) -> dict:
+        """Service call handler.
+        Send a request to Perplexity based on a service call.
+
+        Args:
+            call (ServiceCall): The service call containing user input.
+        Returns:
+            dict: The response from Perplexity: {"response": str, "actions": list, "action_results": list, "error": str | None, "cost": float, "cached": bool}.
+        """
+        with self._tracer.trace("ask") as trace:
+            response = await self._async_answer(call.data.get("prompt", ""), call.data, call.context)
         
-        self.hass.bus.async_fire(f"{DOMAIN}_response", {"response": response})
+        self.hass.bus.async_fire(f"{DOMAIN}_response", self._build_response_event(response, trace))
         return response
 
 
-    async def async_process(self, user_input: ConversationInput) -> ConversationResult:
+    async def async_ask_many(self, call: ServiceCall) -> dict:
+        """Batch service call handler.
+        Send several prompts to Perplexity concurrently, sharing the same context.
+
+        Args:
+            call (ServiceCall): The service call containing the prompts and shared options.
+        Returns:
+            dict: The responses in the order of the prompts: {"results": list, "cost": float, "errors": int}.
+        """
+        prompts: list[str] = call.data.get("prompts", [])
+        semaphore = asyncio.Semaphore(call.data.get("max_concurrency", DEFAULT_ASK_MANY_CONCURRENCY))
+        options = {"priority": PRIORITY_NAMES[PRIORITY_BACKGROUND], **call.data} # Batches yield to single calls unless told otherwise
+        
+        # Build the shared context once for the whole batch, relevant to all of its prompts
+        entities_context = self._get_entities_context(call.data.get("pass_entity_context", True), " ".join(prompts))
+
+        async def _async_answer_one(prompt: str) -> dict:
+            async with semaphore:
+                with self._tracer.trace("ask_many") as trace:
+                    response = await self._async_answer(prompt, options, call.context, entities_context)
+            
+            self.hass.bus.async_fire(f"{DOMAIN}_response", self._build_response_event(response, trace))
+            return {"prompt": prompt, **response}
+
+        results: list[dict] = await asyncio.gather(*(_async_answer_one(prompt) for prompt in prompts))
+        
+        return {
+            "results": results,
+            "cost": sum(result["cost"] for result in results),
+            "errors": sum(1 for result in results if result["error"]),
+        }
+
+
+    async def async_profile(self, call: ServiceCall) -> None:
+        """Profile service call handler.
+        Profile the next requests of the agent, or the requests of a time window, with cProfile and optionally tracemalloc.
+        The reports are written to the config directory once done, and a perplexity_assistant_profile event points to them.
+
+        Args:
+            call (ServiceCall): The service call containing the number of requests, the time window and whether to trace memory.
+        """
+        self._profiler.async_start(
+            call.data.get("requests"),
+            call.data.get("duration", DEFAULT_PROFILE_DURATION),
+            call.data.get("trace_memory", False),
+        )
+
+
+    async def _async_process_locally(self, user_input: ConversationInput) -> str | None:
+        """Try to handle a simple device command or state question without calling the Perplexity API.
+
+        Args:
+            user_input (ConversationInput): The user's input.
+        Returns:
+            str | None: The spoken response, or None if the request must be sent to Perplexity.
+        """
+        language = self._get_config(CONF_LANGUAGE, DEFAULT_LANGUAGE)
+        response_text: str | None = None
+
+        if self._get_config(CONF_ENABLE_LOCAL_COMMANDS, DEFAULT_ENABLE_LOCAL_COMMANDS) and self._are_actions_allowed():
+            command = self._command_matcher.match(user_input.text, language)
+            if command is not None:
+                try:
+                    response_text = await self._command_matcher.async_execute(command, language, user_input.context)
+                except Exception as e:
+                    _LOGGER.warning("Failed to execute local command on %s, falling back to Perplexity: %s", command.entity_ids, e)
+                    return None
+
+        if response_text is None and self._get_config(CONF_ENABLE_LOCAL_QUERIES, DEFAULT_ENABLE_LOCAL_QUERIES) and self._is_entities_access_allowed():
+            query = self._query_resolver.match(user_input.text, language)
+            if query is not None:
+                response_text = self._query_resolver.answer(query, language)
+
+        if response_text is None:
+            return None
+
+        _LOGGER.debug("Handled request locally: %s -> %s", user_input.text, response_text)
+        return response_text
+
+
+    async def _async_handle_message(self, user_input: ConversationInput, chat_log: ChatLog) -> ConversationResult:
         """Process agent conversation input.
-        Send a request to Perplexity based on user input.
+        Send a request to Perplexity based on user input, tracing the time spent in each stage.
+
+        Args:
+            user_input (ConversationInput): The user's input.
+            chat_log (ChatLog): Chat log of the conversation, receiving the streamed answer.
+        Returns:
+            ConversationResult: The response formatted for Home Assistant.
+        """
+        with self._tracer.trace("conversation"):
+            return await self._async_process_conversation(user_input, chat_log)
+
+
+    def _build_conversation_result(self, chat_log: ChatLog, speech: str) -> ConversationResult:
+        """Build the result of a conversation turn, and add its answer to the chat log unless it was streamed there.
+
+        Args:
+            chat_log (ChatLog): Chat log of the conversation.
+            speech (str): The answer to speak.
+        Returns:
+            ConversationResult: The response formatted for Home Assistant.
+        """
+        if chat_log.content[-1].role != "assistant":
+            chat_log.async_add_assistant_content_without_tools(AssistantContent(agent_id=self.entity_id, content=speech))
+
+        response = IntentResponse(language=self._get_config(CONF_LANGUAGE, DEFAULT_LANGUAGE))
+        response.async_set_speech(speech)
+        return ConversationResult(response=response, conversation_id=chat_log.conversation_id, continue_conversation=chat_log.continue_conversation)
+
+
+    async def _async_process_conversation(self, user_input: ConversationInput, chat_log: ChatLog) -> ConversationResult:
+        """Answer a conversation turn, locally if possible, otherwise with Perplexity.
 
         Args:
             user_input (ConversationInput): The user's input.
+            chat_log (ChatLog): Chat log of the conversation.
         Returns:
             ConversationResult: The response formatted for Home Assistant.
         """
-        # Get config entry options
+        # Conversations started without an ID get one from their chat session, so that their follow-ups share the same history
+        conversation_id: str = chat_log.conversation_id
         prompt: str = user_input.text
+
+        with trace_stage("local"):
+            local_response = await self._async_process_locally(user_input)
+        annotate(prompt_length=len(prompt), handled_locally=local_response is not None)
+        if local_response is not None:
+            self._history.add_turn(conversation_id, prompt, local_response)
+            return self._build_conversation_result(chat_log, local_response)
+
         user_name = "UNKNOWN"
 
         if user_input.context and user_input.context.user_id:
             user = await self.hass.auth.async_get_user(user_input.context.user_id)
             user_name = user.name if user else "UNKNOWN"
         
-        HISTORY = " -- ".join([msg for msg in self._history if msg])
-        HISTORY_PROMPT = f"{HISTORY}" if HISTORY else "No previous conversation history."
-        _LOGGER.debug(f"Sending request to Perplexity API with history: {HISTORY_PROMPT} | prompt: {prompt}")
+        history = self._history.get_turns(conversation_id)
+        model, routing = self._route_model(None, prompt, len(history))
+        deadline = self._get_deadline(PRIORITY_INTERACTIVE, model)
+        annotate(model=model, history_turns=len(history))
+        _LOGGER.debug("Sending request to Perplexity API with %d previous turns of conversation %s | prompt: %s", len(history), conversation_id, prompt)
         
-        user_messages: list[dict] = [ {"role": "user", "content": f"USER SYSTEM PROMPT: {self._get_config(CONF_CUSTOM_SYSTEM_PROMPT, '')} | CONVERSATION HISTORY: {HISTORY_PROMPT} | USER PROMPT: {prompt}"} ]
-        data: dict = await self._async_send_request(user_messages, user_name, prompt=prompt)
-        processed_response: dict = self._process_response(data)
+        user_messages: list[dict] = [ self._build_user_message(prompt, user_name) ]
+        send_request = lambda on_content=None: self._async_send_request(user_messages, override_model=model, on_content=on_content, history=history, relevance_text=prompt, priority=PRIORITY_INTERACTIVE, deadline=deadline)
+        started_at = time.monotonic()
+        if self._get_config(CONF_ENABLE_STREAMING, DEFAULT_ENABLE_STREAMING):
+            data: dict = await self._async_stream_to_chat_log(chat_log, send_request)
+        else:
+            data = await send_request()
+        latency = time.monotonic() - started_at
+        processed_response: dict = await self._async_process_response(data, deadline=deadline, context=user_input.context)
+        self._metrics.record_request(PRIORITY_INTERACTIVE, time.monotonic() - started_at, processed_response["error"])
+        self._publish_metrics()
+        annotate(error=processed_response["error"])
 
-        response = IntentResponse(language=self._get_config(CONF_LANGUAGE, DEFAULT_LANGUAGE))
-        response.async_set_speech(processed_response.get("response", "Unknown response from Perplexity AI service."))
-        return ConversationResult(response=response)
+        if routing:
+            self._router.record_outcome(routing, latency, processed_response["cost"], processed_response["error"])
+
+        # Failed turns are not remembered, they would only mislead the next answers
+        if processed_response.get("error") is None:
+            self._history.add_turn(conversation_id, prompt, processed_response["response"])
+
+        return self._build_conversation_result(chat_log, processed_response.get("response", "Unknown response from Perplexity AI service."))
@@ -0,0 +1,62 @@
+"""End-to-end deadlines of the requests sent to the Perplexity API."""
+import time
+
+import aiohttp
+
+
+CONNECT_TIMEOUT: float = 5.0              # in seconds, to open the connection to the API
+STREAM_READ_TIMEOUT: float = 15.0         # in seconds, to receive the first byte, then each chunk, of a streamed response
+MIN_ACTION_TIMEOUT: float = 1.0           # in seconds, actions are not started with less time left before the deadline
+
+
+class Deadline:
+    """Point in time by which a request must be answered, shared by all of its stages."""
+
+    def __init__(self, timeout: float) -> None:
+        """Start the deadline.
+
+        Args:
+            timeout (float): Time (in seconds) given to the request.
+        """
+        self.timeout: float = timeout
+        self.expires_at: float = time.monotonic() + timeout
+
+    def __repr__(self) -> str:
+        """Return the remaining time, for debugging."""
+        return f"Deadline(timeout={self.timeout}, remaining={self.remaining:.2f})"
+
+    @property
+    def remaining(self) -> float:
+        """Return the time (in seconds) left before the deadline, 0 once it passed."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """Return whether the deadline passed."""
+        return self.remaining <= 0
+
+    def client_timeout(self, stream: bool = False) -> aiohttp.ClientTimeout:
+        """Build the timeout of an HTTP request sent within the remaining time.
+
+        Args:
+            stream (bool): Whether the response is streamed, in which case every chunk must arrive in time.
+        Returns:
+            aiohttp.ClientTimeout: Connect, first byte and total read timeouts.
+        """
+        remaining = self.remaining
+        return aiohttp.ClientTimeout(
+            total=remaining,
+            connect=min(CONNECT_TIMEOUT, remaining),
+            sock_read=min(STREAM_READ_TIMEOUT, remaining) if stream else remaining,
+        )
+
+    def action_timeout(self, min_timeout: float = MIN_ACTION_TIMEOUT) -> float:
+        """Return the time given to the actions triggered by the response, which never runs past the deadline.
+
+        Args:
+            min_timeout (float): Time (in seconds) below which the actions are not worth starting.
+        Returns:
+            float: The remaining time, or 0 if less than the minimum is left.
+        """
+        remaining = self.remaining
+        return remaining if remaining >= min_timeout else 0.0
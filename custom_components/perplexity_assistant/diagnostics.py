@@ -0,0 +1,34 @@
+"""Diagnostics of the Perplexity Assistant config entries: settings, statistics and the latest request traces."""
+from typing import Any
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import *
+
+
+TO_REDACT: set[str] = {CONF_API_KEY}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return the diagnostics of a config entry.
+
+    Args:
+        hass (HomeAssistant): Home Assistant instance.
+        entry (ConfigEntry): Configuration entry.
+    Returns:
+        dict[str, Any]: Redacted settings, performance statistics and request traces of the entry.
+    """
+    diagnostics: dict[str, Any] = {
+        "entry": {
+            "title": entry.title,
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": async_redact_data(dict(entry.options), TO_REDACT),
+        },
+    }
+
+    agent = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if agent is None:
+        return diagnostics
+
+    return {**diagnostics, **agent.diagnostics}
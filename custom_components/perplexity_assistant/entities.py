@@ -0,0 +1,624 @@
+"""Event-driven index of the Home Assistant entities exposed to Perplexity."""
+import heapq
+import itertools
+import logging
+import math
+import re
+import unicodedata
+
+from collections import defaultdict
+from typing import Callable, Iterable
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import Event, HomeAssistant, State, callback
+from homeassistant.components.homeassistant.exposed_entities import async_listen_entity_updates, async_should_expose
+from homeassistant.helpers import area_registry, device_registry, entity_registry
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Anything that is not a letter or a digit separates words in a name
+NAME_SEPARATOR_PATTERN = re.compile(r"[\W_]+")
+# Longest state kept in a shortened summary entry
+MAX_COMPACT_STATE_LENGTH: int = 32
+
+
+def normalize_name(text: str) -> str:
+    """Normalize a name or an utterance so they can be compared.
+
+    Args:
+        text (str): Text to normalize.
+    Returns:
+        str: Case-folded text, with punctuation replaced by single spaces.
+    """
+    return NAME_SEPARATOR_PATTERN.sub(" ", unicodedata.normalize("NFKC", text).casefold()).strip()
+
+
+def tokenize(text: str) -> set[str]:
+    """Split a text into the tokens used by the relevance index.
+
+    Words written without spaces (Chinese, Japanese) are split into character bigrams,
+    and a trailing plural "s" is dropped so "lights" matches "light".
+
+    Args:
+        text (str): Text to tokenize.
+    Returns:
+        set[str]: Tokens of the text.
+    """
+    tokens: set[str] = set()
+
+    for word in normalize_name(text).split():
+        if any(ord(char) >= 0x2E80 and not 0xAC00 <= ord(char) <= 0xD7AF for char in word): # CJK, except Hangul which uses spaces
+            tokens.update(word[index:index + 2] for index in range(max(len(word) - 1, 1)))
+            continue
+
+        tokens.add(word)
+        if len(word) > 3 and word.endswith("s"):
+            tokens.add(word[:-1])
+
+    return tokens
+
+
+def trigrams(text: str) -> frozenset[str]:
+    """Split a text into the character trigrams used by the fuzzy name index.
+
+    Spaces and punctuation are dropped first, so "livingroom", "living_room" and
+    "Living Room" share all their trigrams.
+
+    Args:
+        text (str): Text to split.
+    Returns:
+        frozenset[str]: Trigrams of the text, padded so short names still have some.
+    """
+    compact = normalize_name(text).replace(" ", "")
+    if not compact:
+        return frozenset()
+
+    padded = f"^{compact}$"
+    return frozenset(padded[index:index + 3] for index in range(max(len(padded) - 2, 1)))
+
+
+class EntityIndex:
+    """Maintained summary of exposed entities.
+
+    The index is built once, then patched entry by entry from ``state_changed`` and
+    registry update events, so reading the summary never walks the whole state machine.
+    Exposure is cached as well and only re-evaluated when the expose settings change.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the entity index.
+
+        Args:
+            hass (HomeAssistant): Home Assistant instance.
+        """
+        self.hass: HomeAssistant = hass
+
+        self._lines: dict[str, str] = {}
+        self._exposure: dict[str, bool] = {}
+        self._exposed: set[str] = set()
+        self._names: dict[str, tuple[str, ...]] = {}
+        self._entities_by_name: dict[str, set[str]] = {}
+        self._areas: dict[str, str | None] = {}
+        self._entities_by_area: dict[str, set[str]] = {}
+        self._registry_areas: dict[str, str | None] = {}
+        self._registry_aliases: dict[str, tuple[str, ...]] = {}
+        self._area_names: dict[str, tuple[str, ...]] = {}
+        self._tokens: dict[str, frozenset[str]] = {}
+        self._entities_by_token: dict[str, set[str]] = {}
+        self._trigrams: dict[str, dict[str, frozenset[str]]] = {}
+        self._entities_by_trigram: dict[str, set[str]] = {}
+        self._summary: str | None = None
+        self._unsubscribers: list[Callable[[], None]] = []
+
+    @callback
+    def async_start(self) -> None:
+        """Build the index and subscribe to the events keeping it up to date."""
+        self.async_rebuild()
+
+        self._unsubscribers.append(self.hass.bus.async_listen(EVENT_STATE_CHANGED, self._async_on_state_changed))
+        self._unsubscribers.append(self.hass.bus.async_listen(entity_registry.EVENT_ENTITY_REGISTRY_UPDATED, self._async_on_entity_registry_updated))
+        self._unsubscribers.append(self.hass.bus.async_listen(device_registry.EVENT_DEVICE_REGISTRY_UPDATED, self._async_on_device_registry_updated))
+        self._unsubscribers.append(self.hass.bus.async_listen(area_registry.EVENT_AREA_REGISTRY_UPDATED, self._async_on_area_registry_updated))
+        self._unsubscribers.append(async_listen_entity_updates(self.hass, 'conversation', self._async_on_exposure_updated))
+
+    @callback
+    def async_stop(self) -> None:
+        """Unsubscribe from all events and drop the index."""
+        while self._unsubscribers:
+            self._unsubscribers.pop()()
+
+        self._clear()
+        self._exposure.clear()
+        self._exposed.clear()
+
+    @callback
+    def async_rebuild(self) -> None:
+        """Rebuild the whole index from the state machine."""
+        _LOGGER.debug("Building entities index for Perplexity context.")
+
+        self._clear()
+        self._async_load_registries()
+
+        for entity_id in self.hass.states.async_entity_ids():
+            self._is_exposed(entity_id) # Only evaluated for entities missing from the exposure cache
+
+        # Only the exposed entities are indexed, which is usually a small part of the state machine
+        for entity_id in list(self._exposed):
+            self._async_update_entity(entity_id)
+
+    @property
+    def summary(self) -> str:
+        """Return the summary of exposed entities, joining the entries only when something changed."""
+        if self._summary is None:
+            self._summary = (
+                f"The Home Assistant instance has {self.hass.states.async_entity_ids_count()} entities."
+                f" The entities are as follows: {'; '.join(self._lines.values())}."
+            )
+
+        return self._summary
+
+    @property
+    def entity_ids(self) -> list[str]:
+        """Return the IDs of the exposed entities."""
+        return list(self._lines)
+
+    def is_exposed(self, entity_id: str) -> bool:
+        """Return whether an entity exists and is exposed."""
+        return entity_id in self._lines
+
+    def find_by_name(self, name: str) -> set[str]:
+        """Return the exposed entities matching a name or an alias.
+
+        Args:
+            name (str): Name to look up, normalized with ``normalize_name``.
+        Returns:
+            set[str]: IDs of the matching entities.
+        """
+        return set(self._entities_by_name.get(name, ()))
+
+    def get_names(self, entity_id: str) -> tuple[str, ...]:
+        """Return the normalized names (friendly name, aliases, object ID) of an exposed entity."""
+        return self._names.get(entity_id, ())
+
+    @property
+    def area_ids(self) -> list[str]:
+        """Return the IDs of all areas."""
+        return list(self._area_names)
+
+    def get_area_id(self, entity_id: str) -> str | None:
+        """Return the area of an entity: its own area if set, else the area of its device."""
+        return self._registry_areas.get(entity_id)
+
+    def get_area_name(self, area_id: str | None) -> str | None:
+        """Return the name of an area."""
+        names = self._area_names.get(area_id) if area_id else None
+        return names[0] if names else None
+
+    def get_area_names(self, area_id: str) -> tuple[str, ...]:
+        """Return the name and aliases of an area."""
+        return self._area_names.get(area_id, ())
+
+    def get_area_entities(self, area_id: str) -> set[str]:
+        """Return the exposed entities of an area."""
+        return set(self._entities_by_area.get(area_id, ()))
+
+    def find_similar(self, text: str, domain: str | None = None, limit: int = 2) -> list[tuple[str, float]]:
+        """Find the exposed entities whose names are the closest to a text.
+
+        Only the entities sharing at least one trigram with the text are compared, each by
+        the Dice coefficient between the trigrams of the text and those of its closest name.
+
+        Args:
+            text (str): Name to look up, such as a mistyped object ID or a friendly name.
+            domain (str | None): Domain the entities must belong to, any domain if None.
+            limit (int): Maximum number of entities returned.
+        Returns:
+            list[tuple[str, float]]: Entity IDs with their similarity (0 to 1), most similar first.
+        """
+        text_trigrams = trigrams(text)
+        candidates: set[str] = set()
+        for trigram in text_trigrams:
+            candidates.update(self._entities_by_trigram.get(trigram, ()))
+
+        scores: dict[str, float] = {}
+        for entity_id in candidates:
+            if domain is not None and entity_id.split(".", 1)[0] != domain:
+                continue
+            scores[entity_id] = max(
+                2 * len(text_trigrams & name_trigrams) / (len(text_trigrams) + len(name_trigrams))
+                for name_trigrams in self._trigrams[entity_id].values()
+            )
+
+        return heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def _score(self, text: str) -> dict[str, float]:
+        """Score the exposed entities sharing at least one token with a text.
+
+        Entities are scored by the inverse document frequency of the tokens they share with
+        the text (entity ID, names, aliases, area and domain), so rare words such as a room
+        name weigh more than common ones such as "sensor".
+
+        Args:
+            text (str): Text to score the entities against.
+        Returns:
+            dict[str, float]: Score of each matching entity.
+        """
+        scores: dict[str, float] = defaultdict(float)
+        entity_count = len(self._lines)
+
+        for token in tokenize(text):
+            entity_ids = self._entities_by_token.get(token)
+            if not entity_ids:
+                continue
+
+            weight = math.log(1 + entity_count / len(entity_ids))
+            for entity_id in entity_ids:
+                scores[entity_id] += weight
+
+        return scores
+
+    def select_relevant(self, text: str, limit: int, always_include: Iterable[str] = ()) -> list[str]:
+        """Select the exposed entities most relevant to a text.
+
+        When fewer than ``limit`` entities match the text, the other entities complete the selection in index order.
+        When none matches, as for general questions ("is anything left on?"), every entity is selected in index order,
+        leaving the input token budget to cap the context.
+
+        Args:
+            text (str): Prompt to select entities for.
+            limit (int): Maximum number of ranked entities, unless no entity matches the text.
+            always_include (Iterable[str]): Entities always selected, on top of the ranked ones.
+        Returns:
+            list[str]: Selected entity IDs, the always included ones first.
+        """
+        scores = self._score(text)
+        selected = [entity_id for entity_id in dict.fromkeys(always_include) if entity_id in self._lines]
+        skipped = set(selected)
+
+        if not scores:
+            return selected + [entity_id for entity_id in self._lines if entity_id not in skipped]
+
+        ranked = heapq.nsmallest(limit, (entity_id for entity_id in scores if entity_id not in skipped), key=lambda entity_id: (-scores[entity_id], entity_id))
+        if len(ranked) < limit:
+            unrelated = (entity_id for entity_id in self._lines if entity_id not in scores and entity_id not in skipped)
+            ranked.extend(itertools.islice(unrelated, limit - len(ranked)))
+
+        return selected + ranked
+
+    def rank_all(self, text: str, always_include: Iterable[str] = ()) -> list[str]:
+        """Rank every exposed entity by relevance to a text.
+
+        Args:
+            text (str): Prompt to rank entities for.
+            always_include (Iterable[str]): Entities ranked first, whatever their score.
+        Returns:
+            list[str]: Exposed entity IDs, most relevant first; entities unrelated to the text keep the index order.
+        """
+        scores = self._score(text)
+        selected = [entity_id for entity_id in dict.fromkeys(always_include) if entity_id in self._lines]
+        skipped = set(selected)
+        ranked = sorted((entity_id for entity_id in scores if entity_id not in skipped), key=lambda entity_id: (-scores[entity_id], entity_id))
+        unrelated = [entity_id for entity_id in self._lines if entity_id not in scores and entity_id not in skipped]
+        return selected + ranked + unrelated
+
+    def get_line(self, entity_id: str, compact: bool = False) -> str:
+        """Return the summary entry of an exposed entity.
+
+        Args:
+            entity_id (str): Entity ID.
+            compact (bool): Whether to shorten the entry (truncated state, bare area name).
+        Returns:
+            str: Summary entry of the entity.
+        """
+        if not compact:
+            return self._lines[entity_id]
+
+        state = self.hass.states.get(entity_id)
+        value = state.state if state else "unknown"
+        if len(value) > MAX_COMPACT_STATE_LENGTH:
+            value = f"{value[:MAX_COMPACT_STATE_LENGTH - 1]}…"
+
+        area_name = self.get_area_name(self._areas.get(entity_id))
+        return f"{entity_id}: {value} ({area_name})" if area_name else f"{entity_id}: {value}"
+
+    def summarize(self, entity_ids: list[str], compact: bool = False) -> str:
+        """Return the summary of a selection of exposed entities.
+
+        Args:
+            entity_ids (list[str]): Entities to include, as returned by ``select_relevant``.
+            compact (bool): Whether to shorten the entries of the entities.
+        Returns:
+            str: Summary of the selected entities.
+        """
+        return (
+            f"The Home Assistant instance has {self.hass.states.async_entity_ids_count()} entities."
+            f" The entities most relevant to the request are as follows: {'; '.join(self.get_line(entity_id, compact) for entity_id in entity_ids)}."
+        )
+
+    def _clear(self) -> None:
+        """Drop every entry of the index."""
+        self._lines.clear()
+        self._names.clear()
+        self._entities_by_name.clear()
+        self._areas.clear()
+        self._entities_by_area.clear()
+        self._registry_areas.clear()
+        self._registry_aliases.clear()
+        self._area_names.clear()
+        self._tokens.clear()
+        self._entities_by_token.clear()
+        self._trigrams.clear()
+        self._entities_by_trigram.clear()
+        self._summary = None
+
+    def _is_exposed(self, entity_id: str) -> bool:
+        """Check whether an entity is exposed to conversation agents, from the cache when possible.
+
+        Args:
+            entity_id (str): Entity ID to check.
+        Returns:
+            bool: True if the entity is exposed.
+        """
+        exposed = self._exposure.get(entity_id)
+        if exposed is None:
+            exposed = self._exposure[entity_id] = async_should_expose(self.hass, 'conversation', entity_id)
+            if exposed:
+                self._exposed.add(entity_id)
+            else:
+                self._exposed.discard(entity_id)
+
+        return exposed
+
+    def _invalidate_exposure(self, entity_id: str) -> None:
+        """Forget the cached exposure of an entity."""
+        self._exposure.pop(entity_id, None)
+        self._exposed.discard(entity_id)
+
+    @callback
+    def _async_load_registries(self) -> None:
+        """Build the area and alias maps from the area, device and entity registries."""
+        for area in area_registry.async_get(self.hass).async_list_areas():
+            self._area_names[area.id] = (area.name, *area.aliases)
+
+        for ha_entity in list(entity_registry.async_get(self.hass).entities.values()):
+            self._async_update_registry_entry(ha_entity.entity_id)
+
+    @callback
+    def _async_update_registry_entry(self, entity_id: str) -> None:
+        """Refresh the area and aliases of an entity from the registries.
+
+        Args:
+            entity_id (str): Entity ID to refresh.
+        """
+        ha_entity = entity_registry.async_get(self.hass).async_get(entity_id)
+        if ha_entity is None:
+            self._registry_areas.pop(entity_id, None)
+            self._registry_aliases.pop(entity_id, None)
+            return
+
+        area_id = ha_entity.area_id # The entity's own area overrides the area of its device
+        if area_id is None and ha_entity.device_id:
+            ha_device = device_registry.async_get(self.hass).async_get(ha_entity.device_id)
+            area_id = ha_device.area_id if ha_device else None
+
+        self._registry_areas[entity_id] = area_id
+        self._registry_aliases[entity_id] = tuple(ha_entity.aliases)
+
+    def _format_line(self, state: State, area_id: str | None) -> str:
+        """Format the summary entry of a single entity.
+
+        Args:
+            state (State): Current state of the entity.
+            area_id (str | None): Area of the entity.
+        Returns:
+            str: Summary entry of the entity.
+        """
+        return f"{state.entity_id}: {state.state} (in room: {self.get_area_name(area_id)})"
+
+    def _collect_names(self, state: State) -> tuple[str, ...]:
+        """Collect the normalized names an entity can be referred to by.
+
+        Args:
+            state (State): Current state of the entity.
+        Returns:
+            tuple[str, ...]: Unique normalized names.
+        """
+        names = [state.name, state.entity_id.split(".", 1)[1], *self._registry_aliases.get(state.entity_id, ())]
+        return tuple(dict.fromkeys(name for name in map(normalize_name, names) if name))
+
+    def _collect_tokens(self, entity_id: str, names: tuple[str, ...], area_id: str | None) -> frozenset[str]:
+        """Collect the relevance tokens of an entity.
+
+        Args:
+            entity_id (str): Entity ID (its domain and object ID are tokenized).
+            names (tuple[str, ...]): Normalized names of the entity.
+            area_id (str | None): Area of the entity.
+        Returns:
+            frozenset[str]: Tokens of the entity.
+        """
+        texts = [entity_id, *names, *(self._area_names.get(area_id, ()) if area_id else ())]
+        return frozenset().union(*map(tokenize, texts))
+
+    def _set_tokens(self, entity_id: str, tokens: frozenset[str]) -> None:
+        """Replace the tokens of an entity in the relevance index."""
+        for token in self._tokens.get(entity_id, ()):
+            entities = self._entities_by_token.get(token)
+            if entities is not None:
+                entities.discard(entity_id)
+                if not entities:
+                    del self._entities_by_token[token]
+
+        if not tokens:
+            self._tokens.pop(entity_id, None)
+            return
+
+        self._tokens[entity_id] = tokens
+        for token in tokens:
+            self._entities_by_token.setdefault(token, set()).add(entity_id)
+
+    def _collect_fuzzy_names(self, names: tuple[str, ...], area_id: str | None) -> tuple[str, ...]:
+        """Collect the names an entity can be fuzzily matched against.
+
+        Args:
+            names (tuple[str, ...]): Normalized names of the entity.
+            area_id (str | None): Area of the entity.
+        Returns:
+            tuple[str, ...]: The names, and each name prefixed by each name of the area ("kitchen ceiling").
+        """
+        area_names = [normalize_name(name) for name in self._area_names.get(area_id, ())] if area_id else []
+        qualified = [f"{area_name} {name}" for area_name in area_names if area_name for name in names if not name.startswith(area_name)]
+        return tuple(dict.fromkeys((*names, *qualified)))
+
+    def _set_trigrams(self, entity_id: str, names: tuple[str, ...]) -> None:
+        """Replace the fuzzy names of an entity in the trigram index."""
+        for trigram in set().union(*self._trigrams.get(entity_id, {}).values()):
+            entities = self._entities_by_trigram.get(trigram)
+            if entities is not None:
+                entities.discard(entity_id)
+                if not entities:
+                    del self._entities_by_trigram[trigram]
+
+        if not names:
+            self._trigrams.pop(entity_id, None)
+            return
+
+        self._trigrams[entity_id] = {name: trigrams(name) for name in names}
+        for trigram in set().union(*self._trigrams[entity_id].values()):
+            self._entities_by_trigram.setdefault(trigram, set()).add(entity_id)
+
+    def _set_names(self, entity_id: str, names: tuple[str, ...]) -> None:
+        """Replace the names of an entity in the name lookup."""
+        for name in self._names.get(entity_id, ()):
+            entities = self._entities_by_name.get(name)
+            if entities is not None:
+                entities.discard(entity_id)
+                if not entities:
+                    del self._entities_by_name[name]
+
+        if not names:
+            self._names.pop(entity_id, None)
+            return
+
+        self._names[entity_id] = names
+        for name in names:
+            self._entities_by_name.setdefault(name, set()).add(entity_id)
+
+    @callback
+    def _async_remove_entity(self, entity_id: str) -> None:
+        """Remove every entry of a single entity."""
+        self._set_names(entity_id, ())
+        self._set_tokens(entity_id, frozenset())
+        self._set_trigrams(entity_id, ())
+        self._set_area(entity_id, None)
+        if self._lines.pop(entity_id, None) is not None:
+            self._summary = None
+
+    def _set_area(self, entity_id: str, area_id: str | None) -> None:
+        """Move an exposed entity to another area in the area lookup."""
+        previous_area_id = self._areas.pop(entity_id, None)
+        if previous_area_id is not None:
+            entities = self._entities_by_area.get(previous_area_id)
+            if entities is not None:
+                entities.discard(entity_id)
+                if not entities:
+                    del self._entities_by_area[previous_area_id]
+
+        if entity_id in self._names:
+            self._areas[entity_id] = area_id
+            if area_id is not None:
+                self._entities_by_area.setdefault(area_id, set()).add(entity_id)
+
+    @callback
+    def _async_update_entity(self, entity_id: str, state: State | None = None, reindex: bool = False) -> None:
+        """Insert, update or remove the entry of a single entity.
+
+        Args:
+            entity_id (str): Entity ID to refresh.
+            state (State | None): Current state of the entity, looked up if not provided.
+            reindex (bool): Whether to re-index the names and area even if they did not change.
+        """
+        state = state or self.hass.states.get(entity_id)
+
+        if state is None or not self._is_exposed(entity_id):
+            self._async_remove_entity(entity_id)
+            return
+
+        area_id = self._registry_areas.get(entity_id)
+        names = self._collect_names(state)
+
+        # Names and area rarely change: only re-index them when they do, not on every state change
+        if reindex or entity_id not in self._tokens or self._names.get(entity_id) != names or self._areas.get(entity_id) != area_id:
+            self._set_names(entity_id, names)
+            self._set_tokens(entity_id, self._collect_tokens(entity_id, names, area_id))
+            self._set_trigrams(entity_id, self._collect_fuzzy_names(names, area_id))
+            self._set_area(entity_id, area_id)
+
+        line = self._format_line(state, area_id)
+        if self._lines.get(entity_id) != line:
+            self._lines[entity_id] = line
+            self._summary = None
+
+    @callback
+    def _async_on_state_changed(self, event: Event) -> None:
+        """Patch the entry of the entity whose state changed."""
+        if event.data.get("new_state") is None:
+            self._invalidate_exposure(event.data["entity_id"]) # Entity removed
+
+        self._async_update_entity(event.data["entity_id"], event.data.get("new_state"))
+
+        if event.data.get("new_state") is None or event.data.get("old_state") is None:
+            self._summary = None # Entity count changed
+
+    @callback
+    def _async_on_entity_registry_updated(self, event: Event) -> None:
+        """Patch the entries affected by an entity registry update."""
+        if old_entity_id := event.data.get("old_entity_id"):
+            self._invalidate_exposure(old_entity_id)
+            self._async_update_registry_entry(old_entity_id)
+            self._async_remove_entity(old_entity_id)
+
+        # Registry options hold the expose settings of the entity
+        self._invalidate_exposure(event.data["entity_id"])
+        self._async_update_registry_entry(event.data["entity_id"])
+        self._async_update_entity(event.data["entity_id"])
+
+    @callback
+    def _async_on_device_registry_updated(self, event: Event) -> None:
+        """Patch the entries of the entities belonging to an updated device."""
+        if event.data.get("action") != "update":
+            return
+
+        ha_entity_registry = entity_registry.async_get(self.hass)
+        for ha_entity in entity_registry.async_entries_for_device(ha_entity_registry, event.data["device_id"], include_disabled_entities=True):
+            self._async_update_registry_entry(ha_entity.entity_id)
+            self._async_update_entity(ha_entity.entity_id)
+
+    @callback
+    def _async_on_area_registry_updated(self, event: Event) -> None:
+        """Patch the entries of the entities in a created, renamed or removed area."""
+        area_id = event.data.get("area_id")
+        if area_id is None:
+            return # Areas reordered
+
+        area = area_registry.async_get(self.hass).async_get_area(area_id)
+        if area is None:
+            self._area_names.pop(area_id, None)
+        else:
+            self._area_names[area_id] = (area.name, *area.aliases)
+
+        # Entities moved out of a removed area are patched by the entity and device registry events
+        for entity_id in self.get_area_entities(area_id):
+            self._async_update_entity(entity_id, reindex=True)
+
+    @callback
+    def _async_on_exposure_updated(self) -> None:
+        """Re-evaluate the exposure of every entity after the expose settings changed."""
+        previously_exposed = set(self._exposed)
+        self._exposure.clear()
+        self._exposed.clear()
+
+        for entity_id in self.hass.states.async_entity_ids():
+            self._is_exposed(entity_id)
+
+        for entity_id in previously_exposed ^ self._exposed:
+            self._async_update_entity(entity_id)
@@ -0,0 +1,81 @@
+"""Hedged requests sent to a faster fallback model when the primary request is too slow."""
+import asyncio
+import logging
+
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+
+_LOGGER = logging.getLogger(__name__)
+
+HEDGE_PRIMARY: str = "primary"
+HEDGE_FALLBACK: str = "fallback"
+
+
+@dataclass
+class HedgeStats:
+    """How often hedging fired and which request won."""
+    requests: int = 0
+    hedged: int = 0
+    primary_won: int = 0
+    fallback_won: int = 0
+
+    @property
+    def attributes(self) -> dict:
+        """Return the statistics as sensor attributes."""
+        return {
+            "requests": self.requests,
+            "hedge_rate": round(self.hedged / self.requests, 3) if self.requests else 0.0,
+            "primary_won": self.primary_won,
+            "fallback_won": self.fallback_won,
+        }
+
+
+async def async_hedge(primary: Callable[[], Awaitable[dict]], fallback: Callable[[], Awaitable[dict]], delay: float, stats: HedgeStats) -> tuple[dict, str]:
+    """Send a request, and a hedged one if the first has not returned after a delay.
+
+    The first successful answer wins and the other request is cancelled. If both fail,
+    the error of the primary request is returned.
+
+    Args:
+        primary (Callable[[], Awaitable[dict]]): Sends the primary request.
+        fallback (Callable[[], Awaitable[dict]]): Sends the hedged request.
+        delay (float): Delay (in seconds) before the hedged request is sent.
+        stats (HedgeStats): Statistics to update.
+    Returns:
+        tuple[dict, str]: Result of the winning request, and which request won.
+    """
+    stats.requests += 1
+    primary_task = asyncio.ensure_future(primary())
+    tasks: dict[asyncio.Future, str] = {primary_task: HEDGE_PRIMARY}
+
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if done:
+            return primary_task.result(), HEDGE_PRIMARY
+
+        _LOGGER.debug("Primary request still pending after %.1f s, sending a hedged request.", delay)
+        stats.hedged += 1
+        tasks[asyncio.ensure_future(fallback())] = HEDGE_FALLBACK
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            # The primary request wins a tie
+            for task in sorted(done, key=lambda task: tasks[task] != HEDGE_PRIMARY):
+                data = task.result()
+                if "error" not in data:
+                    winner = tasks[task]
+                    if winner == HEDGE_PRIMARY:
+                        stats.primary_won += 1
+                    else:
+                        stats.fallback_won += 1
+                    _LOGGER.debug("Hedged request won by the %s request.", winner)
+                    return data, winner
+
+        return primary_task.result(), HEDGE_PRIMARY
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
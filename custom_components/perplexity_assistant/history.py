@@ -0,0 +1,177 @@
+"""Per-conversation history store with bounded memory for the Perplexity Assistant agent."""
+import logging
+import time
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any
+from homeassistant.config_entries import ConfigEntry
+
+from .const import *
+
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_CONVERSATIONS: int = 100          # Conversations remembered at once, the least recently used ones are evicted first
+MAX_HISTORY_CHARS: int = 200_000      # Characters remembered across all conversations
+
+
+@dataclass
+class ConversationTurn:
+    """A user prompt and the answer it got."""
+    prompt: str
+    response: str
+
+    @property
+    def size(self) -> int:
+        """Return the number of characters of the turn."""
+        return len(self.prompt) + len(self.response)
+
+    def to_messages(self) -> list[dict]:
+        """Return the turn as role-tagged chat messages."""
+        return [{"role": "user", "content": self.prompt}, {"role": "assistant", "content": self.response}]
+
+
+@dataclass
+class Conversation:
+    """Turns of a single conversation."""
+    turns: deque[ConversationTurn] = field(default_factory=deque)
+    size: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ConversationHistory:
+    """History of the conversations held with the agent, keyed by conversation ID.
+
+    Each conversation keeps its latest turns only. Conversations idle for too long are
+    forgotten, and the least recently used ones are evicted when too many conversations
+    or characters are remembered.
+    """
+
+    def __init__(self, config_entry: ConfigEntry) -> None:
+        """Initialize the history store.
+
+        Args:
+            config_entry (ConfigEntry): Configuration entry the history belongs to.
+        """
+        self.config_entry: ConfigEntry = config_entry
+
+        self._conversations: OrderedDict[str, Conversation] = OrderedDict()
+        self._size: int = 0
+
+    def _get_config(self, key: str, default: Any = None) -> Any:
+        """Helper to get configuration options with a default.
+
+        Args:
+            key (str): Configuration key.
+            default (any): Default value if key is not found.
+        Returns:
+            any: Configuration value or default.
+        """
+        return self.config_entry.options.get(key, self.config_entry.data.get(key, default))
+
+    @property
+    def size(self) -> int:
+        """Return the number of characters remembered across all conversations."""
+        return self._size
+
+    def __len__(self) -> int:
+        """Return the number of conversations remembered."""
+        return len(self._conversations)
+
+    def get_turns(self, conversation_id: str | None) -> list[list[dict]]:
+        """Return the history of a conversation.
+
+        Args:
+            conversation_id (str | None): Conversation ID.
+        Returns:
+            list[list[dict]]: Role-tagged messages of each turn, oldest first.
+        """
+        self._evict_idle()
+
+        conversation = self._conversations.get(conversation_id) if conversation_id else None
+        if conversation is None:
+            return []
+
+        conversation.last_used = time.monotonic()
+        self._conversations.move_to_end(conversation_id)
+        return [turn.to_messages() for turn in conversation.turns]
+
+    def add_turn(self, conversation_id: str | None, prompt: str, response: str) -> None:
+        """Remember a turn of a conversation.
+
+        Args:
+            conversation_id (str | None): Conversation ID, turns without one are not remembered.
+            prompt (str): User prompt.
+            response (str): Answer of the agent.
+        """
+        max_turns = int(self._get_config(CONF_HISTORY_MAX_TURNS, DEFAULT_HISTORY_MAX_TURNS))
+        if not conversation_id or max_turns <= 0:
+            return
+
+        conversation = self._conversations.get(conversation_id)
+        if conversation is None:
+            conversation = self._conversations[conversation_id] = Conversation()
+
+        turn = ConversationTurn(prompt, response)
+        conversation.turns.append(turn)
+        conversation.size += turn.size
+        conversation.last_used = time.monotonic()
+        self._size += turn.size
+        self._conversations.move_to_end(conversation_id)
+
+        while len(conversation.turns) > max_turns:
+            self._drop_oldest_turn(conversation)
+
+        self._evict_idle()
+        self._evict_overflow(conversation_id)
+
+    def clear(self, conversation_id: str | None = None) -> None:
+        """Forget a conversation, or all of them.
+
+        Args:
+            conversation_id (str | None): Conversation to forget, all of them if not set.
+        """
+        if conversation_id is None:
+            self._conversations.clear()
+            self._size = 0
+        elif (conversation := self._conversations.pop(conversation_id, None)) is not None:
+            self._size -= conversation.size
+
+    def _drop_oldest_turn(self, conversation: Conversation) -> None:
+        """Forget the oldest turn of a conversation."""
+        turn = conversation.turns.popleft()
+        conversation.size -= turn.size
+        self._size -= turn.size
+
+    def _evict_idle(self) -> None:
+        """Forget the conversations idle for longer than the configured timeout."""
+        timeout = self._get_config(CONF_HISTORY_IDLE_TIMEOUT, DEFAULT_HISTORY_IDLE_TIMEOUT)
+        if timeout <= 0:
+            return
+
+        # Conversations are ordered by last use, so only the oldest ones need checking
+        expired_before = time.monotonic() - timeout
+        while self._conversations:
+            conversation_id, conversation = next(iter(self._conversations.items()))
+            if conversation.last_used > expired_before:
+                break
+
+            _LOGGER.debug("Forgetting idle conversation %s.", conversation_id)
+            self.clear(conversation_id)
+
+    def _evict_overflow(self, current_conversation_id: str) -> None:
+        """Evict the least recently used conversations above the conversation and memory caps.
+
+        Args:
+            current_conversation_id (str): Conversation being updated, trimmed rather than evicted.
+        """
+        while len(self._conversations) > MAX_CONVERSATIONS or (self._size > MAX_HISTORY_CHARS and len(self._conversations) > 1):
+            conversation_id = next(iter(self._conversations))
+            _LOGGER.debug("Evicting least recently used conversation %s.", conversation_id)
+            self.clear(conversation_id)
+
+        # A single conversation above the cap keeps its latest turns only
+        conversation = self._conversations.get(current_conversation_id)
+        while conversation and self._size > MAX_HISTORY_CHARS and len(conversation.turns) > 1:
+            self._drop_oldest_turn(conversation)
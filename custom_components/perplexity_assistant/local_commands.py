@@ -0,0 +1,209 @@
+"""Local fast path for simple device commands, answered without calling the Perplexity API."""
+import logging
+import re
+
+from dataclasses import dataclass
+from homeassistant.core import Context, HomeAssistant
+
+from .entities import EntityIndex, normalize_name
+from .targets import TargetResolver
+
+
+_LOGGER = logging.getLogger(__name__)
+
+TARGET = r"(?P<target>.+?)"
+
+# VERB + ENTITY patterns, matched against the normalized utterance (see normalize_name)
+COMMAND_PATTERNS: dict[str, list[tuple[str, str]]] = {
+    "en": [
+        ("on", rf"^(?:please )?(?:turn|switch|power) on {TARGET}(?: please)?$"),
+        ("on", rf"^(?:please )?(?:turn|switch|power) {TARGET} on(?: please)?$"),
+        ("off", rf"^(?:please )?(?:turn|switch|power) off {TARGET}(?: please)?$"),
+        ("off", rf"^(?:please )?(?:turn|switch|power) {TARGET} off(?: please)?$"),
+        ("open", rf"^(?:please )?open {TARGET}(?: please)?$"),
+        ("close", rf"^(?:please )?(?:close|shut) {TARGET}(?: please)?$"),
+        ("toggle", rf"^(?:please )?toggle {TARGET}(?: please)?$"),
+    ],
+    "fr": [
+        ("on", rf"^(?:allume|allumez|allumer) {TARGET}(?: s il te plaît| s il vous plaît| stp| svp)?$"),
+        ("off", rf"^(?:éteins|éteignez|éteindre|eteins) {TARGET}(?: s il te plaît| s il vous plaît| stp| svp)?$"),
+        ("open", rf"^(?:ouvre|ouvrez|ouvrir) {TARGET}(?: s il te plaît| s il vous plaît| stp| svp)?$"),
+        ("close", rf"^(?:ferme|fermez|fermer) {TARGET}(?: s il te plaît| s il vous plaît| stp| svp)?$"),
+        ("toggle", rf"^(?:bascule|basculer) {TARGET}$"),
+    ],
+    "es": [
+        ("on", rf"^(?:enciende|encienda|encender|prende|prenda) {TARGET}(?: por favor)?$"),
+        ("off", rf"^(?:apaga|apague|apagar) {TARGET}(?: por favor)?$"),
+        ("open", rf"^(?:abre|abra|abrir) {TARGET}(?: por favor)?$"),
+        ("close", rf"^(?:cierra|cierre|cerrar) {TARGET}(?: por favor)?$"),
+    ],
+    "de": [
+        ("on", rf"^(?:bitte )?(?:schalte|schalt|mach|mache) {TARGET} (?:ein|an)(?: bitte)?$"),
+        ("off", rf"^(?:bitte )?(?:schalte|schalt|mach|mache) {TARGET} aus(?: bitte)?$"),
+        ("open", rf"^(?:bitte )?(?:öffne|öffnen) {TARGET}(?: bitte)?$"),
+        ("open", rf"^(?:bitte )?(?:mach|mache) {TARGET} auf(?: bitte)?$"),
+        ("close", rf"^(?:bitte )?(?:schliesse|schliess|schliessen) {TARGET}(?: bitte)?$"),
+        ("close", rf"^(?:bitte )?(?:mach|mache) {TARGET} zu(?: bitte)?$"),
+    ],
+    "it": [
+        ("on", rf"^(?:accendi|accenda|accendere) {TARGET}(?: per favore)?$"),
+        ("off", rf"^(?:spegni|spenga|spegnere) {TARGET}(?: per favore)?$"),
+        ("open", rf"^(?:apri|apra|aprire) {TARGET}(?: per favore)?$"),
+        ("close", rf"^(?:chiudi|chiuda|chiudere) {TARGET}(?: per favore)?$"),
+    ],
+    "pt": [
+        ("on", rf"^(?:liga|ligue|ligar|acende|acenda) {TARGET}(?: por favor)?$"),
+        ("off", rf"^(?:desliga|desligue|desligar|apaga|apague) {TARGET}(?: por favor)?$"),
+        ("open", rf"^(?:abre|abra|abrir) {TARGET}(?: por favor)?$"),
+        ("close", rf"^(?:fecha|feche|fechar) {TARGET}(?: por favor)?$"),
+    ],
+    "nl": [
+        ("on", rf"^(?:zet|doe|schakel) {TARGET} (?:aan|in)(?: alsjeblieft| alstublieft)?$"),
+        ("off", rf"^(?:zet|doe|schakel) {TARGET} uit(?: alsjeblieft| alstublieft)?$"),
+        ("open", rf"^open {TARGET}(?: alsjeblieft| alstublieft)?$"),
+        ("open", rf"^doe {TARGET} open(?: alsjeblieft| alstublieft)?$"),
+        ("close", rf"^sluit {TARGET}(?: alsjeblieft| alstublieft)?$"),
+        ("close", rf"^doe {TARGET} dicht(?: alsjeblieft| alstublieft)?$"),
+    ],
+    "zh": [
+        ("on", rf"^请?(?:打开|开启|开){TARGET}吧?$"),
+        ("on", rf"^请?把{TARGET}(?:打开|开启)吧?$"),
+        ("off", rf"^请?(?:关闭|关掉|关上|关){TARGET}吧?$"),
+        ("off", rf"^请?把{TARGET}(?:关闭|关掉|关上)吧?$"),
+    ],
+    "ja": [
+        ("on", rf"^{TARGET}を?(?:つけて|点けて|オンにして)(?:ください)?$"),
+        ("off", rf"^{TARGET}を?(?:けして|消して|オフにして|切って)(?:ください)?$"),
+        ("open", rf"^{TARGET}を?(?:あけて|開けて|開いて)(?:ください)?$"),
+        ("close", rf"^{TARGET}を?(?:しめて|閉めて|閉じて)(?:ください)?$"),
+    ],
+    "ko": [
+        ("on", rf"^{TARGET}(?:을|를)? ?(?:켜 ?줘|켜 ?주세요|켜)$"),
+        ("off", rf"^{TARGET}(?:을|를)? ?(?:꺼 ?줘|꺼 ?주세요|꺼)$"),
+        ("open", rf"^{TARGET}(?:을|를)? ?(?:열어 ?줘|열어 ?주세요|열어)$"),
+        ("close", rf"^{TARGET}(?:을|를)? ?(?:닫아 ?줘|닫아 ?주세요|닫아)$"),
+    ],
+}
+
+# Spoken confirmation of an executed command
+CONFIRMATION_TEMPLATES: dict[str, dict[str, str]] = {
+    "en": {"on": "Turned on {targets}.", "off": "Turned off {targets}.", "open": "Opened {targets}.", "close": "Closed {targets}.", "toggle": "Toggled {targets}."},
+    "fr": {"on": "J'ai allumé {targets}.", "off": "J'ai éteint {targets}.", "open": "J'ai ouvert {targets}.", "close": "J'ai fermé {targets}.", "toggle": "J'ai basculé {targets}."},
+    "es": {"on": "He encendido {targets}.", "off": "He apagado {targets}.", "open": "He abierto {targets}.", "close": "He cerrado {targets}.", "toggle": "He cambiado {targets}."},
+    "de": {"on": "{targets} eingeschaltet.", "off": "{targets} ausgeschaltet.", "open": "{targets} geöffnet.", "close": "{targets} geschlossen.", "toggle": "{targets} umgeschaltet."},
+    "it": {"on": "Ho acceso {targets}.", "off": "Ho spento {targets}.", "open": "Ho aperto {targets}.", "close": "Ho chiuso {targets}.", "toggle": "Ho commutato {targets}."},
+    "pt": {"on": "Liguei {targets}.", "off": "Desliguei {targets}.", "open": "Abri {targets}.", "close": "Fechei {targets}.", "toggle": "Alternei {targets}."},
+    "nl": {"on": "{targets} ingeschakeld.", "off": "{targets} uitgeschakeld.", "open": "{targets} geopend.", "close": "{targets} gesloten.", "toggle": "{targets} omgeschakeld."},
+    "zh": {"on": "已打开{targets}。", "off": "已关闭{targets}。", "open": "已打开{targets}。", "close": "已关闭{targets}。", "toggle": "已切换{targets}。"},
+    "ja": {"on": "{targets}をつけました。", "off": "{targets}を消しました。", "open": "{targets}を開けました。", "close": "{targets}を閉めました。", "toggle": "{targets}を切り替えました。"},
+    "ko": {"on": "{targets}을(를) 켰습니다.", "off": "{targets}을(를) 껐습니다.", "open": "{targets}을(를) 열었습니다.", "close": "{targets}을(를) 닫았습니다.", "toggle": "{targets}을(를) 전환했습니다."},
+}
+
+# Domains the fast path may act on. Security-sensitive domains (locks, alarms, ...) are always left to the model.
+TOGGLE_DOMAINS: set[str] = {"light", "switch", "fan", "input_boolean", "media_player", "climate", "humidifier", "siren", "automation", "remote"}
+OPENABLE_DOMAINS: dict[str, tuple[str, str]] = {"cover": ("open_cover", "close_cover"), "valve": ("open_valve", "close_valve")}
+
+
+@dataclass
+class LocalCommand:
+    """A command resolved locally, ready to be executed."""
+    action: str
+    entity_ids: list[str]
+    calls: list[tuple[str, str, list[str]]] # (domain, service, entity IDs)
+
+
+def get_service(action: str, domain: str) -> tuple[str, str] | None:
+    """Get the service implementing an action on an entity domain.
+
+    Args:
+        action (str): Action of the command (on, off, open, close, toggle).
+        domain (str): Domain of the targeted entity.
+    Returns:
+        tuple[str, str] | None: Service domain and name, or None if the action does not apply to the domain.
+    """
+    if domain in OPENABLE_DOMAINS:
+        open_service, close_service = OPENABLE_DOMAINS[domain]
+        if action in ("on", "open"):
+            return domain, open_service
+        if action in ("off", "close"):
+            return domain, close_service
+        return None
+
+    if domain in TOGGLE_DOMAINS:
+        service = {"on": "turn_on", "off": "turn_off", "toggle": "toggle"}.get(action)
+        return (domain, service) if service else None
+
+    if domain in ("scene", "script") and action == "on":
+        return domain, "turn_on"
+
+    return None
+
+
+class LocalCommandMatcher:
+    """Match simple VERB + ENTITY commands against the exposed entities.
+
+    A command is only resolved when its target designates the entities without any
+    ambiguity; anything else is left to Perplexity.
+    """
+
+    def __init__(self, hass: HomeAssistant, entity_index: EntityIndex) -> None:
+        """Initialize the command matcher.
+
+        Args:
+            hass (HomeAssistant): Home Assistant instance.
+            entity_index (EntityIndex): Index of the exposed entities.
+        """
+        self.hass: HomeAssistant = hass
+        self._targets: TargetResolver = TargetResolver(hass, entity_index)
+        self._patterns: dict[str, list[tuple[str, re.Pattern]]] = {
+            language: [(action, re.compile(pattern)) for action, pattern in patterns] for language, patterns in COMMAND_PATTERNS.items()
+        }
+
+    def match(self, text: str, language: str) -> LocalCommand | None:
+        """Match an utterance against the known commands.
+
+        Args:
+            text (str): User utterance.
+            language (str): Language of the utterance.
+        Returns:
+            LocalCommand | None: The resolved command, or None when not confident.
+        """
+        utterance = normalize_name(text)
+
+        for action, pattern in self._patterns.get(language, []):
+            match = pattern.match(utterance)
+            if not match:
+                continue
+
+            entity_ids = self._targets.resolve(match.group("target"), language)
+            if not entity_ids:
+                return None
+
+            calls: dict[tuple[str, str], list[str]] = {}
+            for entity_id in entity_ids:
+                service = get_service(action, entity_id.split(".", 1)[0])
+                if service is None:
+                    return None # At least one target does not support the action
+                calls.setdefault(service, []).append(entity_id)
+
+            return LocalCommand(action, entity_ids, [(domain, service, ids) for (domain, service), ids in calls.items()])
+
+        return None
+
+    async def async_execute(self, command: LocalCommand, language: str, context: Context | None = None) -> str:
+        """Execute a resolved command.
+
+        Args:
+            command (LocalCommand): Command to execute.
+            language (str): Language of the confirmation.
+            context (Context | None): Context of the originating request.
+        Returns:
+            str: Spoken confirmation of the command.
+        """
+        for domain, service, entity_ids in command.calls:
+            _LOGGER.debug("Executing local command %s.%s on %s", domain, service, entity_ids)
+            await self.hass.services.async_call(domain, service, {"entity_id": entity_ids}, blocking=True, context=context)
+
+        names = ", ".join(state.name if (state := self.hass.states.get(entity_id)) else entity_id for entity_id in command.entity_ids)
+        templates = CONFIRMATION_TEMPLATES.get(language, CONFIRMATION_TEMPLATES["en"])
+        return templates[command.action].format(targets=names)
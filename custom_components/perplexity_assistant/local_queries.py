@@ -0,0 +1,287 @@
+"""Local answers to simple state questions, read from the state machine without calling the Perplexity API."""
+import logging
+import re
+
+from dataclasses import dataclass
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import HomeAssistant, State
+
+from .entities import EntityIndex, normalize_name
+from .targets import TargetResolver
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Maximum number of entities listed in a single answer
+MAX_LISTED_ENTITIES: int = 10
+
+# Binary sensor device classes whose on/off states mean open/closed
+OPENING_DEVICE_CLASSES: set[str] = {"door", "garage_door", "opening", "window"}
+
+# Words describing a state, mapped to the canonical states they ask about
+STATE_WORDS: dict[str, dict[str, str]] = {
+    "en": {"on": "on", "off": "off", "open": "open", "closed": "closed", "shut": "closed", "locked": "locked", "unlocked": "unlocked", "home": "home", "away": "not_home"},
+    "fr": {"allumé": "on", "allumée": "on", "allumés": "on", "allumées": "on", "éteint": "off", "éteinte": "off", "éteints": "off", "éteintes": "off",
+           "ouvert": "open", "ouverte": "open", "ouverts": "open", "ouvertes": "open", "fermé": "closed", "fermée": "closed", "fermés": "closed", "fermées": "closed",
+           "verrouillé": "locked", "verrouillée": "locked", "déverrouillé": "unlocked", "déverrouillée": "unlocked", "à la maison": "home", "absent": "not_home", "absente": "not_home"},
+    "es": {"encendido": "on", "encendida": "on", "encendidos": "on", "encendidas": "on", "apagado": "off", "apagada": "off", "apagados": "off", "apagadas": "off",
+           "abierto": "open", "abierta": "open", "abiertos": "open", "abiertas": "open", "cerrado": "closed", "cerrada": "closed", "cerrados": "closed", "cerradas": "closed",
+           "bloqueado": "locked", "bloqueada": "locked", "desbloqueado": "unlocked", "desbloqueada": "unlocked", "en casa": "home", "fuera": "not_home", "ausente": "not_home"},
+    "de": {"an": "on", "ein": "on", "eingeschaltet": "on", "aus": "off", "ausgeschaltet": "off", "offen": "open", "geöffnet": "open", "auf": "open",
+           "geschlossen": "closed", "zu": "closed", "verriegelt": "locked", "abgeschlossen": "locked", "entriegelt": "unlocked", "aufgeschlossen": "unlocked",
+           "zu hause": "home", "daheim": "home", "weg": "not_home", "abwesend": "not_home"},
+    "it": {"acceso": "on", "accesa": "on", "accesi": "on", "accese": "on", "spento": "off", "spenta": "off", "spenti": "off", "spente": "off",
+           "aperto": "open", "aperta": "open", "aperti": "open", "aperte": "open", "chiuso": "closed", "chiusa": "closed", "chiusi": "closed", "chiuse": "closed",
+           "bloccato": "locked", "bloccata": "locked", "sbloccato": "unlocked", "sbloccata": "unlocked", "a casa": "home", "fuori": "not_home", "assente": "not_home"},
+    "pt": {"ligado": "on", "ligada": "on", "ligados": "on", "ligadas": "on", "aceso": "on", "acesa": "on", "desligado": "off", "desligada": "off", "desligados": "off", "desligadas": "off",
+           "apagado": "off", "apagada": "off", "aberto": "open", "aberta": "open", "abertos": "open", "abertas": "open", "fechado": "closed", "fechada": "closed", "fechados": "closed", "fechadas": "closed",
+           "trancado": "locked", "trancada": "locked", "destrancado": "unlocked", "destrancada": "unlocked", "em casa": "home", "fora": "not_home", "ausente": "not_home"},
+    "nl": {"aan": "on", "uit": "off", "open": "open", "dicht": "closed", "gesloten": "closed", "op slot": "locked", "vergrendeld": "locked", "ontgrendeld": "unlocked",
+           "thuis": "home", "weg": "not_home", "afwezig": "not_home"},
+    "zh": {"开着": "on", "开了": "on", "亮着": "on", "打开": "open", "关着": "off", "关了": "off", "关闭": "closed", "锁着": "locked", "锁上了": "locked", "没锁": "unlocked",
+           "在家": "home", "不在家": "not_home"},
+    "ja": {"ついて": "on", "点いて": "on", "消えて": "off", "開いて": "open", "あいて": "open", "閉まって": "closed", "しまって": "closed", "ロックされて": "locked", "施錠されて": "locked"},
+    "ko": {"켜져": "on", "꺼져": "off", "열려": "open", "닫혀": "closed", "잠겨": "locked"},
+}
+
+# Localized names of the common states, used in answers
+STATE_NAMES: dict[str, dict[str, str]] = {
+    "en": {"on": "on", "off": "off", "open": "open", "closed": "closed", "locked": "locked", "unlocked": "unlocked", "home": "home", "not_home": "away", "unavailable": "unavailable", "unknown": "unknown"},
+    "fr": {"on": "allumé", "off": "éteint", "open": "ouvert", "closed": "fermé", "locked": "verrouillé", "unlocked": "déverrouillé", "home": "à la maison", "not_home": "absent", "unavailable": "indisponible", "unknown": "inconnu"},
+    "es": {"on": "encendido", "off": "apagado", "open": "abierto", "closed": "cerrado", "locked": "bloqueado", "unlocked": "desbloqueado", "home": "en casa", "not_home": "fuera", "unavailable": "no disponible", "unknown": "desconocido"},
+    "de": {"on": "an", "off": "aus", "open": "offen", "closed": "geschlossen", "locked": "verriegelt", "unlocked": "entriegelt", "home": "zu Hause", "not_home": "abwesend", "unavailable": "nicht verfügbar", "unknown": "unbekannt"},
+    "it": {"on": "acceso", "off": "spento", "open": "aperto", "closed": "chiuso", "locked": "bloccato", "unlocked": "sbloccato", "home": "a casa", "not_home": "fuori casa", "unavailable": "non disponibile", "unknown": "sconosciuto"},
+    "pt": {"on": "ligado", "off": "desligado", "open": "aberto", "closed": "fechado", "locked": "trancado", "unlocked": "destrancado", "home": "em casa", "not_home": "fora", "unavailable": "indisponível", "unknown": "desconhecido"},
+    "nl": {"on": "aan", "off": "uit", "open": "open", "closed": "dicht", "locked": "op slot", "unlocked": "ontgrendeld", "home": "thuis", "not_home": "afwezig", "unavailable": "niet beschikbaar", "unknown": "onbekend"},
+    "zh": {"on": "开着", "off": "关着", "open": "打开", "closed": "关闭", "locked": "已锁定", "unlocked": "未锁定", "home": "在家", "not_home": "不在家", "unavailable": "不可用", "unknown": "未知"},
+    "ja": {"on": "オン", "off": "オフ", "open": "開", "closed": "閉", "locked": "施錠", "unlocked": "解錠", "home": "在宅", "not_home": "外出", "unavailable": "利用不可", "unknown": "不明"},
+    "ko": {"on": "켜짐", "off": "꺼짐", "open": "열림", "closed": "닫힘", "locked": "잠김", "unlocked": "잠금 해제", "home": "집", "not_home": "외출", "unavailable": "사용 불가", "unknown": "알 수 없음"},
+}
+
+# Answer templates: the state of an entity, a yes/no answer about one entity, and the entities of a group in a state
+ANSWER_TEMPLATES: dict[str, dict[str, str]] = {
+    "en": {"state": "{name} is {state}.", "yes": "Yes, {name} is {state}.", "no": "No, {name} is {state}.", "list": "{state}: {names}.", "none": "None of them is {state}.", "affirmative": "Yes.", "negative": "No."},
+    "fr": {"state": "{name} est {state}.", "yes": "Oui, {name} est {state}.", "no": "Non, {name} est {state}.", "list": "{state} : {names}.", "none": "Aucun n'est {state}.", "affirmative": "Oui.", "negative": "Non."},
+    "es": {"state": "{name} está {state}.", "yes": "Sí, {name} está {state}.", "no": "No, {name} está {state}.", "list": "{state}: {names}.", "none": "Ninguno está {state}.", "affirmative": "Sí.", "negative": "No."},
+    "de": {"state": "{name} ist {state}.", "yes": "Ja, {name} ist {state}.", "no": "Nein, {name} ist {state}.", "list": "{state}: {names}.", "none": "Keines ist {state}.", "affirmative": "Ja.", "negative": "Nein."},
+    "it": {"state": "{name} è {state}.", "yes": "Sì, {name} è {state}.", "no": "No, {name} è {state}.", "list": "{state}: {names}.", "none": "Nessuno è {state}.", "affirmative": "Sì.", "negative": "No."},
+    "pt": {"state": "{name} está {state}.", "yes": "Sim, {name} está {state}.", "no": "Não, {name} está {state}.", "list": "{state}: {names}.", "none": "Nenhum está {state}.", "affirmative": "Sim.", "negative": "Não."},
+    "nl": {"state": "{name} is {state}.", "yes": "Ja, {name} is {state}.", "no": "Nee, {name} is {state}.", "list": "{state}: {names}.", "none": "Geen enkele is {state}.", "affirmative": "Ja.", "negative": "Nee."},
+    "zh": {"state": "{name}：{state}。", "yes": "是的，{name}：{state}。", "no": "不，{name}：{state}。", "list": "{state}：{names}。", "none": "没有{state}的。", "affirmative": "是的。", "negative": "没有。"},
+    "ja": {"state": "{name}は{state}です。", "yes": "はい、{name}は{state}です。", "no": "いいえ、{name}は{state}です。", "list": "{state}：{names}。", "none": "{state}のものはありません。", "affirmative": "はい。", "negative": "いいえ。"},
+    "ko": {"state": "{name}: {state}.", "yes": "네, {name}: {state}.", "no": "아니요, {name}: {state}.", "list": "{state}: {names}.", "none": "{state} 상태인 것이 없습니다.", "affirmative": "네.", "negative": "아니요."},
+}
+
+TARGET = r"(?P<target>.+?)"
+
+
+def _state_pattern(language: str) -> str:
+    """Build the alternation matching the state words of a language, longest first."""
+    words = sorted(STATE_WORDS[language], key=len, reverse=True)
+    return "(?P<state>" + "|".join(re.escape(word) for word in words) + ")"
+
+
+# Question patterns, matched against the normalized utterance. Kinds:
+# - "state": what is the state of the target
+# - "check": is the target in the given state (yes/no)
+# - "list": which entities of the target are in the given state
+QUERY_PATTERNS: dict[str, list[tuple[str, str]]] = {
+    "en": [
+        ("list", rf"^(?:which|what) {TARGET} (?:is|are) {_state_pattern('en')}(?: (?P<where>(?:in|at|on) .+))?$"),
+        ("check", rf"^(?:is|are) (?:there )?(?:any )?{TARGET} {_state_pattern('en')}(?: (?P<where>(?:in|at|on) .+))?$"),
+        ("state", rf"^(?:what|how) (?:is|s|are) {TARGET}$"),
+    ],
+    "fr": [
+        ("list", rf"^(?:quels|quelles|quel|quelle) {TARGET} (?:est|sont) {_state_pattern('fr')}(?: (?P<where>(?:dans|au|à) .+))?$"),
+        ("check", rf"^(?:y a t il|est ce qu il y a) (?:des |une |un )?{TARGET} {_state_pattern('fr')}(?: (?P<where>(?:dans|au|à) .+))?$"),
+        ("check", rf"^(?:est ce que )?{TARGET} (?:est|sont) {_state_pattern('fr')}$"),
+        ("check", rf"^{TARGET} (?:est il|est elle|sont ils|sont elles) {_state_pattern('fr')}$"),
+        ("state", rf"^(?:quel est|quelle est|quels sont|quelles sont|comment est) {TARGET}$"),
+    ],
+    "es": [
+        ("list", rf"^(?:qué|que|cuáles|cuales) {TARGET} (?:está|están|esta|estan) {_state_pattern('es')}(?: (?P<where>en .+))?$"),
+        ("check", rf"^hay (?:alguna |algún |algunas |algunos )?{TARGET} {_state_pattern('es')}(?: (?P<where>en .+))?$"),
+        ("check", rf"^(?:está|están|esta|estan) {_state_pattern('es')} {TARGET}$"),
+        ("check", rf"^(?:está|están|esta|estan) {TARGET} {_state_pattern('es')}$"),
+        ("state", rf"^(?:cuál es|cual es|cómo está|como esta|cómo están|como estan) {TARGET}$"),
+    ],
+    "de": [
+        ("list", rf"^welche {TARGET} (?:ist|sind) {_state_pattern('de')}$"),
+        ("check", rf"^(?:ist|sind) (?:irgendein |irgendeine |irgendwelche |noch )?{TARGET} {_state_pattern('de')}$"),
+        ("state", rf"^(?:wie ist|was ist|wie sind) {TARGET}$"),
+    ],
+    "it": [
+        ("list", rf"^(?:quali|quale|che) {TARGET} (?:è|sono) {_state_pattern('it')}$"),
+        ("check", rf"^ci sono {TARGET} {_state_pattern('it')}$"),
+        ("check", rf"^(?:è|sono) {_state_pattern('it')} {TARGET}$"),
+        ("check", rf"^{TARGET} (?:è|sono) {_state_pattern('it')}$"),
+        ("state", rf"^(?:qual è|quale è|com è|come sono|quanto è) {TARGET}$"),
+    ],
+    "pt": [
+        ("list", rf"^(?:quais|qual|que) {TARGET} (?:está|estão|esta|estao) {_state_pattern('pt')}$"),
+        ("check", rf"^(?:há|tem) {TARGET} {_state_pattern('pt')}$"),
+        ("check", rf"^(?:está|estão) {TARGET} {_state_pattern('pt')}$"),
+        ("check", rf"^{TARGET} (?:está|estão) {_state_pattern('pt')}$"),
+        ("state", rf"^(?:qual é|qual e|como está|como estão) {TARGET}$"),
+    ],
+    "nl": [
+        ("list", rf"^welke {TARGET} (?:is|zijn|staat|staan) {_state_pattern('nl')}$"),
+        ("check", rf"^(?:is|zijn|staat|staan) er (?:nog )?{TARGET} {_state_pattern('nl')}$"),
+        ("check", rf"^(?:is|zijn|staat|staan) {TARGET} {_state_pattern('nl')}$"),
+        ("state", rf"^(?:wat is|hoe is|hoe zijn) {TARGET}$"),
+    ],
+    "zh": [
+        ("list", rf"^哪些{TARGET}(?:是)?{_state_pattern('zh')}(?:的)?$"),
+        ("check", rf"^有{TARGET}{_state_pattern('zh')}吗$"),
+        ("check", rf"^{TARGET}(?:是不是|是否)?{_state_pattern('zh')}(?:的)?(?:吗|嘛)$"),
+        ("state", rf"^{TARGET}(?:是)?(?:多少|什么状态|怎么样)(?:呢)?$"),
+    ],
+    "ja": [
+        ("list", rf"^どの{TARGET}が{_state_pattern('ja')}(?:います|いる)か$"),
+        ("check", rf"^{TARGET}(?:は|が){_state_pattern('ja')}(?:います|いる)か$"),
+        ("state", rf"^{TARGET}は(?:何度|何|どう|いくつ)(?:ですか|か)$"),
+    ],
+    "ko": [
+        ("list", rf"^어떤 {TARGET}(?:이|가)? ?{_state_pattern('ko')} ?(?:있어|있나요|있어요|있습니까)$"),
+        ("check", rf"^{TARGET}(?:이|가|은|는)? ?{_state_pattern('ko')} ?(?:있어|있나요|있어요|있습니까|있니)$"),
+        ("state", rf"^{TARGET}(?:이|가|은|는)? ?(?:몇 도야|몇 도예요|어때|어때요|뭐야)$"),
+    ],
+}
+
+
+@dataclass
+class LocalQuery:
+    """A state question resolved locally."""
+    kind: str
+    entity_ids: list[str]
+    state: str | None = None # Canonical state asked about, for "check" and "list" questions
+
+
+def get_state_aliases(state: State) -> set[str]:
+    """Get the canonical states an entity is considered to be in.
+
+    Covers and opening sensors that are open also count as "on", and as "off" when closed,
+    so "is the garage door on" and "is the garage door open" get the same answer.
+
+    Args:
+        state (State): Current state of the entity.
+    Returns:
+        set[str]: Canonical states of the entity.
+    """
+    domain = state.entity_id.split(".", 1)[0]
+
+    if domain == "binary_sensor" and state.attributes.get("device_class") in OPENING_DEVICE_CLASSES:
+        return {"on", "open"} if state.state == "on" else {"off", "closed"}
+    if domain in ("cover", "valve"):
+        if state.state in ("open", "opening"):
+            return {state.state, "open", "on"}
+        if state.state in ("closed", "closing"):
+            return {state.state, "closed", "off"}
+
+    return {state.state}
+
+
+class LocalQueryResolver:
+    """Answer simple state questions about exposed entities, areas and domains from the state machine."""
+
+    def __init__(self, hass: HomeAssistant, entity_index: EntityIndex) -> None:
+        """Initialize the query resolver.
+
+        Args:
+            hass (HomeAssistant): Home Assistant instance.
+            entity_index (EntityIndex): Index of the exposed entities.
+        """
+        self.hass: HomeAssistant = hass
+        self._targets: TargetResolver = TargetResolver(hass, entity_index)
+        self._patterns: dict[str, list[tuple[str, re.Pattern]]] = {
+            language: [(kind, re.compile(pattern)) for kind, pattern in patterns] for language, patterns in QUERY_PATTERNS.items()
+        }
+
+    def match(self, text: str, language: str) -> LocalQuery | None:
+        """Match an utterance against the known questions.
+
+        Args:
+            text (str): User utterance.
+            language (str): Language of the utterance.
+        Returns:
+            LocalQuery | None: The resolved question, or None when not confident.
+        """
+        utterance = normalize_name(text)
+
+        for kind, pattern in self._patterns.get(language, []):
+            match = pattern.match(utterance)
+            if not match:
+                continue
+
+            groups = match.groupdict()
+            target = f"{groups['target']} {groups['where']}" if groups.get("where") else groups["target"]
+            entity_ids = self._targets.resolve(target, language, allow_groups=True)
+            if not entity_ids:
+                continue # Another pattern may still split the question differently
+
+            if kind == "state" and len(entity_ids) > MAX_LISTED_ENTITIES:
+                return None
+
+            state = STATE_WORDS[language][groups["state"]] if groups.get("state") else None
+            return LocalQuery(kind, entity_ids, state)
+
+        return None
+
+    def answer(self, query: LocalQuery, language: str) -> str:
+        """Answer a resolved question from the current states.
+
+        Args:
+            query (LocalQuery): Question to answer.
+            language (str): Language of the answer.
+        Returns:
+            str: Spoken answer.
+        """
+        templates = ANSWER_TEMPLATES.get(language, ANSWER_TEMPLATES["en"])
+        states = [state for entity_id in query.entity_ids if (state := self.hass.states.get(entity_id)) is not None]
+
+        if query.kind == "state":
+            return " ".join(templates["state"].format(name=state.name, state=self._describe(state, language)) for state in states)
+
+        matching = [state for state in states if query.state in get_state_aliases(state)]
+        state_name = self._state_name(query.state, language)
+
+        if query.kind == "check" and len(states) == 1:
+            template = templates["yes"] if matching else templates["no"]
+            return template.format(name=states[0].name, state=self._describe(states[0], language) if not matching else state_name)
+
+        if not matching:
+            answer = templates["none"].format(state=state_name)
+            return f"{templates['negative']} {answer}" if query.kind == "check" else answer
+
+        names = ", ".join(state.name for state in matching[:MAX_LISTED_ENTITIES])
+        if len(matching) > MAX_LISTED_ENTITIES:
+            names += f" (+{len(matching) - MAX_LISTED_ENTITIES})"
+
+        answer = templates["list"].format(state=state_name[:1].upper() + state_name[1:], names=names)
+        return f"{templates['affirmative']} {answer}" if query.kind == "check" else answer
+
+    def _state_name(self, state: str, language: str) -> str:
+        """Get the localized name of a canonical state, or the state itself if it has none."""
+        return STATE_NAMES.get(language, STATE_NAMES["en"]).get(state, state)
+
+    def _describe(self, state: State, language: str) -> str:
+        """Describe the current state of an entity.
+
+        Args:
+            state (State): Current state of the entity.
+            language (str): Language of the description.
+        Returns:
+            str: Localized state, with its unit if it has one.
+        """
+        if state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+            return self._state_name(state.state, language)
+
+        if unit := state.attributes.get("unit_of_measurement"):
+            return f"{state.state} {unit}"
+
+        aliases = get_state_aliases(state)
+        for canonical in ("open", "closed"):
+            if canonical in aliases:
+                return self._state_name(canonical, language)
+
+        return self._state_name(state.state, language)
@@ -0,0 +1,224 @@
+"""Performance metrics of the requests sent to the Perplexity API, published as sensors and in the Prometheus text format."""
+import logging
+import math
+
+from collections import deque
+from http import HTTPStatus
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import HomeAssistant
+
+from .const import *
+from .scheduler import PRIORITY_NAMES, PRIORITY_SERVICE
+
+
+_LOGGER = logging.getLogger(__name__)
+
+METRICS_WINDOW: int = 500                   # Latest samples kept to compute the percentiles of a duration
+QUANTILES: tuple[float, ...] = (0.5, 0.95, 0.99)
+METRICS_URL: str = f"/api/{DOMAIN}/metrics"
+METRICS_PREFIX: str = DOMAIN
+PROMETHEUS_CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class DurationSummary:
+    """Percentiles of the latest samples of a duration, with the count and sum of every sample."""
+
+    def __init__(self, window: int = METRICS_WINDOW) -> None:
+        """Initialize the summary.
+
+        Args:
+            window (int): Latest samples kept to compute the percentiles.
+        """
+        self._samples: deque[float] = deque(maxlen=window)
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a sample, in seconds."""
+        self._samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    @classmethod
+    def merge(cls, summaries: list["DurationSummary"]) -> "DurationSummary":
+        """Merge several summaries into one, keeping all of their latest samples."""
+        merged = cls(sum(summary._samples.maxlen or 0 for summary in summaries) or METRICS_WINDOW)
+        for summary in summaries:
+            merged._samples.extend(summary._samples)
+            merged.count += summary.count
+            merged.sum += summary.sum
+        return merged
+
+    def quantiles(self) -> dict[float, float | None]:
+        """Return the percentiles of the latest samples (nearest rank), None if there is none."""
+        samples = sorted(self._samples)
+        if not samples:
+            return dict.fromkeys(QUANTILES)
+        return {quantile: samples[max(math.ceil(quantile * len(samples)) - 1, 0)] for quantile in QUANTILES}
+
+
+class PerformanceMetrics:
+    """Latency, token, cache and error metrics of a conversation agent.
+
+    Latencies cover the requests answered by the Perplexity API, until their response and actions
+    are processed; cached responses are only counted in the cache hit rate, and requests handled
+    locally are not counted at all.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the metrics."""
+        self.request_latency: dict[str, DurationSummary] = {name: DurationSummary() for name in PRIORITY_NAMES.values()}
+        self.time_to_first_byte: DurationSummary = DurationSummary()
+        self.summary_build_time: DurationSummary = DurationSummary()
+        self.prompt_tokens: int = 0
+        self.completion_tokens: int = 0
+        self.cache_hits: int = 0
+        self.cache_misses: int = 0
+        self.errors: int = 0
+        self.retries: int = 0
+
+    def record_request(self, priority: int, latency: float, error: str | None = None) -> None:
+        """Record a request answered by the Perplexity API.
+
+        Args:
+            priority (int): Priority class of the request, selecting its channel.
+            latency (float): Time (in seconds) taken to answer.
+            error (str | None): Error of the request, if it failed.
+        """
+        self.request_latency[PRIORITY_NAMES.get(priority, PRIORITY_NAMES[PRIORITY_SERVICE])].observe(latency)
+        self.errors += error is not None
+
+    def record_usage(self, usage: dict) -> None:
+        """Record the tokens billed for a response, from the ``usage`` field of the API."""
+        self.prompt_tokens += usage.get("prompt_tokens") or 0
+        self.completion_tokens += usage.get("completion_tokens") or 0
+
+    def record_cache_lookup(self, hit: bool) -> None:
+        """Record a lookup of the response cache."""
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+
+    @property
+    def all_request_latency(self) -> DurationSummary:
+        """Return the latency of the requests of every channel."""
+        return DurationSummary.merge(list(self.request_latency.values()))
+
+    @property
+    def sensor_states(self) -> dict[str, tuple[float | int | None, dict]]:
+        """Return the state and attributes of each performance sensor, keyed by sensor."""
+        def _rounded(value: float | None, scale: float = 1.0) -> float | None:
+            return round(value * scale, 3) if value is not None else None
+
+        def _percentiles(summary: DurationSummary, prefix: str = "", scale: float = 1.0) -> dict:
+            return {f"{prefix}p{round(quantile * 100)}": _rounded(value, scale) for quantile, value in summary.quantiles().items()}
+
+        latency = self.all_request_latency
+        latency_attributes = {**_percentiles(latency), "requests": latency.count}
+        for name, summary in self.request_latency.items():
+            latency_attributes.update(_percentiles(summary, f"{name}_"))
+
+        cache_lookups = self.cache_hits + self.cache_misses
+        return {
+            "request_latency": (_rounded(latency.quantiles()[0.95]), latency_attributes),
+            "time_to_first_byte": (_rounded(self.time_to_first_byte.quantiles()[0.95]), {**_percentiles(self.time_to_first_byte), "responses": self.time_to_first_byte.count}),
+            "summary_build_time": (_rounded(self.summary_build_time.quantiles()[0.95], 1000), {**_percentiles(self.summary_build_time, scale=1000), "builds": self.summary_build_time.count}),
+            "tokens": (self.prompt_tokens + self.completion_tokens, {"prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens}),
+            "cache_hit_rate": (round(100 * self.cache_hits / cache_lookups, 1) if cache_lookups else None, {"hits": self.cache_hits, "misses": self.cache_misses}),
+            "request_errors": (self.errors, {"retries": self.retries, "error_rate": round(self.errors / latency.count, 3) if latency.count else 0.0}),
+        }
+
+    def render_prometheus(self, labels: dict[str, str]) -> dict[str, list[str]]:
+        """Render the metrics as samples of the Prometheus text format.
+
+        Args:
+            labels (dict[str, str]): Labels added to every sample, identifying the agent.
+        Returns:
+            dict[str, list[str]]: Sample lines of each metric of ``METRIC_TYPES``.
+        """
+        def _labels(**extra: str) -> str:
+            merged = {**labels, **extra}
+            return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in merged.items()) + "}" if merged else ""
+
+        def _summary(name: str, summary: DurationSummary, **extra: str) -> list[str]:
+            lines = [f"{name}{_labels(**extra, quantile=str(quantile))} {value if value is not None else 'NaN'}" for quantile, value in summary.quantiles().items()]
+            return [*lines, f"{name}_sum{_labels(**extra)} {summary.sum}", f"{name}_count{_labels(**extra)} {summary.count}"]
+
+        return {
+            f"{METRICS_PREFIX}_request_latency_seconds": [
+                line for channel, summary in self.request_latency.items()
+                for line in _summary(f"{METRICS_PREFIX}_request_latency_seconds", summary, channel=channel)
+            ],
+            f"{METRICS_PREFIX}_time_to_first_byte_seconds": _summary(f"{METRICS_PREFIX}_time_to_first_byte_seconds", self.time_to_first_byte),
+            f"{METRICS_PREFIX}_summary_build_seconds": _summary(f"{METRICS_PREFIX}_summary_build_seconds", self.summary_build_time),
+            f"{METRICS_PREFIX}_tokens_total": [
+                f"{METRICS_PREFIX}_tokens_total{_labels(type='prompt')} {self.prompt_tokens}",
+                f"{METRICS_PREFIX}_tokens_total{_labels(type='completion')} {self.completion_tokens}",
+            ],
+            f"{METRICS_PREFIX}_cache_lookups_total": [
+                f"{METRICS_PREFIX}_cache_lookups_total{_labels(result='hit')} {self.cache_hits}",
+                f"{METRICS_PREFIX}_cache_lookups_total{_labels(result='miss')} {self.cache_misses}",
+            ],
+            f"{METRICS_PREFIX}_errors_total": [f"{METRICS_PREFIX}_errors_total{_labels()} {self.errors}"],
+            f"{METRICS_PREFIX}_retries_total": [f"{METRICS_PREFIX}_retries_total{_labels()} {self.retries}"],
+        }
+
+
+# Type and help of each exported metric, in export order
+METRIC_TYPES: dict[str, tuple[str, str]] = {
+    f"{METRICS_PREFIX}_request_latency_seconds": ("summary", "Latency of the requests answered by the Perplexity API, by channel."),
+    f"{METRICS_PREFIX}_time_to_first_byte_seconds": ("summary", "Time until the response headers of the Perplexity API are received."),
+    f"{METRICS_PREFIX}_summary_build_seconds": ("summary", "Time taken to build the entities context of a request."),
+    f"{METRICS_PREFIX}_tokens_total": ("counter", "Tokens billed by the Perplexity API, by type."),
+    f"{METRICS_PREFIX}_cache_lookups_total": ("counter", "Lookups of the response cache, by result."),
+    f"{METRICS_PREFIX}_errors_total": ("counter", "Requests that failed."),
+    f"{METRICS_PREFIX}_retries_total": ("counter", "Requests retried after a failure."),
+}
+
+
+def _escape_label(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus(metrics: dict[str, PerformanceMetrics]) -> str:
+    """Render the metrics of several agents in the Prometheus text format.
+
+    Args:
+        metrics (dict[str, PerformanceMetrics]): Metrics of each agent, keyed by config entry ID.
+    Returns:
+        str: Metrics, each with its HELP and TYPE lines followed by the samples of every agent.
+    """
+    samples = [entry_metrics.render_prometheus({"entry_id": entry_id}) for entry_id, entry_metrics in metrics.items()]
+
+    lines: list[str] = []
+    for name, (metric_type, help_text) in METRIC_TYPES.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for entry_samples in samples:
+            lines.extend(entry_samples.get(name, ()))
+
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusMetricsView(HomeAssistantView):
+    """Authenticated endpoint serving the metrics of the agents enabling it, for a Prometheus scraper."""
+    url = METRICS_URL
+    name = f"api:{DOMAIN}:metrics"
+    requires_auth = True
+
+    async def get(self, request: web.Request) -> web.Response:
+        """Return the metrics of every agent enabling the endpoint."""
+        hass: HomeAssistant = request.app["hass"]
+        metrics = {
+            entry_id: agent.metrics
+            for entry_id, agent in hass.data.get(DOMAIN, {}).items()
+            if agent.config_entry.options.get(CONF_ENABLE_METRICS_ENDPOINT, agent.config_entry.data.get(CONF_ENABLE_METRICS_ENDPOINT, DEFAULT_ENABLE_METRICS_ENDPOINT))
+        }
+
+        if not metrics:
+            return web.Response(status=HTTPStatus.NOT_FOUND, text="Metrics endpoint is disabled.")
+
+        return web.Response(body=render_prometheus(metrics).encode("utf-8"), headers={"Content-Type": PROMETHEUS_CONTENT_TYPE, "Cache-Control": "no-store"})
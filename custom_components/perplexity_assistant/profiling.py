@@ -0,0 +1,186 @@
+"""On-demand profiling of the request pipeline with cProfile and tracemalloc, reported to the config directory."""
+import cProfile
+import io
+import logging
+import pstats
+import time
+import tracemalloc
+
+from datetime import datetime
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
+
+from .const import *
+from .tracing import RequestTrace, Tracer
+
+
+_LOGGER = logging.getLogger(__name__)
+
+PROFILE_TOP_FUNCTIONS: int = 40     # Functions listed in each section of the statistics report
+PROFILE_TOP_ALLOCATIONS: int = 25   # Allocation sites listed in each section of the memory report
+TRACEMALLOC_FRAMES: int = 10        # Frames kept for each allocation
+
+PROFILE_STOP_REQUESTS: str = "requests"
+PROFILE_STOP_TIMEOUT: str = "timeout"
+PROFILE_STOP_UNLOAD: str = "unload"
+
+
+class PipelineProfiler:
+    """Profile the agent over its next requests or a time window, then write the reports and fire an event.
+
+    cProfile and tracemalloc are process wide: everything running meanwhile is profiled, not only the
+    requests of the agent, so the reports list the functions of the integration in a section of their own.
+    """
+
+    def __init__(self, hass: HomeAssistant, tracer: Tracer) -> None:
+        """Initialize the profiler.
+
+        Args:
+            hass (HomeAssistant): Home Assistant instance.
+            tracer (Tracer): Tracer of the agent, telling when its requests complete.
+        """
+        self.hass: HomeAssistant = hass
+        self._tracer: Tracer = tracer
+        self._profile: cProfile.Profile | None = None
+        self._trace_memory: bool = False
+        self._max_requests: int | None = None
+        self._requests: int = 0
+        self._started: datetime | None = None
+        self._started_at: float = 0.0
+        self._cancel_timeout: CALLBACK_TYPE | None = None
+        self._remove_listener: CALLBACK_TYPE | None = None
+
+    @property
+    def active(self) -> bool:
+        """Return whether a profiling session is running."""
+        return self._profile is not None
+
+    @callback
+    def async_start(self, requests: int | None, duration: float, trace_memory: bool = False) -> None:
+        """Start profiling, until ``requests`` requests completed or ``duration`` seconds passed.
+
+        Args:
+            requests (int | None): Requests of the agent to profile, or None to profile the whole time window.
+            duration (float): Time window (in seconds), bounding the session in every case.
+            trace_memory (bool): Whether to trace the memory allocations too.
+        Raises:
+            HomeAssistantError: If a session is already running, or another tool is profiling the process.
+        """
+        if self.active:
+            raise HomeAssistantError("A profiling session is already running.")
+        if trace_memory and tracemalloc.is_tracing():
+            raise HomeAssistantError("Memory allocations are already traced by another tool.")
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e: # Another profiler is active
+            raise HomeAssistantError(f"Cannot start the profiler: {e}") from e
+
+        if trace_memory:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+        self._profile = profile
+        self._trace_memory = trace_memory
+        self._max_requests = requests
+        self._requests = 0
+        self._started = dt_util.now()
+        self._started_at = time.monotonic()
+        self._cancel_timeout = async_call_later(self.hass, duration, self._async_on_timeout)
+        self._remove_listener = self._tracer.async_add_listener(self._async_on_request)
+        _LOGGER.info("Profiling the Perplexity Assistant for %s requests or %s seconds (memory: %s)", requests or "all", duration, trace_memory)
+
+    @callback
+    def _async_on_request(self, trace: RequestTrace) -> None:
+        """Count a completed request, and stop once enough were profiled."""
+        self._requests += 1
+        if self._max_requests and self._requests >= self._max_requests:
+            self.hass.async_create_task(self.async_stop(PROFILE_STOP_REQUESTS))
+
+    @callback
+    def _async_on_timeout(self, _now: datetime) -> None:
+        """Stop profiling at the end of the time window."""
+        self._cancel_timeout = None
+        self.hass.async_create_task(self.async_stop(PROFILE_STOP_TIMEOUT))
+
+    async def async_stop(self, reason: str) -> dict | None:
+        """Stop profiling, write the reports to the config directory and fire a ``perplexity_assistant_profile`` event.
+
+        Args:
+            reason (str): Why the session stopped ("requests", "timeout" or "unload").
+        Returns:
+            dict | None: Content of the event, or None if no session was running.
+        """
+        profile = self._profile
+        if profile is None:
+            return None
+
+        profile.disable()
+        self._profile = None
+        if self._cancel_timeout:
+            self._cancel_timeout()
+            self._cancel_timeout = None
+        if self._remove_listener:
+            self._remove_listener()
+            self._remove_listener = None
+
+        duration = time.monotonic() - self._started_at
+        stem = self.hass.config.path(f"{DOMAIN}_profile_{self._started.strftime('%Y%m%d_%H%M%S')}")
+        try:
+            paths = await self.hass.async_add_executor_job(self._write_reports, profile, self._trace_memory, stem)
+        finally:
+            if self._trace_memory and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+        event = {"reason": reason, "requests": self._requests, "duration": round(duration, 3), **paths}
+        _LOGGER.info("Profiling of the Perplexity Assistant complete: %s", event)
+        self.hass.bus.async_fire(f"{DOMAIN}_profile", event)
+        return event
+
+    @staticmethod
+    def _write_reports(profile: cProfile.Profile, trace_memory: bool, stem: str) -> dict[str, str | None]:
+        """Write the reports of a session, in the executor.
+
+        Args:
+            profile (cProfile.Profile): Stopped profiler.
+            trace_memory (bool): Whether the memory allocations were traced.
+            stem (str): Path of the reports, without their suffix.
+        Returns:
+            dict[str, str | None]: Paths of the pstats dump, the statistics report and the memory report (None without memory tracing).
+        """
+        paths: dict[str, str | None] = {"profile_path": f"{stem}.prof", "stats_path": f"{stem}.txt", "memory_path": None}
+
+        # Snapshot the allocations first, so that the reports written below are not part of it
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        profile.dump_stats(paths["profile_path"])
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream).sort_stats(pstats.SortKey.CUMULATIVE)
+        stream.write(f"Functions of {DOMAIN}, by cumulative time\n")
+        stats.print_stats(DOMAIN, PROFILE_TOP_FUNCTIONS)
+        stream.write("All functions, by cumulative time\n")
+        stats.print_stats(PROFILE_TOP_FUNCTIONS)
+        with open(paths["stats_path"], "w", encoding="utf-8") as file:
+            file.write(stream.getvalue())
+
+        if trace_memory:
+            snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")))
+            lines = [f"Traced memory: {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB"]
+            for title, statistics in (
+                (f"Allocations still alive made by {DOMAIN}", snapshot.filter_traces((tracemalloc.Filter(True, f"*{DOMAIN}*", all_frames=True),)).statistics("lineno")),
+                ("All allocations still alive", snapshot.statistics("lineno")),
+            ):
+                lines.append(f"\n{title}, by size")
+                lines.extend(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {stat.traceback}" for stat in statistics[:PROFILE_TOP_ALLOCATIONS])
+
+            paths["memory_path"] = f"{stem}_memory.txt"
+            with open(paths["memory_path"], "w", encoding="utf-8") as file:
+                file.write("\n".join(lines) + "\n")
+
+        return paths
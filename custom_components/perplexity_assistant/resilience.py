@@ -0,0 +1,218 @@
+"""Retry policy, circuit breaker and last good responses of the requests sent to the Perplexity API."""
+import logging
+import random
+import time
+
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+_LOGGER = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY: float = 1.0             # in seconds, doubled after each attempt
+RETRY_MAX_DELAY: float = 20.0             # in seconds, longest backoff between two attempts
+MAX_RETRY_AFTER: float = 30.0             # in seconds, longer Retry-After delays are not waited for
+RETRYABLE_STATUSES: set[int] = {408, 429} # Along with every server error (5xx)
+
+CIRCUIT_FAILURE_THRESHOLD: int = 5        # Consecutive failures opening the circuit
+CIRCUIT_RECOVERY_TIMEOUT: float = 60.0    # in seconds, delay before a probe request is let through
+MAX_LAST_GOOD_RESPONSES: int = 64         # Prompts whose last good response is kept for the fallback
+
+CIRCUIT_CLOSED: str = "closed"
+CIRCUIT_OPEN: str = "open"
+CIRCUIT_HALF_OPEN: str = "half_open"
+
+
+def is_retryable(data: dict) -> bool:
+    """Check whether a failed request is worth retrying.
+
+    Args:
+        data (dict): Result of the request, as returned by ``_async_post``.
+    Returns:
+        bool: True for rate limiting, server errors, timeouts and connection errors.
+    """
+    if "error" not in data:
+        return False
+
+    if data.get("status") is not None:
+        return data["status"] in RETRYABLE_STATUSES or data["status"] >= 500
+
+    return data.get("retryable", False)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header.
+
+    Args:
+        value (str | None): Header value, either a number of seconds or an HTTP date.
+    Returns:
+        float | None: Delay in seconds, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_retry_delay(attempt: int, retry_after: float | None = None) -> float | None:
+    """Return the delay before the next attempt.
+
+    Backoff is exponential with full jitter, so that clients failing together do not retry together.
+
+    Args:
+        attempt (int): Number of the failed attempt, starting at 0.
+        retry_after (float | None): Delay requested by the server.
+    Returns:
+        float | None: Delay in seconds, or None if the server asks to wait too long.
+    """
+    if retry_after is not None:
+        return retry_after if retry_after <= MAX_RETRY_AFTER else None
+
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Fail fast while the Perplexity API is down.
+
+    The circuit opens after consecutive failures. Once the recovery timeout is over, a single
+    probe request is let through (half open): its success closes the circuit, its failure
+    opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, recovery_timeout: float = CIRCUIT_RECOVERY_TIMEOUT) -> None:
+        """Initialize a closed circuit.
+
+        Args:
+            failure_threshold (int): Consecutive failures opening the circuit.
+            recovery_timeout (float): Delay (in seconds) before a probe request is let through.
+        """
+        self.failure_threshold: int = failure_threshold
+        self.recovery_timeout: float = recovery_timeout
+
+        self._state: str = CIRCUIT_CLOSED
+        self._failures: int = 0
+        self._opened_at: float | None = None
+        self._probe_started_at: float | None = None
+        self._last_error: str | None = None
+
+    @property
+    def state(self) -> str:
+        """Return the state of the circuit, half open once the recovery timeout is over."""
+        if self._state == CIRCUIT_OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            return CIRCUIT_HALF_OPEN
+        return self._state
+
+    @property
+    def attributes(self) -> dict:
+        """Return the details of the circuit state."""
+        return {
+            "consecutive_failures": self._failures,
+            "retry_in": round(max(0.0, self._opened_at + self.recovery_timeout - time.monotonic()), 1) if self._state == CIRCUIT_OPEN else None,
+            "last_error": self._last_error,
+        }
+
+    def allow_request(self) -> bool:
+        """Check whether a request may be sent.
+
+        Returns:
+            bool: False while the circuit is open, or while the probe of a half open circuit is pending.
+        """
+        state = self.state
+        if state == CIRCUIT_CLOSED:
+            return True
+
+        # A probe that never reported back (e.g. cancelled) does not block the circuit forever
+        now = time.monotonic()
+        if state == CIRCUIT_HALF_OPEN and (self._probe_started_at is None or now - self._probe_started_at >= self.recovery_timeout):
+            self._state = CIRCUIT_HALF_OPEN
+            self._probe_started_at = now
+            return True
+
+        return False
+
+    def record_success(self) -> None:
+        """Close the circuit after a request reached the API."""
+        if self._state != CIRCUIT_CLOSED:
+            _LOGGER.info("Perplexity API is reachable again, closing the circuit.")
+
+        self._state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started_at = None
+
+    def record_failure(self, error: str | None = None) -> None:
+        """Count a failed request, opening the circuit above the threshold.
+
+        Args:
+            error (str | None): Error of the failed request.
+        """
+        self._failures += 1
+        self._last_error = error
+
+        if self._state == CIRCUIT_HALF_OPEN or (self._state == CIRCUIT_CLOSED and self._failures >= self.failure_threshold):
+            _LOGGER.warning("Perplexity API is failing (%d consecutive failures), opening the circuit for %.0f s.", self._failures, self.recovery_timeout)
+            self._state = CIRCUIT_OPEN
+            self._opened_at = time.monotonic()
+
+        self._probe_started_at = None
+
+
+class LastGoodResponses:
+    """Last successful response of the most recent prompts, served while the API is unavailable."""
+
+    def __init__(self, max_size: int = MAX_LAST_GOOD_RESPONSES) -> None:
+        """Initialize the store.
+
+        Args:
+            max_size (int): Prompts remembered, the least recently used ones are evicted first.
+        """
+        self.max_size: int = max_size
+        self._responses: OrderedDict[tuple[str, str], dict] = OrderedDict()
+
+    @staticmethod
+    def _make_key(prompt: str, model: str) -> tuple[str, str]:
+        """Build the key of a prompt, ignoring case and spacing."""
+        return " ".join(prompt.lower().split()), model
+
+    def get(self, prompt: str, model: str) -> dict | None:
+        """Return the last good response to a prompt.
+
+        Args:
+            prompt (str): User prompt.
+            model (str): Model answering the prompt.
+        Returns:
+            dict | None: Raw response of the API, or None if the prompt was never answered.
+        """
+        key = self._make_key(prompt, model)
+        data = self._responses.get(key)
+        if data is not None:
+            self._responses.move_to_end(key)
+        return data
+
+    def set(self, prompt: str, model: str, data: dict) -> None:
+        """Remember the last good response to a prompt.
+
+        Args:
+            prompt (str): User prompt.
+            model (str): Model answering the prompt.
+            data (dict): Raw response of the API.
+        """
+        key = self._make_key(prompt, model)
+        self._responses[key] = data
+        self._responses.move_to_end(key)
+
+        while len(self._responses) > self.max_size:
+            self._responses.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forget every response."""
+        self._responses.clear()
@@ -0,0 +1,176 @@
+"""Automatic model selection from the complexity of a prompt."""
+import logging
+import re
+
+from dataclasses import dataclass, field
+from typing import Any
+from homeassistant.config_entries import ConfigEntry
+
+from .const import *
+from .entities import normalize_name
+from .local_commands import COMMAND_PATTERNS
+from .tokens import estimate_tokens
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Models picked by the router, from the cheapest and fastest to the most capable
+ROUTED_MODELS: tuple[str, str, str] = ("sonar", "sonar-pro", "sonar-reasoning-pro")
+
+LENGTH_TOKENS_PER_POINT: int = 30   # Prompt tokens adding a point to the score
+MAX_LENGTH_POINTS: int = 3
+REASONING_POINTS: int = 3           # Explanations, comparisons, plans, calculations, ...
+FRESH_INFO_POINTS: int = 2          # Recent information needing a good web search
+QUESTION_POINTS: int = 1
+FOLLOW_UP_POINTS: int = 1           # Conversations with at least FOLLOW_UP_TURNS previous turns
+FOLLOW_UP_TURNS: int = 2
+COMMAND_POINTS: int = -2            # Simple device commands
+
+# Cues matched against the normalized prompt (see normalize_name), in every supported language
+REASONING_PATTERN = re.compile("|".join([
+    r"\b(?:why|explain|compare|comparison|difference|analy[sz]e|pros and cons|step by step|plan|calculate|prove|summari[sz]e|recommend)\b",
+    r"\b(?:pourquoi|explique|expliquer|compare|comparer|différence|analyse|analyser|étape par étape|calcule|calculer|résume|recommande)\b",
+    r"\b(?:por qué|porque|explica|explicar|compara|comparar|diferencia|analiza|analizar|paso a paso|calcula|calcular|resume|recomienda)\b",
+    r"\b(?:warum|erkläre|erklären|vergleiche|vergleichen|unterschied|analysiere|analysieren|schritt für schritt|berechne|berechnen|zusammenfassung|empfiehl)\b",
+    r"\b(?:perché|spiega|spiegare|confronta|confrontare|differenza|analizza|analizzare|passo dopo passo|calcola|calcolare|riassumi|consiglia)\b",
+    r"\b(?:por que|explique|explicar|compare|comparar|diferença|analise|analisar|passo a passo|calcule|calcular|resuma|recomende)\b",
+    r"\b(?:waarom|leg uit|uitleggen|vergelijk|vergelijken|verschil|analyseer|analyseren|stap voor stap|bereken|berekenen|samenvatting|raad aan)\b",
+    r"为什么|解释|比较|区别|分析|总结|推荐",
+    r"なぜ|どうして|説明|比較|違い|分析|要約|おすすめ",
+    r"왜|설명|비교|차이|분석|요약|추천",
+]))
+FRESH_INFO_PATTERN = re.compile("|".join([
+    r"\b(?:latest|news|today|tonight|current|currently|now|recent|price|score|forecast|this week|yesterday)\b",
+    r"\b(?:dernières|dernier|actualités|aujourd hui|ce soir|actuel|actuellement|récent|prix|score|prévisions|cette semaine|hier)\b",
+    r"\b(?:últimas|último|noticias|hoy|esta noche|actual|actualmente|reciente|precio|resultado|pronóstico|esta semana|ayer)\b",
+    r"\b(?:neueste|nachrichten|heute|heute abend|aktuell|derzeit|jetzt|preis|ergebnis|vorhersage|diese woche|gestern)\b",
+    r"\b(?:ultime|ultimo|notizie|oggi|stasera|attuale|attualmente|recente|prezzo|risultato|previsioni|questa settimana|ieri)\b",
+    r"\b(?:últimas|último|notícias|hoje|esta noite|atual|atualmente|recente|preço|resultado|previsão|esta semana|ontem)\b",
+    r"\b(?:laatste|nieuws|vandaag|vanavond|huidige|momenteel|nu|recent|prijs|uitslag|voorspelling|deze week|gisteren)\b",
+    r"最新|新闻|今天|现在|价格|比分|天气预报",
+    r"最新|ニュース|今日|現在|価格|スコア|予報",
+    r"최신|뉴스|오늘|현재|가격|점수|예보",
+]))
+COMMAND_PATTERNS_COMPILED: list[re.Pattern] = [re.compile(pattern) for patterns in COMMAND_PATTERNS.values() for _, pattern in patterns]
+
+
+@dataclass
+class RoutingDecision:
+    """Model picked for a prompt, and why."""
+    model: str
+    score: int
+    reasons: list[str] = field(default_factory=list)
+
+
+@dataclass
+class RoutingOutcome:
+    """Latency and cost of the requests routed to a model."""
+    requests: int = 0
+    errors: int = 0
+    total_latency: float = 0.0
+    total_cost: float = 0.0
+
+
+class ModelRouter:
+    """Pick the model answering a prompt from its length, kind, freshness needs and conversation depth.
+
+    Each cue adds points to a score. Prompts scoring below the pro threshold go to the
+    cheapest model, those scoring below the reasoning threshold to the pro model, and the
+    others to the reasoning model.
+    """
+
+    def __init__(self, config_entry: ConfigEntry) -> None:
+        """Initialize the router.
+
+        Args:
+            config_entry (ConfigEntry): Configuration entry the router belongs to.
+        """
+        self.config_entry: ConfigEntry = config_entry
+        self._outcomes: dict[str, RoutingOutcome] = {model: RoutingOutcome() for model in ROUTED_MODELS}
+
+    def _get_config(self, key: str, default: Any = None) -> Any:
+        """Helper to get configuration options with a default.
+
+        Args:
+            key (str): Configuration key.
+            default (any): Default value if key is not found.
+        Returns:
+            any: Configuration value or default.
+        """
+        return self.config_entry.options.get(key, self.config_entry.data.get(key, default))
+
+    @property
+    def stats(self) -> dict:
+        """Return the requests, errors, average latency and total cost of each routed model."""
+        return {
+            model: {
+                "requests": outcome.requests,
+                "errors": outcome.errors,
+                "average_latency": round(outcome.total_latency / outcome.requests, 2) if outcome.requests else 0.0,
+                "total_cost": round(outcome.total_cost, 6),
+            }
+            for model, outcome in self._outcomes.items()
+        }
+
+    def route(self, prompt: str, history_turns: int = 0, websearch: bool = False) -> RoutingDecision:
+        """Pick the model answering a prompt.
+
+        Args:
+            prompt (str): User prompt.
+            history_turns (int): Previous turns of the conversation.
+            websearch (bool): Whether the answer may use a web search.
+        Returns:
+            RoutingDecision: Picked model, along with its score and the cues found.
+        """
+        text = normalize_name(prompt)
+        score = 0
+        reasons: list[str] = []
+
+        def _add(points: int, reason: str) -> None:
+            nonlocal score
+            score += points
+            reasons.append(f"{reason}{points:+d}")
+
+        if length_points := min(MAX_LENGTH_POINTS, estimate_tokens(prompt) // LENGTH_TOKENS_PER_POINT):
+            _add(length_points, "length")
+        if REASONING_PATTERN.search(text):
+            _add(REASONING_POINTS, "reasoning")
+        if websearch and FRESH_INFO_PATTERN.search(text):
+            _add(FRESH_INFO_POINTS, "fresh_info")
+        if "?" in prompt or "？" in prompt:
+            _add(QUESTION_POINTS, "question")
+        if history_turns >= FOLLOW_UP_TURNS:
+            _add(FOLLOW_UP_POINTS, "follow_up")
+        if any(pattern.match(text) for pattern in COMMAND_PATTERNS_COMPILED):
+            _add(COMMAND_POINTS, "command")
+
+        pro_threshold = int(self._get_config(CONF_AUTO_MODEL_PRO_THRESHOLD, DEFAULT_AUTO_MODEL_PRO_THRESHOLD))
+        reasoning_threshold = int(self._get_config(CONF_AUTO_MODEL_REASONING_THRESHOLD, DEFAULT_AUTO_MODEL_REASONING_THRESHOLD))
+
+        if score >= reasoning_threshold:
+            model = ROUTED_MODELS[2]
+        elif score >= pro_threshold:
+            model = ROUTED_MODELS[1]
+        else:
+            model = ROUTED_MODELS[0]
+
+        _LOGGER.debug("Routing prompt to %s (score=%d, reasons=%s, thresholds=%d/%d).", model, score, reasons, pro_threshold, reasoning_threshold)
+        return RoutingDecision(model, score, reasons)
+
+    def record_outcome(self, decision: RoutingDecision, latency: float, cost: float, error: str | None = None) -> None:
+        """Log the latency and cost of a routed request, so that the thresholds can be tuned.
+
+        Args:
+            decision (RoutingDecision): Routing decision of the request.
+            latency (float): Time (in seconds) taken to answer.
+            cost (float): Cost of the request, in USD.
+            error (str | None): Error of the request, if it failed.
+        """
+        outcome = self._outcomes.setdefault(decision.model, RoutingOutcome())
+        outcome.requests += 1
+        outcome.errors += error is not None
+        outcome.total_latency += latency
+        outcome.total_cost += cost
+
+        _LOGGER.debug("Routed request answered by %s (score=%d, reasons=%s): latency=%.2f s, cost=%.6f USD, error=%s. Totals: %s",
+                      decision.model, decision.score, decision.reasons, latency, cost, error, self.stats[decision.model])
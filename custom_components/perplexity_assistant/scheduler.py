@@ -0,0 +1,226 @@
+"""Priority scheduler rate limiting the requests sent to the Perplexity API."""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+
+from .const import *
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Priority classes, the lowest value is served first
+PRIORITY_INTERACTIVE: int = 0   # Voice and chat turns, a user is waiting for the answer
+PRIORITY_SERVICE: int = 1       # ask service calls from scripts and automations
+PRIORITY_BACKGROUND: int = 2    # Bulk calls, such as ask_many batches
+
+PRIORITY_NAMES: dict[int, str] = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_SERVICE: "service",
+    PRIORITY_BACKGROUND: "background",
+}
+PRIORITIES: dict[str, int] = {name: priority for priority, name in PRIORITY_NAMES.items()}
+
+
+class TokenBucket:
+    """Token bucket allowing a number of requests per minute, with bursts up to that number."""
+
+    def __init__(self, requests_per_minute: float) -> None:
+        """Initialize a full bucket.
+
+        Args:
+            requests_per_minute (float): Sustained rate, 0 disables the limit.
+        """
+        self.rate: float = requests_per_minute / 60
+        self.capacity: float = max(1.0, requests_per_minute)
+        self._tokens: float = self.capacity
+        self._updated_at: float = time.monotonic()
+
+    def _refill(self) -> None:
+        """Add the tokens accumulated since the last refill."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the delay (in seconds) until one is available.
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+
+        return (1 - self._tokens) / self.rate
+
+
+class RequestScheduler:
+    """Serve the requests of an integration entry by priority, under a rate limit and a concurrency cap.
+
+    Requests of the same priority are served in arrival order. Interactive requests skip
+    the queued service and background ones, but never interrupt requests already in flight.
+    """
+
+    def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            hass (HomeAssistant): Home Assistant instance.
+            config_entry (ConfigEntry): Configuration entry the scheduler belongs to.
+        """
+        self.hass: HomeAssistant = hass
+        self.config_entry: ConfigEntry = config_entry
+
+        self._queue: list[tuple[int, int, float, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._in_flight: int = 0
+        self._bucket: TokenBucket | None = None
+        self._wakeup: asyncio.TimerHandle | None = None
+
+        self._served: dict[int, int] = dict.fromkeys(PRIORITY_NAMES, 0)
+        self._total_wait: dict[int, float] = dict.fromkeys(PRIORITY_NAMES, 0.0)
+        self._max_wait: dict[int, float] = dict.fromkeys(PRIORITY_NAMES, 0.0)
+        self._rate_limited: int = 0
+
+    def _get_config(self, key: str, default: Any = None) -> Any:
+        """Helper to get configuration options with a default.
+
+        Args:
+            key (str): Configuration key.
+            default (any): Default value if key is not found.
+        Returns:
+            any: Configuration value or default.
+        """
+        return self.config_entry.options.get(key, self.config_entry.data.get(key, default))
+
+    def _get_bucket(self) -> TokenBucket:
+        """Return the token bucket, recreated when the configured rate changes."""
+        requests_per_minute = float(self._get_config(CONF_MAX_REQUESTS_PER_MINUTE, DEFAULT_MAX_REQUESTS_PER_MINUTE))
+        if self._bucket is None or self._bucket.rate != requests_per_minute / 60:
+            self._bucket = TokenBucket(requests_per_minute)
+
+        return self._bucket
+
+    @property
+    def queue_depth(self) -> int:
+        """Return the number of requests waiting for a slot."""
+        return sum(1 for _, _, _, future in self._queue if not future.done())
+
+    @property
+    def stats(self) -> dict:
+        """Return the queue depth and wait time statistics of each priority class."""
+        waiting: dict[int, int] = dict.fromkeys(PRIORITY_NAMES, 0)
+        for priority, _, _, future in self._queue:
+            if not future.done():
+                waiting[priority] += 1
+
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": sum(waiting.values()),
+            "rate_limited": self._rate_limited,
+            **{
+                name: {
+                    "waiting": waiting[priority],
+                    "served": self._served[priority],
+                    "average_wait_ms": round(1000 * self._total_wait[priority] / self._served[priority], 1) if self._served[priority] else 0.0,
+                    "max_wait_ms": round(1000 * self._max_wait[priority], 1),
+                }
+                for priority, name in PRIORITY_NAMES.items()
+            },
+        }
+
+    @asynccontextmanager
+    async def async_slot(self, priority: int = PRIORITY_SERVICE) -> AsyncIterator[None]:
+        """Wait for the turn of a request, and hold its slot while it is sent.
+
+        Args:
+            priority (int): Priority class of the request.
+        """
+        future: asyncio.Future = self.hass.loop.create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), time.monotonic(), future))
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been granted right before the cancellation
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                future.cancel()
+                self._notify()
+            raise
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        """Free the slot of a finished request and serve the next ones."""
+        self._in_flight -= 1
+        self._dispatch()
+
+    @callback
+    def _dispatch(self) -> None:
+        """Grant slots to the queued requests, highest priority first, while the limits allow it."""
+        max_in_flight = int(self._get_config(CONF_MAX_CONCURRENT_REQUESTS, DEFAULT_MAX_CONCURRENT_REQUESTS))
+
+        while self._queue and self._in_flight < max_in_flight:
+            priority, _, queued_at, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue) # Cancelled while waiting
+                continue
+
+            delay = self._get_bucket().try_acquire()
+            if delay > 0:
+                if self._wakeup is None:
+                    _LOGGER.debug("Request rate limit reached, next request in %.1f s.", delay)
+                    self._rate_limited += 1
+                    self._wakeup = self.hass.loop.call_later(delay, self._async_on_wakeup)
+                break
+
+            heapq.heappop(self._queue)
+            wait = time.monotonic() - queued_at
+            self._in_flight += 1
+            self._served[priority] += 1
+            self._total_wait[priority] += wait
+            self._max_wait[priority] = max(self._max_wait[priority], wait)
+            future.set_result(None)
+
+        self._notify()
+
+    @callback
+    def _async_on_wakeup(self) -> None:
+        """Serve the queued requests once the rate limit allows it again."""
+        self._wakeup = None
+        self._dispatch()
+
+    def _notify(self) -> None:
+        """Publish the statistics to the request queue sensor, if it exists."""
+        queue_sensor = self.hass.data.get("perplexity_assistant_sensors", {}).get("request_queue_sensor")
+        if queue_sensor:
+            queue_sensor.update_stats(self.stats)
+
+    @callback
+    def async_stop(self) -> None:
+        """Cancel the pending wake-up and the queued requests."""
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        for _, _, _, future in self._queue:
+            if not future.done():
+                future.cancel()
+        self._queue.clear()
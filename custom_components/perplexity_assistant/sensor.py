@@ -10,7 +10,8 @@ from __future__ import annotations
 import logging
 
 from datetime import datetime, timedelta
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorStateClass
+from homeassistant.const import PERCENTAGE, UnitOfTime
 from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
@@ -27,10 +28,26 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_e
     """Set up the Perplexity credit sensor from a config entry."""
     monthly_bill_sensor = MonthlyBillSensor(hass, entry.entry_id)
     alltime_bill_sensor = AlltimeBillSensor(hass, entry.entry_id)
-    async_add_entities([monthly_bill_sensor, alltime_bill_sensor])
+    request_queue_sensor = RequestQueueSensor(hass, entry.entry_id)
+    circuit_breaker_sensor = CircuitBreakerSensor(hass, entry.entry_id)
+    hedged_requests_sensor = HedgedRequestsSensor(hass, entry.entry_id)
+    performance_sensors = [
+        RequestLatencySensor(hass, entry.entry_id),
+        TimeToFirstByteSensor(hass, entry.entry_id),
+        SummaryBuildTimeSensor(hass, entry.entry_id),
+        TokensSensor(hass, entry.entry_id),
+        CacheHitRateSensor(hass, entry.entry_id),
+        RequestErrorsSensor(hass, entry.entry_id),
+    ]
+    async_add_entities([monthly_bill_sensor, alltime_bill_sensor, request_queue_sensor, circuit_breaker_sensor, hedged_requests_sensor, *performance_sensors])
     
     hass.data.setdefault("perplexity_assistant_sensors", {})["monthly_bill_sensor"] = monthly_bill_sensor
     hass.data.setdefault("perplexity_assistant_sensors", {})["alltime_bill_sensor"] = alltime_bill_sensor
+    hass.data.setdefault("perplexity_assistant_sensors", {})["request_queue_sensor"] = request_queue_sensor
+    hass.data.setdefault("perplexity_assistant_sensors", {})["circuit_breaker_sensor"] = circuit_breaker_sensor
+    hass.data.setdefault("perplexity_assistant_sensors", {})["hedged_requests_sensor"] = hedged_requests_sensor
+    for performance_sensor in performance_sensors:
+        hass.data.setdefault("perplexity_assistant_sensors", {})[f"{performance_sensor.translation_key}_sensor"] = performance_sensor
     
 
 class MonthlyBillSensor(SensorEntity, RestoreEntity):
@@ -174,4 +191,348 @@ class AlltimeBillSensor(SensorEntity, RestoreEntity):
     def increment_cost(self, cost: float):
         """Add cost to current cost."""
         self._attr_native_value += cost
-        self.async_write_ha_state()
\ No newline at end of file
+        self.async_write_ha_state()
+
+
+class RequestQueueSensor(SensorEntity):
+    """Sensor representing the requests waiting for the Perplexity API, with wait time statistics."""
+    _attr_icon = "mdi:tray-full"
+    _attr_native_unit_of_measurement = "requests"
+    _attr_has_entity_name = True
+    _attr_translation_key = "request_queue"
+    _attr_should_poll = False
+    
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the Request Queue Sensor."""
+        self.hass = hass
+        self._entry_id = entry_id
+        self._attr_unique_id = f"{entry_id}_perplexity_request_queue"
+        self._attr_native_value = 0
+        self._attr_extra_state_attributes = {}
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, self._entry_id)},
+            name="Perplexity Assistant",
+            manufacturer="Perplexity AI",
+            model="Perplexity API",
+        )
+
+    def update_stats(self, stats: dict) -> None:
+        """Publish the latest statistics of the request scheduler."""
+        self._attr_native_value = stats["queue_depth"]
+        self._attr_extra_state_attributes = {key: value for key, value in stats.items() if key != "queue_depth"}
+        
+        if self.hass and self.entity_id:
+            self.async_write_ha_state()
+
+
+class CircuitBreakerSensor(SensorEntity):
+    """Sensor representing the state of the circuit breaker protecting the Perplexity API."""
+    _attr_icon = "mdi:electric-switch"
+    _attr_device_class = SensorDeviceClass.ENUM
+    _attr_options = ["closed", "open", "half_open"]
+    _attr_has_entity_name = True
+    _attr_translation_key = "circuit_breaker"
+    _attr_should_poll = False
+    
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the Circuit Breaker Sensor."""
+        self.hass = hass
+        self._entry_id = entry_id
+        self._attr_unique_id = f"{entry_id}_perplexity_circuit_breaker"
+        self._attr_native_value = "closed"
+        self._attr_extra_state_attributes = {}
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, self._entry_id)},
+            name="Perplexity Assistant",
+            manufacturer="Perplexity AI",
+            model="Perplexity API",
+        )
+
+    def update_state(self, state: str, attributes: dict) -> None:
+        """Publish the latest state of the circuit breaker."""
+        self._attr_native_value = state
+        self._attr_extra_state_attributes = attributes
+        
+        if self.hass and self.entity_id:
+            self.async_write_ha_state()
+
+
+class HedgedRequestsSensor(SensorEntity):
+    """Sensor representing the requests hedged to the fallback model, and which request won."""
+    _attr_icon = "mdi:call-split"
+    _attr_native_unit_of_measurement = "requests"
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_has_entity_name = True
+    _attr_translation_key = "hedged_requests"
+    _attr_should_poll = False
+    
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the Hedged Requests Sensor."""
+        self.hass = hass
+        self._entry_id = entry_id
+        self._attr_unique_id = f"{entry_id}_perplexity_hedged_requests"
+        self._attr_native_value = 0
+        self._attr_extra_state_attributes = {}
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, self._entry_id)},
+            name="Perplexity Assistant",
+            manufacturer="Perplexity AI",
+            model="Perplexity API",
+        )
+
+    def update_stats(self, hedged: int, attributes: dict) -> None:
+        """Publish the latest hedging statistics."""
+        self._attr_native_value = hedged
+        self._attr_extra_state_attributes = attributes
+        
+        if self.hass and self.entity_id:
+            self.async_write_ha_state()
+
+
+class RequestLatencySensor(SensorEntity):
+    """Sensor representing the 95th percentile of the latency of the requests answered by the Perplexity API."""
+    _attr_icon = "mdi:timer-outline"
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_has_entity_name = True
+    _attr_translation_key = "request_latency"
+    _attr_should_poll = False
+    
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the Request Latency Sensor."""
+        self.hass = hass
+        self._entry_id = entry_id
+        self._attr_unique_id = f"{entry_id}_perplexity_request_latency"
+        self._attr_native_value = None
+        self._attr_extra_state_attributes = {}
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, self._entry_id)},
+            name="Perplexity Assistant",
+            manufacturer="Perplexity AI",
+            model="Perplexity API",
+        )
+
+    def update_state(self, state: float | None, attributes: dict) -> None:
+        """Publish the latest latency percentiles, overall and by channel."""
+        self._attr_native_value = state
+        self._attr_extra_state_attributes = attributes
+        
+        if self.hass and self.entity_id:
+            self.async_write_ha_state()
+
+
+class TimeToFirstByteSensor(SensorEntity):
+    """Sensor representing the 95th percentile of the time until the Perplexity API starts responding."""
+    _attr_icon = "mdi:timer-play-outline"
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_has_entity_name = True
+    _attr_translation_key = "time_to_first_byte"
+    _attr_should_poll = False
+    
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the Time To First Byte Sensor."""
+        self.hass = hass
+        self._entry_id = entry_id
+        self._attr_unique_id = f"{entry_id}_perplexity_time_to_first_byte"
+        self._attr_native_value = None
+        self._attr_extra_state_attributes = {}
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, self._entry_id)},
+            name="Perplexity Assistant",
+            manufacturer="Perplexity AI",
+            model="Perplexity API",
+        )
+
+    def update_state(self, state: float | None, attributes: dict) -> None:
+        """Publish the latest time to first byte percentiles."""
+        self._attr_native_value = state
+        self._attr_extra_state_attributes = attributes
+        
+        if self.hass and self.entity_id:
+            self.async_write_ha_state()
+
+
+class SummaryBuildTimeSensor(SensorEntity):
+    """Sensor representing the 95th percentile of the time taken to build the entities context of a request."""
+    _attr_icon = "mdi:timer-cog-outline"
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_has_entity_name = True
+    _attr_translation_key = "summary_build_time"
+    _attr_should_poll = False
+    
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the Summary Build Time Sensor."""
+        self.hass = hass
+        self._entry_id = entry_id
+        self._attr_unique_id = f"{entry_id}_perplexity_summary_build_time"
+        self._attr_native_value = None
+        self._attr_extra_state_attributes = {}
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, self._entry_id)},
+            name="Perplexity Assistant",
+            manufacturer="Perplexity AI",
+            model="Perplexity API",
+        )
+
+    def update_state(self, state: float | None, attributes: dict) -> None:
+        """Publish the latest context build time percentiles."""
+        self._attr_native_value = state
+        self._attr_extra_state_attributes = attributes
+        
+        if self.hass and self.entity_id:
+            self.async_write_ha_state()
+
+
+class TokensSensor(SensorEntity):
+    """Sensor representing the tokens billed by the Perplexity API."""
+    _attr_icon = "mdi:counter"
+    _attr_native_unit_of_measurement = "tokens"
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_has_entity_name = True
+    _attr_translation_key = "tokens"
+    _attr_should_poll = False
+    
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the Tokens Sensor."""
+        self.hass = hass
+        self._entry_id = entry_id
+        self._attr_unique_id = f"{entry_id}_perplexity_tokens"
+        self._attr_native_value = 0
+        self._attr_extra_state_attributes = {}
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, self._entry_id)},
+            name="Perplexity Assistant",
+            manufacturer="Perplexity AI",
+            model="Perplexity API",
+        )
+
+    def update_state(self, state: int, attributes: dict) -> None:
+        """Publish the latest token counts."""
+        self._attr_native_value = state
+        self._attr_extra_state_attributes = attributes
+        
+        if self.hass and self.entity_id:
+            self.async_write_ha_state()
+
+
+class CacheHitRateSensor(SensorEntity):
+    """Sensor representing the share of requests answered from the response cache."""
+    _attr_icon = "mdi:cached"
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_has_entity_name = True
+    _attr_translation_key = "cache_hit_rate"
+    _attr_should_poll = False
+    
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the Cache Hit Rate Sensor."""
+        self.hass = hass
+        self._entry_id = entry_id
+        self._attr_unique_id = f"{entry_id}_perplexity_cache_hit_rate"
+        self._attr_native_value = None
+        self._attr_extra_state_attributes = {}
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, self._entry_id)},
+            name="Perplexity Assistant",
+            manufacturer="Perplexity AI",
+            model="Perplexity API",
+        )
+
+    def update_state(self, state: float | None, attributes: dict) -> None:
+        """Publish the latest cache hit rate."""
+        self._attr_native_value = state
+        self._attr_extra_state_attributes = attributes
+        
+        if self.hass and self.entity_id:
+            self.async_write_ha_state()
+
+
+class RequestErrorsSensor(SensorEntity):
+    """Sensor representing the requests to the Perplexity API that failed, and the retries."""
+    _attr_icon = "mdi:alert-circle-outline"
+    _attr_native_unit_of_measurement = "requests"
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_has_entity_name = True
+    _attr_translation_key = "request_errors"
+    _attr_should_poll = False
+    
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the Request Errors Sensor."""
+        self.hass = hass
+        self._entry_id = entry_id
+        self._attr_unique_id = f"{entry_id}_perplexity_request_errors"
+        self._attr_native_value = 0
+        self._attr_extra_state_attributes = {}
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return the device info."""
+        return DeviceInfo(
+            identifiers={(DOMAIN, self._entry_id)},
+            name="Perplexity Assistant",
+            manufacturer="Perplexity AI",
+            model="Perplexity API",
+        )
+
+    def update_state(self, state: int, attributes: dict) -> None:
+        """Publish the latest error and retry counts."""
+        self._attr_native_value = state
+        self._attr_extra_state_attributes = attributes
+        
+        if self.hass and self.entity_id:
+            self.async_write_ha_state()
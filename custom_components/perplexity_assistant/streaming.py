@@ -0,0 +1,226 @@
+"""Helpers to read streamed (server-sent events) responses from the Perplexity API."""
+import json
+import logging
+import re
+import string
+
+from typing import AsyncIterator, Callable
+from aiohttp import ClientResponse
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Matches the opening of the "content" string in the structured JSON response
+CONTENT_FIELD_PATTERN = re.compile(r'"content"\s*:\s*"')
+# A sentence ends with a terminal punctuation mark, followed by whitespace unless it is a CJK mark
+SENTENCE_END_PATTERN = re.compile(r'(?<=[.!?])\s+|(?<=[。！？])\s*')
+
+JSON_ESCAPES: dict[str, str] = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class PartialContentDecoder:
+    """Decode the "content" field of a streamed JSON response as its chunks arrive.
+
+    The model answers with a JSON object following the response schema; while it is
+    being streamed, the object is incomplete and cannot be parsed with ``json.loads``.
+    The decoder keeps its position in the raw text, so each chunk is only decoded once.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the decoder."""
+        self._raw: str = ""
+        self._position: int | None = None   # Next raw character to decode, None until the field started
+        self._done: bool = False
+        self.text: str = ""                 # Content decoded so far
+
+    def feed(self, delta: str) -> str:
+        """Decode a new chunk of the response.
+
+        Args:
+            delta (str): JSON text received since the previous call.
+        Returns:
+            str: Content decoded from this chunk (possibly empty).
+        """
+        self._raw += delta
+        if self._done:
+            return ""
+
+        if self._position is None:
+            match = CONTENT_FIELD_PATTERN.search(self._raw)
+            if not match:
+                return ""
+            self._position = match.end()
+
+        raw = self._raw
+        chars: list[str] = []
+        index = self._position
+
+        while index < len(raw):
+            char = raw[index]
+
+            if char == '"':
+                self._done = True
+                break
+
+            if char == '\\':
+                if index + 1 >= len(raw):
+                    break # Escape sequence not fully received yet
+
+                escaped = raw[index + 1]
+                if escaped == 'u':
+                    code = raw[index + 2:index + 6]
+                    if len(code) < 4:
+                        break
+                    if not all(digit in string.hexdigits for digit in code):
+                        chars.append(raw[index:index + 2]) # Malformed escape from the model, kept as is rather than aborting the stream
+                        index += 2
+                        continue
+                    chars.append(chr(int(code, 16)))
+                    index += 6
+                    continue
+
+                chars.append(JSON_ESCAPES.get(escaped, escaped))
+                index += 2
+                continue
+
+            chars.append(char)
+            index += 1
+
+        self._position = index
+        decoded = "".join(chars)
+        self.text += decoded
+        return decoded
+
+
+def extract_partial_content(raw: str) -> str:
+    """Extract the (possibly unfinished) "content" field from a partial JSON response.
+
+    Args:
+        raw (str): JSON text received so far.
+    Returns:
+        str: Decoded content received so far, empty if the field has not started yet.
+    """
+    decoder = PartialContentDecoder()
+    decoder.feed(raw)
+    return decoder.text
+
+
+class SentenceBuffer:
+    """Split streamed text into complete sentences as soon as they are available."""
+
+    def __init__(self) -> None:
+        """Initialize the sentence buffer."""
+        self._emitted: int = 0
+
+    def feed(self, text: str) -> list[str]:
+        """Return the sentences completed since the previous call.
+
+        Args:
+            text (str): Full text received so far.
+        Returns:
+            list[str]: Newly completed sentences.
+        """
+        pending = text[self._emitted:]
+        parts = SENTENCE_END_PATTERN.split(pending)
+
+        if len(parts) < 2:
+            return []
+
+        completed = parts[:-1]
+        self._emitted = len(text) - len(parts[-1])
+        return [sentence.strip() for sentence in completed if sentence.strip()]
+
+    def flush(self, text: str) -> list[str]:
+        """Return the remaining text once the stream is over.
+
+        Args:
+            text (str): Full text received.
+        Returns:
+            list[str]: Last sentence, if any.
+        """
+        remaining = text[self._emitted:].strip()
+        self._emitted = len(text)
+        return [remaining] if remaining else []
+
+
+class SentenceStream:
+    """Publish each sentence of a streamed content as soon as it is complete."""
+
+    def __init__(self, on_sentence: Callable[[str, str], None]) -> None:
+        """Initialize the sentence stream.
+
+        Args:
+            on_sentence (Callable): Called with each completed sentence and the text received so far.
+        """
+        self._on_sentence: Callable[[str, str], None] = on_sentence
+        self._sentences: SentenceBuffer = SentenceBuffer()
+        self.text: str = ""
+
+    def feed(self, delta: str) -> None:
+        """Add a new piece of the content, publishing the sentences it completes.
+
+        Args:
+            delta (str): Content received since the previous call.
+        """
+        self.text += delta
+        for sentence in self._sentences.feed(self.text):
+            self._on_sentence(sentence, self.text)
+
+    def flush(self) -> None:
+        """Publish the remaining text once the content is complete."""
+        for sentence in self._sentences.flush(self.text):
+            self._on_sentence(sentence, self.text)
+
+
+async def async_iter_events(resp: ClientResponse) -> AsyncIterator[dict]:
+    """Iterate over the JSON chunks of a server-sent events response.
+
+    Args:
+        resp (ClientResponse): Streamed HTTP response.
+    Yields:
+        dict: Decoded chunk.
+    """
+    async for raw_line in resp.content:
+        line = raw_line.decode("utf-8").strip()
+
+        if not line.startswith("data:"):
+            continue # Comments, keep-alives and blank separators
+
+        chunk = line[len("data:"):].strip()
+        if chunk == "[DONE]":
+            return
+
+        try:
+            yield json.loads(chunk)
+        except ValueError:
+            _LOGGER.debug("Ignoring malformed stream chunk from Perplexity API: %s", chunk)
+
+
+async def async_read_stream(resp: ClientResponse, on_content: Callable[[str], None] | None = None) -> dict:
+    """Read a streamed chat completion and rebuild the non-streamed response body.
+
+    Args:
+        resp (ClientResponse): Streamed HTTP response.
+        on_content (Callable | None): Called with each new piece of the decoded "content" field.
+    Returns:
+        dict: Response shaped like a non-streamed chat completion (choices, usage, ...).
+    """
+    raw_content = ""
+    last_chunk: dict = {}
+    content = PartialContentDecoder()
+
+    async for chunk in async_iter_events(resp):
+        last_chunk = chunk
+        choices = chunk.get("choices") or [{}]
+        delta = (choices[0].get("delta") or {}).get("content") or ""
+
+        if not delta:
+            continue
+
+        raw_content += delta
+        if on_content and (decoded := content.feed(delta)):
+            on_content(decoded)
+
+    data = {key: value for key, value in last_chunk.items() if key != "choices"}
+    data["choices"] = [{"index": 0, "message": {"role": "assistant", "content": raw_content}}]
+    return data
@@ -0,0 +1,229 @@
+"""Resolution of the entities designated by a command or a question, from their names, aliases and areas."""
+from homeassistant.core import HomeAssistant
+
+from .entities import EntityIndex, normalize_name
+
+
+# Words dropped from a target once the entity name or area has been located (articles, prepositions, state nouns, ...)
+STOP_WORDS: dict[str, set[str]] = {
+    "en": {"the", "a", "an", "my", "all", "in", "of", "at", "on", "state", "status"},
+    "fr": {"le", "la", "les", "l", "du", "de", "des", "d", "dans", "au", "aux", "mon", "ma", "mes", "tout", "toute", "tous", "toutes", "état", "statut"},
+    "es": {"el", "la", "los", "las", "del", "de", "en", "mi", "mis", "todo", "toda", "todos", "todas", "estado"},
+    "de": {"der", "die", "das", "den", "dem", "im", "in", "mein", "meine", "alle", "vom", "von", "status", "zustand"},
+    "it": {"il", "lo", "la", "i", "gli", "le", "l", "del", "della", "dei", "delle", "nel", "nella", "in", "di", "mio", "mia", "tutte", "tutti", "stato"},
+    "pt": {"o", "a", "os", "as", "do", "da", "dos", "das", "no", "na", "nos", "nas", "em", "de", "meu", "minha", "todas", "todos", "estado"},
+    "nl": {"de", "het", "een", "in", "van", "mijn", "alle", "status", "toestand"},
+    "zh": {"的", "所有", "全部", "状态"},
+    "ja": {"の", "全部", "すべて", "状態"},
+    "ko": {"의", "모든", "전부", "상태"},
+}
+
+# Lead the best fuzzy match must have over the next entity for a target to be resolved
+FUZZY_MATCH_MARGIN: float = 0.05
+
+# Languages written without spaces between words: names are located as plain substrings
+UNSPACED_LANGUAGES: set[str] = {"zh", "ja"}
+
+# Generic device words referring to every exposed entity of a domain in an area ("the kitchen lights")
+DOMAIN_WORDS: dict[str, dict[str, str]] = {
+    "en": {"light": "light", "lights": "light", "lamp": "light", "lamps": "light", "fan": "fan", "fans": "fan",
+           "switch": "switch", "switches": "switch", "plug": "switch", "plugs": "switch",
+           "blind": "cover", "blinds": "cover", "shutter": "cover", "shutters": "cover", "curtain": "cover", "curtains": "cover", "shades": "cover"},
+    "fr": {"lumière": "light", "lumières": "light", "lampe": "light", "lampes": "light", "éclairage": "light", "ventilateur": "fan", "ventilateurs": "fan",
+           "prise": "switch", "prises": "switch", "volet": "cover", "volets": "cover", "store": "cover", "stores": "cover", "rideau": "cover", "rideaux": "cover"},
+    "es": {"luz": "light", "luces": "light", "lámpara": "light", "lámparas": "light", "ventilador": "fan", "ventiladores": "fan",
+           "enchufe": "switch", "enchufes": "switch", "persiana": "cover", "persianas": "cover", "cortina": "cover", "cortinas": "cover"},
+    "de": {"licht": "light", "lichter": "light", "lampe": "light", "lampen": "light", "beleuchtung": "light", "ventilator": "fan", "ventilatoren": "fan",
+           "steckdose": "switch", "steckdosen": "switch", "rollladen": "cover", "rollläden": "cover", "rollo": "cover", "rollos": "cover", "jalousie": "cover", "jalousien": "cover"},
+    "it": {"luce": "light", "luci": "light", "lampada": "light", "lampade": "light", "ventilatore": "fan", "ventilatori": "fan",
+           "presa": "switch", "prese": "switch", "tapparella": "cover", "tapparelle": "cover", "persiana": "cover", "persiane": "cover", "tenda": "cover", "tende": "cover"},
+    "pt": {"luz": "light", "luzes": "light", "lâmpada": "light", "lâmpadas": "light", "ventilador": "fan", "ventiladores": "fan",
+           "tomada": "switch", "tomadas": "switch", "persiana": "cover", "persianas": "cover", "cortina": "cover", "cortinas": "cover", "estore": "cover", "estores": "cover"},
+    "nl": {"licht": "light", "lichten": "light", "lamp": "light", "lampen": "light", "ventilator": "fan", "ventilatoren": "fan",
+           "stekker": "switch", "stekkers": "switch", "stopcontact": "switch", "rolluik": "cover", "rolluiken": "cover", "gordijn": "cover", "gordijnen": "cover"},
+    "zh": {"灯": "light", "灯光": "light", "电灯": "light", "风扇": "fan", "插座": "switch", "窗帘": "cover", "百叶窗": "cover"},
+    "ja": {"電気": "light", "ライト": "light", "照明": "light", "扇風機": "fan", "ファン": "fan", "コンセント": "switch", "カーテン": "cover", "シャッター": "cover", "ブラインド": "cover"},
+    "ko": {"불": "light", "조명": "light", "전등": "light", "선풍기": "fan", "콘센트": "switch", "플러그": "switch", "커튼": "cover", "블라인드": "cover"},
+}
+
+
+# Generic words referring to every exposed entity of a device class ("are the windows closed?")
+DEVICE_CLASS_WORDS: dict[str, dict[str, str]] = {
+    "en": {"window": "window", "windows": "window", "door": "door", "doors": "door", "motion": "motion", "temperature": "temperature", "humidity": "humidity"},
+    "fr": {"fenêtre": "window", "fenêtres": "window", "porte": "door", "portes": "door", "mouvement": "motion", "température": "temperature", "humidité": "humidity"},
+    "es": {"ventana": "window", "ventanas": "window", "puerta": "door", "puertas": "door", "movimiento": "motion", "temperatura": "temperature", "humedad": "humidity"},
+    "de": {"fenster": "window", "tür": "door", "türen": "door", "bewegung": "motion", "temperatur": "temperature", "luftfeuchtigkeit": "humidity", "feuchtigkeit": "humidity"},
+    "it": {"finestra": "window", "finestre": "window", "porta": "door", "porte": "door", "movimento": "motion", "temperatura": "temperature", "umidità": "humidity"},
+    "pt": {"janela": "window", "janelas": "window", "porta": "door", "portas": "door", "movimento": "motion", "temperatura": "temperature", "umidade": "humidity", "humidade": "humidity"},
+    "nl": {"raam": "window", "ramen": "window", "deur": "door", "deuren": "door", "beweging": "motion", "temperatuur": "temperature", "luchtvochtigheid": "humidity", "vochtigheid": "humidity"},
+    "zh": {"窗户": "window", "窗": "window", "门": "door", "运动": "motion", "温度": "temperature", "湿度": "humidity"},
+    "ja": {"窓": "window", "ドア": "door", "扉": "door", "人感": "motion", "温度": "temperature", "湿度": "humidity"},
+    "ko": {"창문": "window", "문": "door", "움직임": "motion", "온도": "temperature", "습도": "humidity"},
+}
+
+
+class TargetResolver:
+    """Resolve the target of a command or a question to exposed entities.
+
+    Targets of commands and questions are only resolved from exact names, aliases, areas and
+    generic device words, so a resolved target never designates entities the user did not mean.
+    Only the targets of the actions proposed by Perplexity are resolved approximately.
+    """
+
+    def __init__(self, hass: HomeAssistant, entity_index: EntityIndex) -> None:
+        """Initialize the target resolver.
+
+        Args:
+            hass (HomeAssistant): Home Assistant instance.
+            entity_index (EntityIndex): Index of the exposed entities.
+        """
+        self.hass: HomeAssistant = hass
+        self._entity_index: EntityIndex = entity_index
+
+    def _strip_stop_words(self, text: str, language: str) -> str:
+        """Remove the stop words of a target.
+
+        Args:
+            text (str): Normalized target.
+            language (str): Language of the target.
+        Returns:
+            str: Target without stop words.
+        """
+        stop_words = STOP_WORDS.get(language, set())
+
+        if language in UNSPACED_LANGUAGES:
+            stripped = True
+            while stripped and text:
+                stripped = False
+                for word in stop_words:
+                    if text.startswith(word) or text.endswith(word):
+                        text = text.removeprefix(word).removesuffix(word).strip()
+                        stripped = True
+            return text
+
+        return " ".join(word for word in text.split() if word not in stop_words)
+
+    def _remove_name(self, text: str, name: str, language: str) -> str | None:
+        """Remove a name from a target.
+
+        Args:
+            text (str): Normalized target.
+            name (str): Normalized name to remove.
+            language (str): Language of the target.
+        Returns:
+            str | None: Target without the name, or None if the name is not part of the target.
+        """
+        if language in UNSPACED_LANGUAGES:
+            return text.replace(name, " ", 1).strip() if name in text else None
+
+        padded = f" {text} "
+        if f" {name} " not in padded:
+            return None
+        return padded.replace(f" {name} ", " ", 1).strip()
+
+    def _get_group(self, word: str, language: str) -> tuple[str | None, str | None] | None:
+        """Get the group designated by a generic device word.
+
+        Args:
+            word (str): Normalized word.
+            language (str): Language of the word.
+        Returns:
+            tuple | None: (domain, device class) of the group, or None if the word is not a device word.
+        """
+        if domain := DOMAIN_WORDS.get(language, {}).get(word):
+            return domain, None
+        if device_class := DEVICE_CLASS_WORDS.get(language, {}).get(word):
+            return None, device_class
+        return None
+
+    def _in_group(self, entity_id: str, group: tuple[str | None, str | None]) -> bool:
+        """Check whether an entity belongs to a group.
+
+        Args:
+            entity_id (str): Entity ID to check.
+            group (tuple): (domain, device class) of the group.
+        Returns:
+            bool: True if the entity belongs to the group.
+        """
+        domain, device_class = group
+        if domain is not None:
+            return entity_id.split(".", 1)[0] == domain
+
+        state = self.hass.states.get(entity_id)
+        return state is not None and state.attributes.get("device_class") == device_class
+
+    def resolve(self, target: str, language: str, allow_groups: bool = False) -> list[str] | None:
+        """Resolve the target of a command or a question to exposed entities.
+
+        Args:
+            target (str): Normalized target.
+            language (str): Language of the target.
+            allow_groups (bool): Whether a device word alone designates every exposed entity of its group ("the lights").
+        Returns:
+            list[str] | None: Entity IDs designated by the target, or None if there is none or it is ambiguous.
+        """
+        stripped_target = self._strip_stop_words(target, language)
+
+        # 1. Exact entity name or alias
+        for candidate in dict.fromkeys((target, stripped_target)):
+            entity_ids = self._entity_index.find_by_name(candidate)
+            if len(entity_ids) == 1:
+                return list(entity_ids)
+            if entity_ids:
+                return None # Several entities share this name
+
+        # 2. Entity name or device word qualified by an area ("the lights in the kitchen")
+        resolved: set[str] = set()
+        for area_id in self._entity_index.area_ids:
+            for area_name in {normalize_name(name) for name in self._entity_index.get_area_names(area_id)}:
+                rest = self._remove_name(target, area_name, language) if area_name else None
+                if rest is None:
+                    continue
+
+                rest = self._strip_stop_words(rest, language)
+                in_area = self._entity_index.get_area_entities(area_id)
+
+                if group := self._get_group(rest, language):
+                    resolved.update(entity_id for entity_id in in_area if self._in_group(entity_id, group))
+                    continue
+
+                named = [entity_id for entity_id in in_area if rest in self._entity_index.get_names(entity_id)]
+                if len(named) > 1:
+                    return None
+                resolved.update(named)
+
+        if resolved:
+            if len({self._entity_index.get_area_id(entity_id) for entity_id in resolved}) > 1:
+                return None # The target matches entities in different areas
+            return sorted(resolved)
+
+        # 3. Device word alone, designating the whole group
+        if allow_groups and (group := self._get_group(stripped_target, language)):
+            return sorted(entity_id for entity_id in self._entity_index.entity_ids if self._in_group(entity_id, group)) or None
+
+        return None
+
+    def resolve_entity_id(self, target: str, domain: str | None, threshold: float) -> tuple[str, float] | None:
+        """Resolve an approximate entity ID or name to the closest exposed entity.
+
+        Used for the targets proposed by Perplexity, which are often close to a real entity ID
+        without being exact ("light.livingroom" for "light.living_room", a friendly name, ...).
+
+        Args:
+            target (str): Proposed target, an entity ID or a name.
+            domain (str | None): Domain the entity must belong to if the target has none, any domain if None.
+            threshold (float): Minimum similarity (0 to 1) of the resolved entity.
+        Returns:
+            tuple[str, float] | None: Resolved entity ID and its similarity, or None if no entity is close enough or the target is ambiguous.
+        """
+        prefix, _, object_id = target.strip().partition(".")
+        if object_id and self.hass.states.async_entity_ids_count(prefix.lower()) > 0:
+            domain, target = prefix.lower(), object_id
+
+        matches = self._entity_index.find_similar(target, domain)
+        if not matches or matches[0][1] < threshold:
+            return None
+        if len(matches) > 1 and matches[0][1] - matches[1][1] < FUZZY_MATCH_MARGIN:
+            return None # Several entities are as close to the target
+
+        return matches[0]
@@ -0,0 +1,112 @@
+"""Token estimation and input budget enforcement for the requests sent to Perplexity."""
+import logging
+import math
+import re
+
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Latin scripts average about four characters per token
+CHARS_PER_TOKEN: float = 4.0
+# CJK ideographs, kana and Hangul syllables are roughly one token each
+WIDE_CHAR_PATTERN = re.compile("[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+# Role and separators added around each chat message
+MESSAGE_OVERHEAD_TOKENS: int = 4
+# Separator joining the entity lines
+SEPARATOR_TOKENS: int = 1
+# Entities kept before their lines get shortened, the most relevant ones
+MIN_CONTEXT_ENTITIES: int = 10
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text, without a tokenizer.
+
+    Args:
+        text (str): Text to estimate.
+    Returns:
+        int: Estimated number of tokens.
+    """
+    if not text:
+        return 0
+
+    wide_chars = len(WIDE_CHAR_PATTERN.findall(text))
+    return wide_chars + math.ceil((len(text) - wide_chars) / CHARS_PER_TOKEN)
+
+
+def estimate_messages_tokens(messages: list[dict]) -> int:
+    """Estimate the number of input tokens of a chat completion request.
+
+    Args:
+        messages (list[dict]): Messages of the request.
+    Returns:
+        int: Estimated number of input tokens.
+    """
+    return sum(estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+@dataclass
+class CompactedPrompt:
+    """Parts of a prompt kept to fit in the input budget."""
+    history: list[list[dict]]
+    entity_ids: list[str]
+    compact_entities: bool = False
+    estimated_tokens: int = 0
+    steps: list[str] = field(default_factory=list)
+
+
+def compact_prompt(budget: int, fixed_tokens: int, history: list[list[dict]], entity_ids: list[str], line_tokens: Callable[[str, bool], int]) -> CompactedPrompt:
+    """Shrink a prompt until it fits in the input budget.
+
+    The prompt is compacted in a deterministic order, each step only running if the previous
+    ones were not enough:
+        1. Drop the history, oldest turns first.
+        2. Drop the least relevant entities, down to ``MIN_CONTEXT_ENTITIES``.
+        3. Shorten the lines of the remaining entities.
+        4. Drop the least relevant of the remaining entities.
+
+    Args:
+        budget (int): Maximum number of input tokens.
+        fixed_tokens (int): Tokens of the parts that cannot be compacted (system prompt, user prompt, ...).
+        history (list[list[dict]]): Messages of each history turn, oldest first.
+        entity_ids (list[str]): Entities of the context, most relevant first.
+        line_tokens (Callable[[str, bool], int]): Returns the tokens of an entity line, shortened or not.
+    Returns:
+        CompactedPrompt: History entries and entities to keep.
+    """
+    history = list(history)
+    entity_ids = list(entity_ids)
+    history_tokens = [estimate_messages_tokens(turn) for turn in history]
+    entity_tokens = [line_tokens(entity_id, False) + SEPARATOR_TOKENS for entity_id in entity_ids]
+    total = fixed_tokens + sum(history_tokens) + sum(entity_tokens)
+    result = CompactedPrompt(history, entity_ids)
+
+    if total > budget and history:
+        while total > budget and history:
+            history.pop(0)
+            total -= history_tokens.pop(0)
+        result.steps.append("history")
+
+    if total > budget and len(entity_ids) > MIN_CONTEXT_ENTITIES:
+        while total > budget and len(entity_ids) > MIN_CONTEXT_ENTITIES:
+            entity_ids.pop()
+            total -= entity_tokens.pop()
+        result.steps.append("entities")
+
+    if total > budget and entity_ids:
+        entity_tokens = [line_tokens(entity_id, True) + SEPARATOR_TOKENS for entity_id in entity_ids]
+        total = fixed_tokens + sum(history_tokens) + sum(entity_tokens)
+        result.compact_entities = True
+        result.steps.append("attributes")
+
+        while total > budget and entity_ids:
+            entity_ids.pop()
+            total -= entity_tokens.pop()
+
+    if total > budget:
+        _LOGGER.warning("Request still exceeds the input token budget after compaction (%d > %d tokens).", total, budget)
+
+    result.estimated_tokens = total
+    return result
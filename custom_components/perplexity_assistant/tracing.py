@@ -0,0 +1,173 @@
+"""Per-stage timing traces of the requests handled by the agent, kept in a bounded ring buffer."""
+import logging
+import re
+import time
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterator
+from homeassistant.util.ulid import ulid_now
+
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_TRACES: int = 50    # Latest traces kept for the diagnostics
+REDACTED: str = "**REDACTED**"
+
+# Attribute keys whose values are never kept, whatever the stage recording them
+SENSITIVE_KEYS: set[str] = {"api_key", "authorization", "headers", "token", "password"}
+# Secrets embedded in free text, such as the error message of a failed request
+SECRET_PATTERN = re.compile(r"(?i)(bearer\s+)[\w.\-~+/]+=*|\bpplx-[\w\-]+")
+
+_current_trace: ContextVar["RequestTrace | None"] = ContextVar("perplexity_assistant_trace", default=None)
+
+
+def redact(value: Any) -> Any:
+    """Redact the secrets of a trace attribute.
+
+    Args:
+        value (Any): Attribute value, possibly nested in dicts and lists.
+    Returns:
+        Any: The value, with sensitive keys and embedded API keys replaced.
+    """
+    if isinstance(value, dict):
+        return {key: REDACTED if str(key).lower() in SENSITIVE_KEYS else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        return SECRET_PATTERN.sub(lambda match: f"{match.group(1) or ''}{REDACTED}", value)
+    return value
+
+
+class RequestTrace:
+    """Timings of the stages of a single request, with a few redacted attributes describing it."""
+
+    def __init__(self, kind: str) -> None:
+        """Start the trace.
+
+        Args:
+            kind (str): Entry point of the request ("conversation", "ask", "ask_many").
+        """
+        self.id: str = ulid_now()
+        self.kind: str = kind
+        self.started: datetime = datetime.now(timezone.utc)
+        self.duration: float | None = None
+        self.stages: list[tuple[str, float, float]] = []
+        self.attributes: dict[str, Any] = {}
+        self._started_at: float = time.monotonic()
+
+    def add_stage(self, name: str, started_at: float, ended_at: float | None = None) -> None:
+        """Record a stage that already ran.
+
+        Args:
+            name (str): Name of the stage.
+            started_at (float): Monotonic time the stage started at.
+            ended_at (float | None): Monotonic time the stage ended at, now if None.
+        """
+        ended_at = ended_at if ended_at is not None else time.monotonic()
+        self.stages.append((name, started_at - self._started_at, ended_at - started_at))
+
+    def finish(self) -> None:
+        """Stop the trace."""
+        self.duration = time.monotonic() - self._started_at
+
+    def as_dict(self) -> dict:
+        """Return the trace, with its times in milliseconds and its attributes redacted."""
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "started": self.started.isoformat(),
+            "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+            "stages": [{"name": name, "start_ms": round(offset * 1000, 1), "duration_ms": round(duration * 1000, 1)} for name, offset, duration in self.stages],
+            "attributes": redact(self.attributes),
+        }
+
+
+class Tracer:
+    """Trace the requests of an agent, keeping the latest traces in a ring buffer."""
+
+    def __init__(self, size: int = MAX_TRACES) -> None:
+        """Initialize the tracer.
+
+        Args:
+            size (int): Latest traces kept.
+        """
+        self._traces: deque[RequestTrace] = deque(maxlen=size)
+        self._listeners: list[Callable[[RequestTrace], None]] = []
+
+    @contextmanager
+    def trace(self, kind: str) -> Iterator[RequestTrace]:
+        """Trace a request: the stages run within the block are recorded in its trace.
+
+        Args:
+            kind (str): Entry point of the request.
+        Yields:
+            RequestTrace: Trace of the request, stored in the ring buffer once the block exits.
+        """
+        trace = RequestTrace(kind)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            trace.finish()
+            self._traces.append(trace)
+            for listener in list(self._listeners):
+                listener(trace)
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Trace of %s request %s: %s", trace.kind, trace.id, trace.as_dict())
+
+    def async_add_listener(self, listener: Callable[[RequestTrace], None]) -> Callable[[], None]:
+        """Call a listener with the trace of each request, once it completes.
+
+        Args:
+            listener (Callable[[RequestTrace], None]): Listener of the completed requests.
+        Returns:
+            Callable[[], None]: Function removing the listener.
+        """
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener) if listener in self._listeners else None
+
+    @property
+    def traces(self) -> list[dict]:
+        """Return the latest traces, oldest first."""
+        return [trace.as_dict() for trace in self._traces]
+
+    def clear(self) -> None:
+        """Drop every trace."""
+        self._traces.clear()
+
+
+@contextmanager
+def trace_stage(name: str) -> Iterator[None]:
+    """Time a stage of the current request, if it is traced.
+
+    Args:
+        name (str): Name of the stage.
+    """
+    trace = _current_trace.get()
+    started_at = time.monotonic()
+    try:
+        yield
+    finally:
+        if trace is not None:
+            trace.add_stage(name, started_at)
+
+
+def record_stage(name: str, started_at: float) -> None:
+    """Record a stage of the current request that started earlier and ends now, if it is traced.
+
+    Args:
+        name (str): Name of the stage.
+        started_at (float): Monotonic time the stage started at.
+    """
+    if (trace := _current_trace.get()) is not None:
+        trace.add_stage(name, started_at)
+
+
+def annotate(**attributes: Any) -> None:
+    """Add attributes to the trace of the current request, if it is traced."""
+    if (trace := _current_trace.get()) is not None:
+        trace.attributes.update(attributes)
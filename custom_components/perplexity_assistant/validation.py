@@ -0,0 +1,180 @@
+"""Validation of the actions suggested by Perplexity, before any service is called."""
+import logging
+
+import voluptuous as vol
+
+from typing import Callable
+from homeassistant.const import EVENT_SERVICE_REGISTERED, EVENT_SERVICE_REMOVED
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers.typing import VolSchemaType
+
+from .actions import ActionCall, split_entity_ids
+from .entities import EntityIndex
+from .targets import TargetResolver
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Data keys holding the target entities of a service, "entity_id" if not listed
+TARGET_KEYS: dict[tuple[str, str], tuple[str, ...]] = {
+    ("tts", "speak"): ("media_player_entity_id",), # The entity_id of tts.speak is the configured TTS engine
+}
+# Domains whose services may target entities of any domain
+ANY_DOMAIN_SERVICES: set[str] = {"homeassistant"}
+
+REJECT_UNKNOWN_SERVICE: str = "unknown_service"
+REJECT_MISSING_TARGET: str = "missing_target"
+REJECT_UNKNOWN_ENTITY: str = "unknown_entity"
+REJECT_ENTITY_NOT_EXPOSED: str = "entity_not_exposed"
+REJECT_DOMAIN_MISMATCH: str = "domain_mismatch"
+REJECT_INVALID_PARAMETERS: str = "invalid_parameters"
+
+
+class ActionValidator:
+    """Check the actions suggested by Perplexity against the registered services and the exposed entities.
+
+    The services and their schemas are indexed once, and the index is only rebuilt after a
+    service is registered or removed. Unknown targets close enough to an exposed entity are
+    rewritten to that entity before the action is checked.
+    """
+
+    def __init__(self, hass: HomeAssistant, entity_index: EntityIndex) -> None:
+        """Initialize the validator.
+
+        Args:
+            hass (HomeAssistant): Home Assistant instance.
+            entity_index (EntityIndex): Index of the exposed entities.
+        """
+        self.hass: HomeAssistant = hass
+        self.entity_index: EntityIndex = entity_index
+        self.targets: TargetResolver = TargetResolver(hass, entity_index)
+
+        self._services: dict[tuple[str, str], VolSchemaType | None] | None = None
+        self._unsubscribers: list[Callable[[], None]] = []
+
+    @callback
+    def async_start(self) -> None:
+        """Subscribe to the events changing the registered services."""
+        self._unsubscribers.append(self.hass.bus.async_listen(EVENT_SERVICE_REGISTERED, self._async_on_services_updated))
+        self._unsubscribers.append(self.hass.bus.async_listen(EVENT_SERVICE_REMOVED, self._async_on_services_updated))
+
+    @callback
+    def async_stop(self) -> None:
+        """Unsubscribe from all events and drop the index."""
+        while self._unsubscribers:
+            self._unsubscribers.pop()()
+
+        self._services = None
+
+    @callback
+    def _async_on_services_updated(self, event: Event) -> None:
+        """Rebuild the index on next use, services are often registered in bursts."""
+        self._services = None
+
+    @property
+    def services(self) -> dict[tuple[str, str], VolSchemaType | None]:
+        """Return the schema of each registered service, keyed by domain and service."""
+        if self._services is None:
+            _LOGGER.debug("Building services index for action validation.")
+            self._services = {
+                (domain, service_name): service.schema
+                for domain, services in self.hass.services.async_services().items()
+                for service_name, service in services.items()
+            }
+
+        return self._services
+
+    def validate(self, call: ActionCall, match_threshold: float | None = None) -> ActionCall:
+        """Check an action, rejecting it with a structured reason if it cannot succeed.
+
+        Args:
+            call (ActionCall): Call of the action.
+            match_threshold (float | None): Minimum similarity for an unknown target to be resolved to an exposed entity, None to never resolve targets.
+        Returns:
+            ActionCall: The same call, with its targets resolved and its rejection set if it is invalid.
+        """
+        if call.skip_reason or call.rejection:
+            return call
+
+        if match_threshold is not None and match_threshold < 1:
+            self._resolve_targets(call, match_threshold)
+
+        rejection = self._check(call)
+        if rejection:
+            _LOGGER.warning("Rejected action %s.%s on %s (%s): %s", call.domain, call.service, call.target, *rejection)
+            call.rejection = rejection
+
+        return call
+
+    def _resolve_targets(self, call: ActionCall, threshold: float) -> None:
+        """Replace the unknown target entities of an action by the closest exposed entities.
+
+        Args:
+            call (ActionCall): Call of the action, updated in place.
+            threshold (float): Minimum similarity of a resolved entity.
+        """
+        key = (call.domain, call.service)
+
+        for target_key in TARGET_KEYS.get(key, ("entity_id",)):
+            entity_ids = split_entity_ids(call.data.get(target_key))
+            if not entity_ids:
+                continue
+
+            # Entity targets of a domain service belong to that domain ("media_player_entity_id" targets media players)
+            if target_key != "entity_id":
+                domain = target_key.removesuffix("_entity_id")
+            elif call.domain not in ANY_DOMAIN_SERVICES and self.hass.states.async_entity_ids_count(call.domain) > 0:
+                domain = call.domain
+            else:
+                domain = None
+
+            resolved_ids: list[str] = []
+            for entity_id in entity_ids:
+                match = self.targets.resolve_entity_id(entity_id, domain, threshold) if self.hass.states.get(entity_id) is None else None
+                if match is None:
+                    resolved_ids.append(entity_id) # Existing or unresolved entities are left to the checks
+                    continue
+
+                _LOGGER.info("Resolved target %s of action %s.%s to %s (similarity %.2f).", entity_id, call.domain, call.service, *match)
+                resolved_ids.append(match[0])
+
+            if resolved_ids != entity_ids:
+                resolved_ids = list(dict.fromkeys(resolved_ids))
+                call.data[target_key] = resolved_ids[0] if len(resolved_ids) == 1 else resolved_ids
+                if call.original_target is None:
+                    call.original_target = call.target
+                call.target = ", ".join(resolved_ids)
+
+    def _check(self, call: ActionCall) -> tuple[str, str] | None:
+        """Return the reason and message of the rejection of an action, or None if it is valid."""
+        key = (call.domain, call.service)
+        if key not in self.services:
+            return REJECT_UNKNOWN_SERVICE, f"Service {call.domain}.{call.service} does not exist."
+
+        # Services of entity domains (light, switch, ...) only act on entities of their own domain
+        check_domain = call.domain not in ANY_DOMAIN_SERVICES and self.hass.states.async_entity_ids_count(call.domain) > 0
+
+        for target_key in TARGET_KEYS.get(key, ("entity_id",)):
+            if target_key not in call.data:
+                continue
+
+            entity_ids = split_entity_ids(call.data[target_key])
+            if not entity_ids:
+                return REJECT_MISSING_TARGET, f"Action has no target entity ({target_key})."
+
+            for entity_id in entity_ids:
+                if self.hass.states.get(entity_id) is None:
+                    return REJECT_UNKNOWN_ENTITY, f"Entity {entity_id} does not exist."
+                if not self.entity_index.is_exposed(entity_id):
+                    return REJECT_ENTITY_NOT_EXPOSED, f"Entity {entity_id} is not exposed to the assistant."
+                if check_domain and target_key == "entity_id" and entity_id.split(".", 1)[0] != call.domain:
+                    return REJECT_DOMAIN_MISMATCH, f"Service {call.domain}.{call.service} cannot act on {entity_id}."
+
+        schema = self.services[key]
+        if schema is not None:
+            try:
+                schema(call.data)
+            except vol.Invalid as e:
+                return REJECT_INVALID_PARAMETERS, f"Invalid parameters: {e}"
+
+        return None
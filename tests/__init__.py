@@ -0,0 +1 @@
+"""Tests of the Perplexity Assistant integration."""
@@ -0,0 +1,97 @@
+"""Tests of the layout of the request messages, which must keep a stable prefix for upstream prompt caching.
+
+They run on the synthetic home of the benchmarks, with Home Assistant installed:
+
+    python -m pytest tests
+"""
+import asyncio
+import tempfile
+
+from datetime import datetime
+from unittest.mock import patch
+
+from custom_components.perplexity_assistant.const import CONF_CONTEXT_TOP_K
+from custom_components.perplexity_assistant.conversation import PerplexityAgent
+
+from benchmarks.synthetic_home import add_config_entry, async_create_hass, async_populate
+
+
+HOME_SIZE: int = 200
+CONTEXT_TOP_K: int = 10
+
+# Two requests differing in every volatile field: time, user and prompt
+REQUESTS: tuple[tuple[datetime, str, str], ...] = (
+    (datetime(2025, 1, 6, 7, 30), "Alice", "Turn off the kitchen lights"),
+    (datetime(2025, 7, 19, 22, 5), "Bob", "Are the kitchen lights still on?"),
+)
+
+
+def _frozen_datetime(now: datetime) -> type[datetime]:
+    """Return a datetime class whose ``now`` is always ``now``."""
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None) -> datetime:
+            return now
+
+    return FrozenDatetime
+
+
+async def _async_build_requests() -> tuple[list[list[dict]], str]:
+    """Build the messages of both requests on a synthetic home, changing the state of an entity outside their context in between.
+
+    Returns:
+        tuple[list[list[dict]], str]: Messages of each request, and the entity whose state changed.
+    """
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_create_hass(config_dir)
+        try:
+            entry = add_config_entry(hass, {CONF_CONTEXT_TOP_K: CONTEXT_TOP_K})
+            await async_populate(hass, entry, HOME_SIZE)
+            agent = PerplexityAgent(hass, entry.entry_id)
+            agent.async_start()
+            await hass.async_block_till_done()
+
+            requests: list[list[dict]] = []
+            changed_entity_id = ""
+            for now, username, prompt in REQUESTS:
+                with patch("custom_components.perplexity_assistant.conversation.datetime", _frozen_datetime(now)):
+                    user_messages = [agent._build_user_message(prompt, username)]
+                    context = agent._get_entities_context(True, prompt)
+                    requests.append(agent._build_messages(context, [], user_messages))
+
+                if not changed_entity_id:
+                    changed_entity_id = next(entity_id for entity_id in agent._entity_index.entity_ids if entity_id not in context)
+                    state = hass.states.get(changed_entity_id)
+                    hass.states.async_set(changed_entity_id, f"{state.state}_changed", state.attributes)
+                    await hass.async_block_till_done()
+
+            agent.async_stop()
+            return requests, changed_entity_id
+        finally:
+            await hass.async_stop(force=True)
+
+
+def test_stable_prefix_is_byte_identical() -> None:
+    """The instructions and the entity snapshot are the same bytes across requests, only the last message changes."""
+    (first, second), changed_entity_id = asyncio.run(_async_build_requests())
+
+    assert first[0]["role"] == second[0]["role"] == "system"
+    assert first[0]["content"].encode() == second[0]["content"].encode()
+
+    # The selected entities did not change, so neither did their snapshot
+    assert first[1]["content"].startswith("ENTITIES: ")
+    assert changed_entity_id not in first[1]["content"]
+    assert first[1]["content"].encode() == second[1]["content"].encode()
+    assert first[-1]["content"] != second[-1]["content"]
+
+
+def test_volatile_fields_follow_entity_snapshot() -> None:
+    """The time, user name and prompt of a request only appear after the entity snapshot."""
+    requests, _ = asyncio.run(_async_build_requests())
+
+    for messages, (now, username, prompt) in zip(requests, REQUESTS):
+        snapshot_index = next(index for index, message in enumerate(messages) if message["content"].startswith("ENTITIES: "))
+        for field in (now.strftime("%Y-%m-%d %H:%M"), username, prompt):
+            positions = [index for index, message in enumerate(messages) if field in message["content"]]
+            assert positions, f"{field!r} is missing from the request"
+            assert min(positions) > snapshot_index, f"{field!r} appears before the entity snapshot"